@@ -0,0 +1,283 @@
+import asyncio
+import logging
+from asyncio.exceptions import CancelledError
+from typing import Dict, List, NamedTuple, Tuple
+from .exceptions import ModemConnectionError
+from .transport import Transport
+
+# 3GPP TS 27.010 basic option framing
+FLAG = 0xF9
+EA = 0x01
+CR = 0x02
+PF = 0x10
+
+SABM = 0x2F
+UA = 0x63
+DM = 0x0F
+DISC = 0x43
+UIH = 0xEF
+UI = 0x03
+
+# Multiplexer control channel (DLCI 0) message types, with EA set and C/R clear
+CLD = 0xC1
+MSC = 0xE1
+V24_SIGNALS = 0x8D # DV | RTR | RTC | EA
+
+def _fcs_table() -> bytes:
+    # reversed CRC-8, x^8 + x^2 + x + 1
+    table = bytearray(256)
+    for n in range(256):
+        crc = n
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xE0 if crc & 1 else crc >> 1
+        table[n] = crc
+    return bytes(table)
+
+FCS_TABLE = _fcs_table()
+FCS_GOOD = 0xCF
+
+def fcs(data: bytes) -> int:
+    crc = 0xFF
+    for octet in data:
+        crc = FCS_TABLE[crc ^ octet]
+    return 0xFF - crc
+
+def fcs_valid(data: bytes, checksum: int) -> bool:
+    crc = 0xFF
+    for octet in data:
+        crc = FCS_TABLE[crc ^ octet]
+    return FCS_TABLE[crc ^ checksum] == FCS_GOOD
+
+class CmuxFrame(NamedTuple):
+    dlci: int
+    control: int
+    command: bool
+    data: bytes = b''
+
+def encode_frame(dlci: int, control: int, data: bytes = b'', command: bool = True) -> bytes:
+    header = bytearray((dlci << 2 | (CR if command else 0) | EA, control))
+    if len(data) > 0x7F:
+        header += bytes(((len(data) << 1) & 0xFE, len(data) >> 7))
+    else:
+        header.append(len(data) << 1 | EA)
+    checksum = fcs(header + data if control & ~PF == UI else header)
+    return bytes((FLAG,)) + header + data + bytes((checksum, FLAG))
+
+class CmuxDecoder:
+    """Extracts frames from the multiplexed byte stream
+
+    Frames with a bad FCS or a missing closing flag are dropped and the decoder
+    resynchronises on the next flag. ``max_length`` should be the negotiated N1,
+    a corrupt length octet claiming more is rejected at once instead of holding
+    back every frame behind it until that much data has arrived.
+
+    Attributes:
+        dropped -- Number of corrupt frames discarded
+    """
+
+    def __init__(self, max_length: int = 32768):
+        self.buffer = bytearray()
+        self.max_length = max_length
+        self.dropped = 0
+
+    def feed(self, data: bytes) -> List[CmuxFrame]:
+        buffer = self.buffer
+        buffer += data
+        frames = []
+        while True:
+            start = buffer.find(FLAG)
+            if start == -1:
+                buffer.clear()
+                break
+            # skip leading garbage and the repeated flags between frames
+            while start + 1 < len(buffer) and buffer[start + 1] == FLAG:
+                start += 1
+            del buffer[:start]
+
+            if len(buffer) < 4:
+                break
+            length = buffer[3] >> 1
+            header_end = 4
+            if not buffer[3] & EA:
+                if len(buffer) < 5:
+                    break
+                length |= buffer[4] << 7
+                header_end = 5
+            if length > self.max_length:
+                # a flag octet inside frame data, not the start of a frame
+                self.dropped += 1
+                del buffer[:1]
+                continue
+            end = header_end + length + 1
+            if len(buffer) < end + 1:
+                break
+
+            control = buffer[2] & ~PF
+            checked = buffer[1:end - 1] if control == UI else buffer[1:header_end]
+            if buffer[end] != FLAG or not fcs_valid(checked, buffer[end - 1]):
+                self.dropped += 1
+                del buffer[:1]
+                continue
+
+            frames.append(CmuxFrame(buffer[1] >> 2, control, bool(buffer[1] & CR), bytes(buffer[header_end:end - 1])))
+            # the closing flag may double as the opening flag of the next frame
+            del buffer[:end]
+        return frames
+
+class CmuxChannelWriter:
+    """Writer half of a DLC, data is sent as UIH frames of at most the negotiated frame size"""
+
+    def __init__(self, mux: 'Multiplexer', dlci: int):
+        self.mux = mux
+        self.dlci = dlci
+        self.closed = False
+
+    def write(self, data: bytes) -> None:
+        if self.closed:
+            raise ConnectionResetError(f'DLC {self.dlci} closed')
+        self.mux.send_data(self.dlci, data)
+
+    async def drain(self) -> None:
+        await self.mux.writer.drain()
+
+    def is_closing(self) -> bool:
+        return self.closed
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.mux.close_channel(self.dlci)
+
+    async def wait_closed(self) -> None:
+        pass
+
+    def get_extra_info(self, name: str, default=None):
+        return self.mux.writer.get_extra_info(name, default)
+
+class Multiplexer:
+    """3GPP TS 27.010 basic mode multiplexer running over an already switched link
+
+    Every DLC is exposed as a reader/writer pair, so an ``ATModem`` can run on it
+    through a ``CmuxTransport``.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, frame_size: int = 127, timeout: float = 3):
+        self.reader = reader
+        self.writer = writer
+        self.frame_size = frame_size
+        self.timeout = timeout
+        self.decoder = CmuxDecoder(max_length=frame_size)
+        self.channels: Dict[int, asyncio.StreamReader] = {}
+        self.waiters: Dict[int, asyncio.Future] = {}
+        self.read_loop_task = None
+        self.logger = logging.getLogger('ATModem')
+
+    async def start(self) -> None:
+        self.read_loop_task = asyncio.create_task(self.read_loop())
+        await self.request(0, SABM)
+
+    async def close(self) -> None:
+        for dlci in list(self.channels):
+            self.close_channel(dlci)
+        try:
+            self.send_control(bytes((CLD | CR, EA)))
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+        if self.read_loop_task:
+            self.read_loop_task.cancel()
+            try:
+                await self.read_loop_task
+            except CancelledError:
+                pass
+
+    async def open_channel(self, dlci: int) -> Tuple[asyncio.StreamReader, CmuxChannelWriter]:
+        if not 0 < dlci < 64:
+            raise ValueError(f'Invalid DLCI {dlci}')
+        reader = asyncio.StreamReader()
+        self.channels[dlci] = reader
+        try:
+            await self.request(dlci, SABM)
+        except Exception:
+            self.channels.pop(dlci, None)
+            raise
+        # signal ready to receive, some modems hold data back until they see it
+        self.send_control(bytes((MSC | CR, 2 << 1 | EA, dlci << 2 | CR | EA, V24_SIGNALS)))
+        return reader, CmuxChannelWriter(self, dlci)
+
+    def close_channel(self, dlci: int) -> None:
+        reader = self.channels.pop(dlci, None)
+        if reader is not None:
+            reader.feed_eof()
+            self.writer.write(encode_frame(dlci, DISC | PF))
+
+    async def request(self, dlci: int, control: int) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[dlci] = future
+        try:
+            self.writer.write(encode_frame(dlci, control | PF))
+            await self.writer.drain()
+            if not await asyncio.wait_for(future, self.timeout):
+                raise ModemConnectionError(f'DLC {dlci} refused')
+        finally:
+            self.waiters.pop(dlci, None)
+
+    def send_data(self, dlci: int, data: bytes) -> None:
+        frames = [
+            encode_frame(dlci, UIH, data[n:n + self.frame_size])
+            for n in range(0, len(data), self.frame_size)
+        ]
+        self.writer.write(b''.join(frames))
+
+    def send_control(self, message: bytes, command: bool = True) -> None:
+        self.writer.write(encode_frame(0, UIH, message, command))
+
+    def handle_frame(self, frame: CmuxFrame) -> None:
+        if frame.control == UIH or frame.control == UI:
+            if frame.dlci == 0:
+                self.handle_control(frame.data)
+                return
+            reader = self.channels.get(frame.dlci)
+            if reader is not None:
+                reader.feed_data(frame.data)
+        elif frame.control == UA or frame.control == DM:
+            waiter = self.waiters.get(frame.dlci)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(frame.control == UA)
+        elif frame.control == DISC:
+            self.writer.write(encode_frame(frame.dlci, UA | PF, command=False))
+            reader = self.channels.pop(frame.dlci, None)
+            if reader is not None:
+                reader.feed_eof()
+
+    def handle_control(self, message: bytes) -> None:
+        if not message:
+            return
+        # acknowledge modem status commands by echoing them back as a response
+        if message[0] & ~CR == MSC and message[0] & CR:
+            self.send_control(bytes((MSC,)) + message[1:], command=False)
+
+    async def read_loop(self) -> None:
+        try:
+            while True:
+                data = await self.reader.read(4096)
+                if not data:
+                    break
+                for frame in self.decoder.feed(data):
+                    self.handle_frame(frame)
+        except (ConnectionError, OSError):
+            self.logger.error('Multiplexed link lost', exc_info=True)
+        finally:
+            for reader in self.channels.values():
+                reader.feed_eof()
+
+class CmuxTransport(Transport):
+    """A single DLC of a running multiplexer"""
+
+    def __init__(self, mux: Multiplexer, dlci: int):
+        super().__init__(f'cmux://{dlci}')
+        self.mux = mux
+        self.dlci = dlci
+
+    async def open(self) -> Tuple[asyncio.StreamReader, CmuxChannelWriter]:
+        return await self.mux.open_channel(self.dlci)
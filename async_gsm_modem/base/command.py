@@ -1,3 +1,8 @@
+import re
+from typing import List, Optional
+from .response import Response
+
+EXTENDED_NAME = re.compile(br'\+[^?=;]+')
 
 class Command:
 
@@ -33,4 +38,61 @@ class ExtendedCommand(Command):
     def execute(self) -> Command:
         return Command(
             self.command, 
-        )
\ No newline at end of file
+        )
+
+class CompoundCommand(Command):
+    """Several commands chained into a single command line, e.g. ``AT+CSQ;+CREG?;+QNWINFO``"""
+
+    def __init__(self, *commands: Command):
+        self.commands = commands
+        self.prefixes = []
+        # whether the command always answers with a line when it succeeds, queries and executed extended commands do
+        self.responds = []
+
+        line = b'AT'
+        extended = False
+        for command in commands:
+            body = bytes(command)
+            if not body.startswith(b'AT'):
+                raise ValueError(f'Cannot chain {command}')
+            body = body[2:]
+            if extended and body:
+                line += b';'
+            line += body
+            if body:
+                # a bare AT adds nothing to the line, the next command still follows the last one written
+                extended = body.startswith(b'+')
+            self.prefixes.append(EXTENDED_NAME.match(body).group(0) if body.startswith(b'+') else None)
+            self.responds.append(body.endswith(b'?') or (body.startswith(b'+') and b'=' not in body))
+
+        super().__init__(line)
+
+    def split(self, chunks: List[bytes]) -> List[Response]:
+        """Attribute response chunks to the command that produced them
+
+        Responses arrive in command order, so a chunk belongs to the next command
+        whose name it is prefixed with, or to the current command if it has no
+        recognised prefix.
+        """
+        results = [[] for _ in self.commands]
+        current = 0
+        for chunk in chunks:
+            for n in range(current, len(self.commands)):
+                if self.prefixes[n] and chunk.startswith(self.prefixes[n]):
+                    current = n
+                    break
+            results[current].append(chunk)
+        return [Response(result) for result in results]
+
+    def failed_index(self, responses: List[Response]) -> Optional[int]:
+        """Index of the command that a chain-terminating error belongs to, None if it can't be told
+
+        Execution stops at the first failing command, which follows the last command
+        that produced any output. If that next command may succeed silently, e.g. a
+        write or ``ATE0``, any command after it may have failed instead.
+        """
+        responded = [n for n, response in enumerate(responses) if response.chunks]
+        candidate = responded[-1] + 1 if responded else 0
+        if candidate >= len(self.commands) - 1:
+            return len(self.commands) - 1
+        return candidate if self.responds[candidate] else None
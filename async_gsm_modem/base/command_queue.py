@@ -0,0 +1,91 @@
+import asyncio
+import heapq
+import itertools
+import time
+from asyncio.exceptions import CancelledError
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from .exceptions import CommandQueueFull
+
+class Priority(IntEnum):
+    INTERACTIVE = 0 # pings, single reads and other latency sensitive queries
+    NORMAL = 1
+    BULK = 2 # message listing and sending
+
+class CommandQueue:
+    """Grants exclusive use of the modem to one command at a time in priority order
+
+    Each waiting command is parked on its own future. When the running command
+    releases its slot the future of the highest priority waiter is resolved,
+    commands of equal priority are served first come first served.
+
+    Attributes:
+        maxsize -- Maximum number of waiting commands, 0 for unbounded
+        running -- Priority of the command holding the slot, None when idle
+        max_depth -- Highest number of waiting commands seen
+        acquired -- Number of slots granted per priority
+        wait_time -- Total seconds spent waiting for a slot per priority
+    """
+
+    def __init__(self, maxsize: int = 0):
+        self.maxsize = maxsize
+        self.waiters = []
+        self.counter = itertools.count()
+        self.busy = False
+        self.running = None
+
+        self.max_depth = 0
+        self.acquired = {priority: 0 for priority in Priority}
+        self.wait_time = {priority: 0.0 for priority in Priority}
+
+    @property
+    def depth(self) -> int:
+        return len(self.waiters)
+
+    def locked(self) -> bool:
+        return self.busy
+
+    async def acquire(self, priority: Priority = Priority.NORMAL) -> None:
+        if not self.busy and not self.waiters:
+            self.busy = True
+            self.running = priority
+            self.acquired[priority] += 1
+            return
+
+        if self.maxsize and len(self.waiters) >= self.maxsize:
+            raise CommandQueueFull(f'Command queue full ({self.maxsize} waiting)')
+
+        start = time.monotonic()
+        entry = (priority, next(self.counter), asyncio.get_running_loop().create_future())
+        heapq.heappush(self.waiters, entry)
+        self.max_depth = max(self.max_depth, len(self.waiters))
+        try:
+            await entry[2]
+        except CancelledError:
+            if entry[2].done() and not entry[2].cancelled():
+                # the slot was handed over just before the cancellation, pass it on
+                self.release()
+            else:
+                self.waiters.remove(entry)
+                heapq.heapify(self.waiters)
+            raise
+        self.acquired[priority] += 1
+        self.wait_time[priority] += time.monotonic() - start
+
+    def release(self) -> None:
+        while self.waiters:
+            priority, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                self.running = priority
+                future.set_result(None)
+                return
+        self.busy = False
+        self.running = None
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.NORMAL):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
@@ -5,11 +5,15 @@ class CommandError(Exception):
     
     Attributes:
         error -- The received error
+        chunks -- Response chunks received before the error
+        command -- The command the error is attributed to, if known
     """
     
-    def __init__(self, error: bytes = None, msg: str = "Modem returned error response"):
+    def __init__(self, error: bytes = None, msg: str = "Modem returned error response", chunks: list = None, command = None):
         self.error = error
         self.msg = msg
+        self.chunks = chunks if chunks else []
+        self.command = command
         super().__init__(self.msg)
 
 class CommandFailed(Exception):
@@ -18,4 +22,12 @@ class CommandFailed(Exception):
 
 class ModemConnectionError(Exception):
     """Raised when modem is unresponsive"""
-    pass
\ No newline at end of file
+    pass
+
+class CommandQueueFull(CommandFailed):
+    """Raised when too many commands are already waiting for the modem"""
+    pass
+
+class EncodingError(ValueError):
+    """Raised when an SMS PDU cannot be decoded"""
+    pass
@@ -0,0 +1,38 @@
+from typing import List
+
+class LineFramer:
+    """Splits a raw byte stream from the modem into lines
+
+    Bytes are accumulated in a single reusable buffer and every complete line is
+    split out in one pass. The ``> `` prompt written by the modem while it waits
+    for message data is not followed by a line seperator, so it is returned as a
+    line of its own once it is at the head of the buffer.
+    """
+
+    def __init__(self, seperator: bytes = b'\r\n', prompt: bytes = b'> '):
+        self.seperator = seperator
+        self.prompt = prompt
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[bytes]:
+        buffer = self.buffer
+        buffer += data
+
+        lines = []
+        end = buffer.rfind(self.seperator)
+        if end != -1:
+            with memoryview(buffer) as view:
+                lines = bytes(view[:end]).split(self.seperator)
+            del buffer[:end + len(self.seperator)]
+
+        if buffer.startswith(self.prompt):
+            lines.append(self.prompt)
+            del buffer[:len(self.prompt)]
+
+        return lines
+
+    def flush(self) -> bytes:
+        """Discard and return any partial line left in the buffer"""
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
@@ -0,0 +1,44 @@
+import time
+from typing import List
+from .trace import RECEIVED, SENT
+
+ARROWS = {RECEIVED: '<', SENT: '>'}
+
+class History:
+    """Fixed-size ring of the most recent protocol exchanges, for dumping when something goes wrong
+
+    Entries are stored in preallocated slots, recording one costs a few list
+    stores and nothing is formatted until the ring is dumped.
+    """
+
+    def __init__(self, size: int = 64):
+        if size <= 0:
+            raise ValueError('History size must be positive')
+        self.size = size
+        self.times = [0.0] * size
+        self.directions = bytearray(size)
+        self.data: List[bytes] = [None] * size
+        self.index = 0
+        self.count = 0
+
+    def record(self, direction: int, data: bytes) -> None:
+        index = self.index
+        self.times[index] = time.monotonic()
+        self.directions[index] = direction
+        self.data[index] = data
+        self.index = (index + 1) % self.size
+        self.count += 1
+
+    def entries(self) -> List[tuple]:
+        """Recorded (time, direction, data) entries, oldest first"""
+        filled = min(self.count, self.size)
+        start = (self.index - filled) % self.size
+        slots = [(start + n) % self.size for n in range(filled)]
+        return [(self.times[n], self.directions[n], self.data[n]) for n in slots]
+
+    def dump(self) -> str:
+        entries = self.entries()
+        if not entries:
+            return ''
+        last = entries[-1][0]
+        return '\n'.join(f'{t - last:+9.3f}s {ARROWS[direction]} {data!r}' for t, direction, data in entries)
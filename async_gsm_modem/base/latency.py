@@ -0,0 +1,61 @@
+from collections import deque
+from typing import Dict
+import re
+from .command import Command, CompoundCommand
+
+FAMILY_PATTERN = re.compile(br'^AT[+&]?[A-Z]*', re.IGNORECASE)
+
+def command_family(command: Command) -> bytes:
+    """Key commands that should share a latency profile, e.g. ``AT+CREG?`` and ``AT+CREG=2`` -> ``AT+CREG``"""
+    if isinstance(command, CompoundCommand):
+        return bytes(command)
+    family = FAMILY_PATTERN.match(bytes(command))
+    return family.group(0).upper() if family else b''
+
+class LatencyTracker:
+    """Derives whole-response deadlines from the observed latency of each command family
+
+    A family's deadline is a multiple of the high percentile of its recent response
+    times, never below ``minimum`` and never above ``default``. Until ``min_samples``
+    responses have been seen ``default`` is used as is. An expired deadline is
+    recorded as a sample, so a family that starts timing out has its deadline
+    widened back towards the default.
+
+    Families with a configured deadline are never learned. Their duration depends on
+    the network or on how much data comes back, e.g. ``AT+CMGS`` and ``AT+CMGL``, so a
+    run of fast responses says nothing about the next one.
+
+    Attributes:
+        default -- Deadline for families without a configured deadline
+        defaults -- Configured deadlines keyed on command family, e.g. slow ``AT+CMGS``
+    """
+
+    def __init__(self, default: float = 5, defaults: Dict[bytes, float] = None, minimum: float = 0.5,
+                 factor: float = 3, percentile: float = 0.99, window: int = 64, min_samples: int = 8):
+        self.default = default
+        self.defaults = dict(defaults) if defaults else {}
+        self.minimum = minimum
+        self.factor = factor
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+
+        self.samples = {}
+        self.deadlines = {}
+
+    def deadline(self, family: bytes) -> float:
+        deadline = self.deadlines.get(family)
+        if deadline is None:
+            return self.defaults.get(family, self.default)
+        return deadline
+
+    def record(self, family: bytes, seconds: float) -> None:
+        samples = self.samples.get(family)
+        if samples is None:
+            samples = self.samples[family] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+        if len(samples) >= self.min_samples and family not in self.defaults:
+            ordered = sorted(samples)
+            high = ordered[round(self.percentile * (len(ordered) - 1))]
+            self.deadlines[family] = min(max(high * self.factor, self.minimum), self.default)
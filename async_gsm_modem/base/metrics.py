@@ -0,0 +1,130 @@
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets, the last bucket is unbounded
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Phases of a command that are timed
+QUEUE_WAIT = 'queue_wait' # waiting for a command queue slot
+WRITE = 'write' # writing and draining the command
+FIRST_LINE = 'first_line' # from the write until the first line of the response
+TOTAL = 'total' # from the write until the final result
+
+class Histogram:
+    """Fixed bucket histogram, buckets are counted individually and made cumulative on export"""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> Iterable[Tuple[str, int]]:
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield ('+Inf' if bound == float('inf') else repr(bound)), total
+
+    def snapshot(self) -> dict:
+        return {'count': self.count, 'sum': self.sum, 'buckets': dict(self.cumulative())}
+
+class Metrics:
+    """Command timings and counters of one modem, keyed on command family
+
+    Instrumentation is only done when a modem is created with ``metrics=True``,
+    otherwise every hook is skipped on a single attribute check.
+
+    Attributes:
+        timings -- Histogram per (family, phase)
+        commands -- Commands sent per family
+        timeouts -- Commands per family that got no final result in time
+        errors -- Commands per family that failed otherwise
+        urcs -- URCs received per code
+        bytes_in -- Bytes read from the modem
+        bytes_out -- Bytes written to the modem
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.timings: Dict[Tuple[bytes, str], Histogram] = {}
+        self.commands = defaultdict(int)
+        self.timeouts = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.urcs = defaultdict(int)
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def observe(self, family: bytes, phase: str, seconds: float) -> None:
+        histogram = self.timings.get((family, phase))
+        if histogram is None:
+            histogram = self.timings[(family, phase)] = Histogram(self.buckets)
+        histogram.observe(seconds)
+
+    def snapshot(self) -> dict:
+        families = {}
+        for family in set(self.commands) | {family for family, _ in self.timings}:
+            families[family.decode(errors='replace')] = {
+                'commands': self.commands.get(family, 0),
+                'timeouts': self.timeouts.get(family, 0),
+                'errors': self.errors.get(family, 0),
+                'timings': {
+                    phase: histogram.snapshot() for (f, phase), histogram in self.timings.items() if f == family
+                }
+            }
+        return {
+            'commands': families,
+            'urcs': {code.decode(errors='replace'): count for code, count in self.urcs.items()},
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out
+        }
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels: str) -> str:
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+def prometheus(modems: Iterable) -> str:
+    """Prometheus text exposition of the metrics of every instrumented modem, labelled with its device"""
+    modems = [modem for modem in modems if modem.metrics]
+    lines = [
+        '# HELP gsm_modem_command_seconds Time spent in each phase of a command',
+        '# TYPE gsm_modem_command_seconds histogram',
+    ]
+    for modem in modems:
+        for (family, phase), histogram in sorted(modem.metrics.timings.items()):
+            labels = dict(device=modem.device, family=family.decode(errors='replace'), phase=phase)
+            for bound, count in histogram.cumulative():
+                lines.append(f'gsm_modem_command_seconds_bucket{_labels(**labels, le=bound)} {count}')
+            lines.append(f'gsm_modem_command_seconds_sum{_labels(**labels)} {histogram.sum}')
+            lines.append(f'gsm_modem_command_seconds_count{_labels(**labels)} {histogram.count}')
+
+    for name, attribute, help in (
+        ('gsm_modem_commands_total', 'commands', 'Commands sent'),
+        ('gsm_modem_command_timeouts_total', 'timeouts', 'Commands without a final result in time'),
+        ('gsm_modem_command_errors_total', 'errors', 'Commands that failed'),
+    ):
+        lines += [f'# HELP {name} {help}', f'# TYPE {name} counter']
+        for modem in modems:
+            for family, count in sorted(getattr(modem.metrics, attribute).items()):
+                lines.append(f'{name}{_labels(device=modem.device, family=family.decode(errors="replace"))} {count}')
+
+    lines += ['# HELP gsm_modem_urcs_total Unsolicited result codes received', '# TYPE gsm_modem_urcs_total counter']
+    for modem in modems:
+        for code, count in sorted(modem.metrics.urcs.items()):
+            lines.append(f'gsm_modem_urcs_total{_labels(device=modem.device, code=code.decode(errors="replace"))} {count}')
+
+    for name, attribute, help in (
+        ('gsm_modem_received_bytes_total', 'bytes_in', 'Bytes read from the modem'),
+        ('gsm_modem_sent_bytes_total', 'bytes_out', 'Bytes written to the modem'),
+    ):
+        lines += [f'# HELP {name} {help}', f'# TYPE {name} counter']
+        for modem in modems:
+            lines.append(f'{name}{_labels(device=modem.device)} {getattr(modem.metrics, attribute)}')
+    return '\n'.join(lines) + '\n'
@@ -1,157 +1,625 @@
 import asyncio
+import time
 from contextlib import asynccontextmanager
 from asyncio.exceptions import IncompleteReadError, TimeoutError, CancelledError
+from dataclasses import dataclass, field
 from datetime import datetime
 from serial.serialutil import SerialException
-import serial_asyncio
-from typing import Type, Callable, List, Tuple
-from .command import Command
+from typing import Type, Callable, Dict, List, Tuple
+from .command import Command, CompoundCommand, ExtendedCommand
+from .command_queue import CommandQueue, Priority
 from .response import Response, UnsolicitedResultCode
-from .exceptions import CommandError, CommandFailed, ModemConnectionError
+from .urc_queue import URCQueue
+from .framer import LineFramer
+from .result_codes import compile_result_codes
+from .latency import LatencyTracker, command_family
+from .transport import Transport, get_transport
+from .cmux import CmuxTransport, Multiplexer
+from .metrics import Metrics, QUEUE_WAIT, WRITE, FIRST_LINE, TOTAL
+from .trace import TraceRecorder, RECEIVED, SENT, ABANDONED, SENTINELS_LOST
+from .history import History
+from .exceptions import CommandError, CommandFailed, CommandQueueFull, ModemConnectionError
 import logging
 import re
 
 AT_PATTERN = re.compile(br'^AT(\+[^?=]+)[?=]{1}')
 
+@dataclass
+class PendingCommand:
+    """A command that has been written and is waiting for its final result"""
+    command: Command
+    future: asyncio.Future
+    expected_response: bytes = None
+    terminator: bytes = b'OK'
+    prompt: bool = False
+    chunks: List[bytes] = field(default_factory=list)
+    first_line: float = None
+
 class ATModem:
 
     RESP_SEPERATOR = b'\r\n'
     RESP_TERMINATOR = b'OK'
     CMD_TERMINATOR = b'\r'
     ERROR_TERMINATOR = b'ERROR'
+    PROMPT = b'> '
+    ABORT_INPUT = b'\x1b'
+    # written to resync, its reply (the value of S3, the command line terminator) can't be mistaken for a late result
+    SENTINEL = Command(b'ATS3?')
+    SENTINEL_RESPONSE = b'013'
+    # command families that must not run twice, they are never replayed after a reconnect
+    NON_IDEMPOTENT = (b'AT+CMGS', b'AT+CMSS', b'AT+CMGW', b'AT+CMGD', b'ATD', b'ATA', b'AT+CFUN', b'AT+CMUX')
+    # commands that mark what they return as read, replayed they would come back empty
+    STATUS_CHANGING = (b'AT+CMGL=0', b'AT+CMGL="REC UNREAD"')
+    # URCs announcing that the modem restarted and lost its configuration
+    RESET_URCS = ()
+    READ_SIZE = 4096
+    # AT+CMUX <port_speed> values
+    CMUX_PORT_SPEEDS = {9600: b'1', 19200: b'2', 38400: b'3', 57600: b'4', 115200: b'5', 230400: b'6'}
 
-    def __init__(self, device: str, baud_rate: int, urc: List[Tuple[bytes, int]] = None, error_codes: List[bytes] = None):
+    def __init__(self, device: str, baud_rate: int, urc: List[Tuple[bytes, int]] = None, error_codes: List[bytes] = None,
+                 urc_queue_size: int = 256, urc_overflow: str = URCQueue.DROP_OLDEST, command_queue_size: int = 0,
+                 timeout: float = 5, deadlines: Dict[bytes, float] = None, reconnect: bool = False,
+                 reconnect_delay: float = 0.5, reconnect_max_delay: float = 30, reconnect_timeout: float = 60,
+                 metrics: bool = False, trace: str = None, history: int = 64):
         self.device = device
         self.baud_rate = baud_rate
+        self.transport = get_transport(device, baud_rate)
+        self.config = dict(
+            urc_queue_size=urc_queue_size,
+            urc_overflow=urc_overflow,
+            command_queue_size=command_queue_size,
+            timeout=timeout,
+            deadlines=deadlines,
+            reconnect=reconnect,
+            reconnect_delay=reconnect_delay,
+            reconnect_max_delay=reconnect_max_delay,
+            reconnect_timeout=reconnect_timeout,
+            metrics=metrics,
+            history=history
+        )
 
-        self.urc = urc if urc else []
-        self.urc_buffer = []
-
-        self.error_codes = error_codes if error_codes else []
+        self._urc = tuple(urc) if urc else ()
+        self._error_codes = tuple(error_codes) if error_codes else ()
+        self.compile_result_codes()
+        self.urc_queue = URCQueue(urc_queue_size, urc_overflow)
+        self.urc_code = None
+        self.urc_chunks = None
+        self.urc_chunks_remaining = 0
 
-        self.write_lock = asyncio.Lock()
-        self.read_lock = asyncio.Lock()
-        self.read_task = None
+        self.framer = LineFramer(self.RESP_SEPERATOR, self.PROMPT)
+        self.command_queue = CommandQueue(command_queue_size)
+        self.latency = LatencyTracker(timeout, deadlines)
+        self.pending = None
+        self.command_written = asyncio.Event()
+        self.orphaned = 0
+        self.orphan_terminators = set()
+        self.abort_input = False
+        self.sentinels = 0
+        self.sentinel = None
+        self.sentinel_answered = False
+        self.resyncs = 0
+        self.discarded_lines = 0
         self.read_loop_task = None
+        self.urc_handler_loop_task = None
+        self.mux = None
+        self.metrics = Metrics() if metrics else None
+        self.trace_path = trace
+        self.trace = None
+        self.history = History(history) if history else None
+
+        self.reconnect = reconnect
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.reconnect_timeout = reconnect_timeout
+        self.connected = asyncio.Event()
+        self.closing = False
+        self.reconnect_task = None
+        self.reconnects = 0
+        self.downtime = 0.0
+        self.disconnected_at = None
 
         self.at_logger = logging.getLogger('ATModem')
 
+    @property
+    def urc(self) -> Tuple[Tuple[bytes, int], ...]:
+        return self._urc
+
+    @urc.setter
+    def urc(self, urc: List[Tuple[bytes, int]]) -> None:
+        self._urc = tuple(urc)
+        self.compile_result_codes()
+
+    @property
+    def error_codes(self) -> Tuple[bytes, ...]:
+        return self._error_codes
+
+    @error_codes.setter
+    def error_codes(self, error_codes: List[bytes]) -> None:
+        self._error_codes = tuple(error_codes)
+        self.compile_result_codes()
+
+    def compile_result_codes(self) -> None:
+        self.result_codes = compile_result_codes(self._urc, self._error_codes + (self.ERROR_TERMINATOR,))
+
     async def initialize(self) -> None:
-        await self.send_command(Command(b'AT'))
-        await self.send_command(Command(b'ATE0'))
-    
-    async def connect(self) -> None:
-        self.reader, self.writer = await serial_asyncio.open_serial_connection(
-            url=self.device,
-            baudrate=self.baud_rate
-        )
+        await self.send_commands([Command(b'AT'), Command(b'ATE0')])
+
+    async def open(self) -> None:
+        try:
+            self.reader, self.writer = await self.transport.open()
+        except (OSError, SerialException) as e:
+            self.at_logger.error(f'Failed to open {self.device}', exc_info=True)
+            raise ModemConnectionError from e
         self.at_logger.debug(f'Connected to {self.device}')
+        if self.trace:
+            self.trace.session()
+        elif self.trace_path:
+            self.trace = TraceRecorder(self.trace_path)
+        self.framer.flush()
+        self.start_read_loop()
+
+    async def connect(self) -> None:
+        self.closing = False
+        await self.open()
+        self.start_urc_handler_loop()
+        self.connected.set()
         try:
             await self.initialize()
         except Exception as e:
             self.at_logger.error('Failed to connect to modem', exc_info=True)
+            await self.close()
             raise ModemConnectionError from e
-        self.start_read_loop()
-        self.start_urc_handler_loop()
 
     async def close(self) -> None:
+        self.closing = True
+        self.connected.clear()
+        if self.reconnect_task and self.reconnect_task is not asyncio.current_task():
+            self.reconnect_task.cancel()
+            try:
+                await self.reconnect_task
+            except CancelledError:
+                pass
         await self.stop_read_loop()
         await self.stop_urc_handler_loop()
+        if self.mux:
+            await self.mux.close()
+            self.mux = None
         self.writer.close()
         await self.writer.wait_closed()
+        if self.trace:
+            self.trace.close()
+            self.trace = None
         self.at_logger.debug(f'Modem closed')
 
+    def spawn(self, transport: Transport) -> 'ATModem':
+        """Create a modem configured like this one that runs over another transport"""
+        modem = ATModem(self.device, self.baud_rate, self.urc, self.error_codes, **self.config)
+        modem.transport = transport
+        return modem
+
+    async def multiplex(self, channels: int = 2, frame_size: int = 127) -> List['ATModem']:
+        """Switch the link to 3GPP TS 27.010 multiplexing and return a connected modem per virtual channel
+
+        This modem stops reading the link itself, closing it also closes the multiplexer.
+        """
+        port_speed = self.CMUX_PORT_SPEEDS.get(self.baud_rate, b'5')
+        await self.send_command(ExtendedCommand(b'AT+CMUX').write(b'0', b'0', port_speed, str(frame_size).encode()))
+
+        # from here on the link carries frames instead of lines
+        await self.stop_read_loop()
+        await self.stop_urc_handler_loop()
+        self.framer.flush()
+        self.mux = Multiplexer(self.reader, self.writer, frame_size)
+        await self.mux.start()
+
+        modems = []
+        for dlci in range(1, channels + 1):
+            modem = self.spawn(CmuxTransport(self.mux, dlci))
+            await modem.connect()
+            modems.append(modem)
+        return modems
+
     async def write(self, command: Command, terminator: bytes = None) -> None:
         terminator = terminator if terminator else self.CMD_TERMINATOR
-        self.writer.write(bytes(command)+terminator)
+        data = bytes(command) + terminator
+        self.writer.write(data)
         await self.writer.drain()
-        self.at_logger.debug(command)
+        if self.history:
+            self.history.record(SENT, data)
+        if self.trace:
+            self.trace.record(SENT, data)
+        if self.metrics:
+            self.metrics.bytes_out += len(data)
+        self.at_logger.debug('%s', command)
 
-    async def read(self, seperator: bytes = None, timeout: int = 5) -> bytes:
-        seperator = seperator if seperator else self.RESP_SEPERATOR
-        async with self.read_lock:
-            try:
-                self.read_task = asyncio.create_task(self.reader.readuntil(seperator))
-                data = await asyncio.wait_for(self.read_task, timeout)
-                return data.rstrip(seperator) if data else None
-            except IncompleteReadError:
-                self.at_logger.debug('Read was canceled before completion')
-
-    async def cancel_read(self) -> None:
-        if self.read_task and not self.read_task.done():
-            self.read_task.cancel()
-            try:
-                await self.read_task
-            except CancelledError:
-                return
+    async def read(self) -> List[bytes]:
+        """Read whatever bytes are available and return the complete lines they finish"""
+        data = await self.reader.read(self.READ_SIZE)
+        if not data:
+            raise IncompleteReadError(bytes(self.framer.buffer), None)
+        if self.trace:
+            self.trace.record(RECEIVED, data)
+        if self.metrics:
+            self.metrics.bytes_in += len(data)
+        return self.framer.feed(data)
 
-    async def send_command(self, command: Command, response_terminator: bytes = None, timeout: int = 5) -> List[bytes]:
+    async def send_command(self, command: Command, response_terminator: bytes = None, timeout: float = None,
+                           priority: Priority = Priority.NORMAL) -> Response:
         try:
-            async with self.write_lock:
-                # if we acquire a write lock but have a read going, cancel it
-                await self.cancel_read()
-
-                await self.write(command)
-                extended_command = AT_PATTERN.match(bytes(command))
-                expected_response = extended_command.group(1) if extended_command else None
-                response = await self.read_response(expected_response=expected_response, terminator=response_terminator, timeout=timeout)
-                self.at_logger.debug(response)
-                return response
-        except SerialException as e:
+            while True:
+                await self.wait_connected(command)
+                queued = time.monotonic() if self.metrics else None
+                async with self.command_queue.slot(priority):
+                    if self.metrics:
+                        self.metrics.observe(command_family(command), QUEUE_WAIT, time.monotonic() - queued)
+                    if not self.ready():
+                        # the connection dropped while this command was queued
+                        continue
+                    try:
+                        response = await self.transact(command, response_terminator=response_terminator, timeout=timeout)
+                    except (ModemConnectionError, ConnectionError, SerialException):
+                        if not (self.reconnect and self.idempotent(command)):
+                            raise
+                        self.at_logger.warning(f'Connection lost, replaying {command} once reconnected')
+                        continue
+                    self.at_logger.debug('%s', response)
+                    return response
+        except CommandQueueFull:
+            self.at_logger.error(f'Failed to queue command: {command}')
+            raise
+        except ModemConnectionError:
+            self.at_logger.error(f'Failed to send command: {command}', exc_info=True)
+            raise
+        except (ConnectionError, SerialException) as e:
             self.at_logger.error(f'Failed to send command: {command}', exc_info=True)
             raise ModemConnectionError from e
         except Exception as e:
             self.at_logger.error(f'Failed to send command: {command}', exc_info=True)
             raise CommandFailed from e
 
-    async def read_response(self, expected_response: bytes = None, seperator: bytes = None, terminator: bytes = None, timeout: int = 5) -> Response:
-        seperator = seperator if seperator else self.RESP_SEPERATOR
-        terminator = terminator if terminator else self.RESP_TERMINATOR
-        response_chunks = []
-        while True:
-            try:
-                response_chunk = await self.read(seperator, timeout)
-            except:
-                self.at_logger.debug(f'Read error, partial response: {response_chunks}')
+    async def send_commands(self, commands: List[Command], timeout: float = None, priority: Priority = Priority.NORMAL,
+                            return_exceptions: bool = False) -> List[Response]:
+        """Send several commands in a single round trip and return one response per command
+
+        If a command in the chain fails its ``CommandError`` records which command it
+        belongs to. With ``return_exceptions`` the error takes that command's place in
+        the result, and the commands after it that never ran are given ``CommandFailed``.
+        When the failing command can't be told apart from commands that succeed without
+        output ``error.command`` is None, and every command that may have failed gets
+        the error.
+        """
+        compound = CompoundCommand(*commands)
+        try:
+            return compound.split(await self.send_command(compound, timeout=timeout, priority=priority))
+        except CommandFailed as e:
+            error = e.__cause__
+            if not isinstance(error, CommandError):
                 raise
+            responses = compound.split(error.chunks)
+            failed = compound.failed_index(responses)
+            if failed is None:
+                error.command = None
+                if not return_exceptions:
+                    raise
+                answered = [n for n, response in enumerate(responses) if response.chunks]
+                suspects = answered[-1] + 1 if answered else 0
+                return responses[:suspects] + [error] * (len(commands) - suspects)
+            error.command = commands[failed]
+            if not return_exceptions:
+                raise
+            skipped = [CommandFailed(f'Not executed, {commands[failed]} failed') for _ in commands[failed + 1:]]
+            return responses[:failed] + [error] + skipped
 
-            error_code = next(filter(lambda error_code: response_chunk.startswith(error_code), self.error_codes), None)
-            if error_code or response_chunk == self.ERROR_TERMINATOR:
-                raise CommandError(error=response_chunk)
+    async def transact(self, command: Command, terminator: bytes = None, expected_response: bytes = None,
+                       response_terminator: bytes = None, prompt: bool = False, timeout: float = None,
+                       family: bytes = None) -> Response:
+        """Write a command and wait for the read loop to deliver its final result.
 
-            # if URC was received read it out and push to urc buffer then continue processing expected response
-            urc = next(filter(lambda x: response_chunk.startswith(x[0]), self.urc), None)
-            expected = response_chunk.startswith(expected_response) if expected_response else False
-            if urc and not expected:
-                try:
-                    code, n_chunks = urc
-                    self.at_logger.debug(f'Received URC: {code}')
-                    urc_chunks = [response_chunk]
-                    for n in range(n_chunks - 1):
-                        urc_chunks.append(await self.read(seperator))
-                    self.urc_buffer.append(UnsolicitedResultCode(chunks=urc_chunks, code=code))
-                except (CancelledError, TimeoutError):
-                    raise
-                except:
-                    self.at_logger.error('URC was received but failed to process', exc_info=True)
-                    raise
-            elif response_chunk is None or response_chunk == terminator:
-                break
-            elif response_chunk:
-                response_chunks.append(response_chunk)
+        Without an explicit ``timeout`` the whole response must arrive within the
+        deadline learned for the command's family. The caller must hold a
+        ``command_queue`` slot.
+        """
+        if not self.ready():
+            raise ModemConnectionError(f'Not connected to {self.device}')
+        if self.orphaned or self.abort_input:
+            # a late prompt settles its orphan but leaves the modem waiting for message input
+            await self.resync()
+
+        if family is None:
+            # a prompt arrives long before the final result of the same command, profile it separately
+            family = command_family(command) + (self.PROMPT if prompt else b'')
+        if timeout is None:
+            timeout = self.latency.deadline(family)
 
-        return Response(response_chunks)
+        pending = self.expect(command, expected_response, response_terminator, prompt)
+        written = False
+        loop = asyncio.get_running_loop()
+        metrics = self.metrics
+        if metrics:
+            metrics.commands[family] += 1
+            write_start = time.monotonic()
+        try:
+            await self.write(command, terminator)
+            written = True
+            start = loop.time()
+            if metrics:
+                metrics.observe(family, WRITE, time.monotonic() - write_start)
+            try:
+                return await asyncio.wait_for(pending.future, timeout)
+            finally:
+                if pending.future.done() and not pending.future.cancelled():
+                    self.latency.record(family, loop.time() - start)
+                    if metrics:
+                        end = time.monotonic()
+                        metrics.observe(family, TOTAL, end - write_start)
+                        metrics.observe(family, FIRST_LINE, (pending.first_line or end) - write_start)
+        except TimeoutError:
+            self.at_logger.debug('Timed out waiting for response, partial response: %s', pending.chunks)
+            self.dump_history(f'Timed out waiting for {command}')
+            self.latency.record(family, timeout)
+            if metrics:
+                metrics.timeouts[family] += 1
+            raise
+        except Exception:
+            if metrics:
+                metrics.errors[family] += 1
+            raise
+        finally:
+            if self.pending is pending:
+                if written:
+                    # the rest of the response is still on its way, it must not reach the next command
+                    self.abandon(pending)
+                else:
+                    self.pending = None
+
+    def abandon(self, pending: PendingCommand) -> None:
+        """Stop waiting for a written command, the rest of its response is discarded when it arrives"""
+        if self.pending is pending:
+            self.pending = None
+        self.orphaned += 1
+        self.abort_input = self.abort_input or pending.prompt
+        if pending.terminator != self.RESP_TERMINATOR:
+            self.orphan_terminators.add(pending.terminator)
+        if self.trace:
+            self.trace.record(ABANDONED, bytes(pending.command))
+
+    def expect(self, command: Command, expected_response: bytes = None, response_terminator: bytes = None,
+               prompt: bool = False) -> PendingCommand:
+        """Make ``command`` the pending command that received lines are routed to"""
+        if expected_response is None and isinstance(command, CompoundCommand):
+            expected_response = tuple(prefix for prefix in command.prefixes if prefix)
+        elif expected_response is None:
+            extended_command = AT_PATTERN.match(bytes(command))
+            expected_response = extended_command.group(1) if extended_command else None
+
+        self.pending = PendingCommand(
+            command=command,
+            future=asyncio.get_running_loop().create_future(),
+            expected_response=expected_response,
+            terminator=response_terminator if response_terminator else self.RESP_TERMINATOR,
+            prompt=prompt
+        )
+        self.command_written.set()
+        return self.pending
+
+    async def resync(self, timeout: float = None) -> None:
+        """Bring the line stream back to a known state after commands were abandoned
+
+        A sentinel command is written and every line before its reply is discarded,
+        however many results the abandoned commands were still owed. An abandoned
+        ``> `` prompt is aborted first so the sentinel is not taken as message input.
+
+        The reply is waited for within the deadline learned for ``AT``. If it is late
+        the caller goes ahead regardless, its response comes after the sentinel's and
+        lines keep being discarded until then. When an earlier sentinel is still
+        unanswered as well the modem is taken to have lost them and they are forgotten.
+        """
+        timeout = timeout if timeout else self.latency.deadline(b'AT')
+        self.resyncs += 1
+        discarded = self.discarded_lines
+        sentinel = self.expect_sentinel()
+        if self.abort_input:
+            await self.write(Command(self.ABORT_INPUT))
+            self.abort_input = False
+        await self.write(self.SENTINEL)
+        await asyncio.wait((sentinel,), timeout=timeout)
+        if not self.ready():
+            raise ModemConnectionError(f'Connection to {self.device} lost while resyncing')
+        if not sentinel.done():
+            self.dump_history('Failed to resync')
+            if self.sentinels > 1:
+                self.at_logger.warning('Failed to resync, %d sentinel(s) unanswered, giving up on them', self.sentinels)
+                self.reset_sentinels()
+                if self.trace:
+                    self.trace.record(SENTINELS_LOST, b'')
+            else:
+                self.at_logger.warning('Failed to resync within %ss, discarding lines until the sentinel is answered',
+                                       timeout)
+            return
+        self.at_logger.debug('Resynced, discarded %d stray line(s)', self.discarded_lines - discarded)
+
+    def expect_sentinel(self) -> asyncio.Future:
+        """Discard every line up to the reply of a sentinel about to be written, returns a future resolved by it"""
+        # whatever the abandoned commands still owe arrives before the sentinel's reply
+        self.orphaned = 0
+        self.orphan_terminators.clear()
+        if self.sentinel is None:
+            self.sentinel = asyncio.get_running_loop().create_future()
+        self.sentinels += 1
+        self.command_written.set()
+        return self.sentinel
+
+    def reset_sentinels(self) -> None:
+        """Stop waiting for sentinels, a resync waiting on one returns"""
+        if self.sentinel is not None and not self.sentinel.done():
+            self.sentinel.cancel()
+        self.sentinel = None
+        self.sentinels = 0
+        self.sentinel_answered = False
+
+    def dump_history(self, reason: str) -> None:
+        """Log the most recent exchanges, so failures can be investigated without DEBUG logging"""
+        if self.history:
+            self.at_logger.warning('%s, last %d line(s) exchanged:\n%s', reason, min(self.history.count, self.history.size),
+                                   self.history.dump())
+
+    def ready(self) -> bool:
+        # commands sent while reconnecting, i.e. by initialize(), must not wait for the reconnect
+        return self.connected.is_set() or (self.reconnect_task is not None and asyncio.current_task() is self.reconnect_task)
+
+    def idempotent(self, command: Command) -> bool:
+        commands = command.commands if isinstance(command, CompoundCommand) else (command,)
+        return not any(command_family(c) in self.NON_IDEMPOTENT or bytes(c).upper() in self.STATUS_CHANGING
+                       for c in commands)
+
+    async def wait_connected(self, command: Command) -> None:
+        """Wait for a reconnect before sending an idempotent command, anything else fails fast"""
+        if self.ready():
+            return
+        if not self.reconnect or self.closing:
+            raise ModemConnectionError(f'Not connected to {self.device}')
+        if not self.idempotent(command):
+            raise ModemConnectionError(f'Not connected to {self.device}, {command} is not replayed')
+        try:
+            await asyncio.wait_for(self.connected.wait(), self.reconnect_timeout)
+        except TimeoutError as e:
+            raise ModemConnectionError(f'Not reconnected to {self.device} within {self.reconnect_timeout}s') from e
+
+    def connection_lost(self) -> None:
+        if not self.connected.is_set():
+            return
+        self.connected.clear()
+        self.disconnected_at = time.monotonic()
+        self.resolve_pending(exception=ModemConnectionError())
+        self.reset_sentinels()
+        if self.reconnect and not self.closing:
+            self.reconnect_task = asyncio.create_task(self.reconnect_loop())
+
+    async def reconnect_loop(self) -> None:
+        """Reopen the connection with exponential backoff and run ``initialize`` again"""
+        delay = self.reconnect_delay
+        while not self.closing:
+            await self.stop_read_loop()
+            try:
+                self.writer.close()
+            except Exception:
+                pass
+            self.pending = None
+            self.orphaned = 0
+            self.orphan_terminators.clear()
+            self.abort_input = False
+            self.reset_sentinels()
+            self.urc_code, self.urc_chunks = None, None
+
+            try:
+                await self.open()
+                await self.initialize()
+            except Exception:
+                self.at_logger.warning(f'Failed to reconnect to {self.device}, retrying in {delay}s', exc_info=True)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.reconnect_max_delay)
+                continue
+
+            self.reconnects += 1
+            self.downtime += time.monotonic() - self.disconnected_at
+            self.connected.set()
+            self.at_logger.info(f'Reconnected to {self.device} after {time.monotonic() - self.disconnected_at:.1f}s')
+            return
+
+    def resolve_pending(self, result: Response = None, exception: Exception = None) -> None:
+        pending, self.pending = self.pending, None
+        if pending is None or pending.future.done():
+            return
+        if exception is not None:
+            pending.future.set_exception(exception)
+        else:
+            pending.future.set_result(result)
+
+    def handle_line(self, line: bytes) -> UnsolicitedResultCode:
+        """Route a received line, returning the URC it completes (if any)"""
+        if not line:
+            return
+        if self.history:
+            self.history.record(RECEIVED, line)
+
+        # continue collecting a multi-line URC before anything else
+        if self.urc_chunks is not None:
+            self.urc_chunks.append(line)
+            self.urc_chunks_remaining -= 1
+            if self.urc_chunks_remaining <= 0:
+                urc = UnsolicitedResultCode(chunks=self.urc_chunks, code=self.urc_code)
+                self.urc_code, self.urc_chunks = None, None
+                return urc
+            return
+
+        pending = self.pending
+        result_code = self.result_codes.classify(line)
+        urc = result_code and not result_code.error
+
+        # a resync is pending, nothing before the sentinel's reply belongs to a live command
+        if self.sentinels and not urc:
+            if line == self.SENTINEL_RESPONSE:
+                self.sentinel_answered = True
+            elif self.sentinel_answered and line == self.RESP_TERMINATOR:
+                self.sentinel_answered = False
+                self.sentinels -= 1
+                if not self.sentinels:
+                    sentinel, self.sentinel = self.sentinel, None
+                    if not sentinel.done():
+                        sentinel.set_result(None)
+            else:
+                self.sentinel_answered = False
+                self.discarded_lines += 1
+                self.at_logger.debug('Discarded stray line: %s', line)
+            return
+
+        # leftovers of an abandoned command, discard them until its final result has been seen
+        if self.orphaned and not urc:
+            self.discarded_lines += 1
+            if result_code or line in (self.RESP_TERMINATOR, self.PROMPT) or line in self.orphan_terminators:
+                self.orphaned -= 1
+                if not self.orphaned:
+                    self.orphan_terminators.clear()
+            self.at_logger.debug('Discarded stray line: %s', line)
+            return
+
+        if pending and self.metrics and pending.first_line is None and not urc:
+            pending.first_line = time.monotonic()
+
+        if line == self.PROMPT and pending and pending.prompt:
+            self.resolve_pending(Response([]))
+            return
+
+        if result_code and result_code.error and pending:
+            self.resolve_pending(exception=CommandError(error=line, chunks=pending.chunks))
+            return
+
+        # if URC was received hand it back for queueing then continue processing the pending command
+        expected = line.startswith(pending.expected_response) if pending and pending.expected_response else False
+        if urc and not expected:
+            code, n_chunks, _ = result_code
+            self.at_logger.debug('Received URC: %s', code)
+            if n_chunks > 1:
+                self.urc_code, self.urc_chunks = code, [line]
+                self.urc_chunks_remaining = n_chunks - 1
+            else:
+                return UnsolicitedResultCode(chunks=[line], code=code)
+        elif pending is None:
+            self.at_logger.warning(f'Unexpected response received: {line}')
+        elif line == pending.terminator:
+            self.resolve_pending(Response(pending.chunks))
+        else:
+            pending.chunks.append(line)
 
     async def urc_handler_loop(self) -> None:
         while True:
+            urc = await self.urc_queue.get()
             try:
-                if self.urc_buffer:
-                    await self.urc_handler(self.urc_buffer.pop(0))
+                await self.urc_handler(urc)
             except CancelledError:
                 raise
             except Exception as e:
                 self.at_logger.error(e, exc_info=True)
-            await asyncio.sleep(0.1)
 
     def start_urc_handler_loop(self) -> None:
         self.urc_handler_loop_task = asyncio.create_task(self.urc_handler_loop())
@@ -166,17 +634,56 @@ class ATModem:
 
     async def urc_handler(self, response: UnsolicitedResultCode) -> None:
         pass
-                
-    async def read_loop(self):
+
+    async def read_loop(self) -> None:
         while True:
             try:
-                if not self.write_lock.locked() and not self.read_lock.locked():
-                    response = await self.read_response()
-                    if response:
-                        self.at_logger.warn(f'Unexpected response received: {response}')
-            except TimeoutError:
-                pass
-            await asyncio.sleep(0.1)
+                lines = await self.read()
+            except CancelledError:
+                raise
+            except (IncompleteReadError, ConnectionError, SerialException) as e:
+                self.at_logger.error('Connection to modem lost', exc_info=True)
+                self.dump_history('Connection to modem lost')
+                self.resolve_pending(exception=ModemConnectionError())
+                self.connection_lost()
+                return
+            except Exception:
+                self.at_logger.error('Failed to read from modem', exc_info=True)
+                continue
+
+            for line in lines:
+                try:
+                    urc = self.handle_line(line)
+                except Exception:
+                    self.at_logger.error(f'Failed to handle line: {line}', exc_info=True)
+                    continue
+
+                if urc:
+                    if self.metrics:
+                        self.metrics.urcs[urc.code] += 1
+                    if urc.code in self.RESET_URCS and self.reconnect and self.connected.is_set():
+                        self.at_logger.warning(f'Modem restarted: {urc.code}')
+                        self.connection_lost()
+                    self.urc_queue.put_nowait(urc)
+
+            if self.urc_queue.backlog:
+                await self.wait_for_urc_handler()
+
+    async def wait_for_urc_handler(self) -> None:
+        """Stop reading while the URC handler is behind, the modem holds its output meanwhile
+
+        Reading goes on whenever a command waits for its result, so a handler that
+        sends commands itself is never stuck behind the URCs it hasn't handled yet.
+        """
+        queue = self.urc_queue
+        while queue.backlog and self.pending is None and not self.sentinels:
+            self.command_written.clear()
+            waiters = [asyncio.create_task(queue.drained.wait()), asyncio.create_task(self.command_written.wait())]
+            try:
+                await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
 
     def start_read_loop(self):
         self.read_loop_task = asyncio.create_task(self.read_loop())
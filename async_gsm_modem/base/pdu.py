@@ -1,9 +1,12 @@
 # Implementation from https://github.com/babca/python-gsmmodem/blob/master/gsmmodem/pdu.py
 from __future__ import unicode_literals
 
-import sys, codecs
+import sys, codecs, re, binascii
+from functools import lru_cache
+from itertools import islice
 from datetime import datetime, timedelta, tzinfo
-from copy import copy
+from base64 import b16encode
+from .exceptions import EncodingError
 
 MAX_INT = sys.maxsize
 dictItemsIter = dict.items
@@ -28,6 +31,21 @@ GSM7_EXTENDED = {
     '€':  chr(0x65)
 }
 
+# Lookup tables for the GSM-7 codec, built once from the alphabets above
+# (the chr(0xFF) entry has never been encodable or decodable and is left out)
+_GSM7_EXTENDED_CODES = {char: ord(value) for char, value in dictItemsIter(GSM7_EXTENDED) if type(value) == str}
+GSM7_ENCODING_MAP = {ord(char): idx for idx, char in enumerate(GSM7_BASIC)}
+GSM7_ENCODING_MAP.update({ord(char): bytes((0x1B, value)) for char, value in dictItemsIter(_GSM7_EXTENDED_CODES)})
+GSM7_DECODING_TABLE = GSM7_BASIC
+# Text decoded with the basic table keeps ESC followed by the basic character of the next octet,
+# each of those pairs is then swapped for its extended character
+GSM7_EXTENDED_DECODING_TABLE = {GSM7_BASIC[value]: char for char, value in dictItemsIter(_GSM7_EXTENDED_CODES)}
+GSM7_ESCAPE_PATTERN = re.compile('\x1b(.?)', re.DOTALL)
+GSM7_SEPTETS = dict.fromkeys(GSM7_BASIC, 1)
+GSM7_SEPTETS.update(dict.fromkeys(_GSM7_EXTENDED_CODES, 2))
+GSM7_CHARACTERS = frozenset(GSM7_SEPTETS)
+GSM7_EXTENDED_CHARACTERS = frozenset(_GSM7_EXTENDED_CODES)
+
 # Maximum message sizes for each data coding
 MAX_MESSAGE_LENGTH = {
     0x00: 160, # GSM-7
@@ -81,6 +99,9 @@ class SmsPduTzInfo(tzinfo):
     def utcoffset(self, dt):
         return self._offset
 
+    def __repr__(self):
+        return 'SmsPduTzInfo({0})'.format(self._offset)
+
     def dst(self, dt):
         """ We do not have enough info in the SMS PDU to implement daylight savings time """
         return timedelta(0)
@@ -111,6 +132,8 @@ class InformationElement(object):
             return super(InformationElement, cls).__new__(cls)
         return super(InformationElement, targetClass).__new__(targetClass)
 
+    __slots__ = ('id', 'dataLength', 'data')
+
     def __init__(self, iei, ieLen=0, ieData=None):
         self.id = iei # IEI
         self.dataLength = ieLen # IE Length
@@ -164,6 +187,8 @@ class Concatenation(InformationElement):
         increment for every short message which makes up the concatenated short message
     """
 
+    __slots__ = ('reference', 'parts', 'number')
+
     def __init__(self, iei=0x00, ieLen=0, ieData=None):
         super(Concatenation, self).__init__(iei, ieLen, ieData)
         if ieData != None:
@@ -196,6 +221,8 @@ class PortAddress(InformationElement):
     source: The source port number
     """
 
+    __slots__ = ('destination', 'source')
+
     def __init__(self, iei=0x04, ieLen=0, ieData=None):
         super(PortAddress, self).__init__(iei, ieLen, ieData)
         if ieData != None:
@@ -259,7 +286,26 @@ def encodeSmsSubmitPdu(number, text, reference=0, validity=None, smsc=None, requ
     :return: A list of one or more tuples containing the SMS PDU (as a bytearray, and the length of the TPDU part
     :rtype: list of tuples
     """
+    return [(bytearray(pdu), tpduLength) for pdu, tpduLength in
+            _buildSmsSubmitPdus(number, text, reference, validity, smsc, requestStatusReport, rejectDuplicates, sendFlash)]
+
+def encodeSmsSubmitPduHex(number, text, reference=0, validity=None, smsc=None, requestStatusReport=True, rejectDuplicates=False, sendFlash=False):
+    """ Creates the same SMS-SUBMIT PDU(s) as encodeSmsSubmitPdu, as uppercase ASCII hex ready to be sent after AT+CMGS
+
+    :return: A list of one or more tuples containing the hex encoded SMS PDU (as bytes), and the length of the TPDU part
+    :rtype: list of tuples
+    """
+    return [(b16encode(pdu), tpduLength) for pdu, tpduLength in
+            _buildSmsSubmitPdus(number, text, reference, validity, smsc, requestStatusReport, rejectDuplicates, sendFlash)]
 
+def _buildSmsSubmitPdus(number, text, reference, validity, smsc, requestStatusReport, rejectDuplicates, sendFlash):
+    """ Generates (pdu, tpduLength) for each part of the message
+
+    The text is encoded once and the encoded text is divided into parts. The header, which is the
+    same for every part, is written once into a buffer that every part's user data is then
+    written after, so the yielded pdu is the same bytearray every time and must be consumed
+    before the next part is generated.
+    """
     tpduFirstOctet = 0x01 # SMS-SUBMIT PDU
     if validity != None:
         # Validity period format (TP-VPF) is stored in bits 4,3 of the first TPDU octet
@@ -281,79 +327,63 @@ def encodeSmsSubmitPdu(number, text, reference=0, validity=None, smsc=None, requ
         tpduFirstOctet |= 0x20 # bit5 == 1
 
     # Encode message text and set data coding scheme based on text contents
-    try:
-        encodedTextLength = len(encodeGsm7(text))
-    except ValueError:
+    septets = gsm7Length(text)
+    if septets != None:
+        alphabet = 0x00 # GSM-7
+        userData = encodeGsm7(text)
+        multipart = septets > MAX_MESSAGE_LENGTH[alphabet]
+        pduTextParts = _divideGsm7(text, userData) if multipart else [userData]
+    else:
         # Cannot encode text using GSM-7; use UCS2 instead
-        encodedTextLength = len(text)
         alphabet = 0x08 # UCS2
-    else:
-        alphabet = 0x00 # GSM-7
+        userData = text.encode('utf-16-be', 'surrogatepass')
+        multipart = len(userData) // 2 > MAX_MESSAGE_LENGTH[alphabet]
+        pduTextParts = _divideUcs2(userData) if multipart else [userData]
 
     # Check if message should be concatenated
-    if encodedTextLength > MAX_MESSAGE_LENGTH[alphabet]:
+    if multipart:
         # Text too long for single PDU - add "concatenation" User Data Header
-        concatHeaderPrototype = Concatenation()
-        concatHeaderPrototype.reference = reference
-
-        # Devide whole text into parts
-        if alphabet == 0x00:
-            pduTextParts = divideTextGsm7(text)
-        elif alphabet == 0x08:
-            pduTextParts = divideTextUcs2(text)
-        else:
-            raise NotImplementedError
-
-        pduCount = len(pduTextParts)
-        concatHeaderPrototype.parts  = pduCount
+        concatHeader = Concatenation()
+        concatHeader.reference = reference
+        concatHeader.parts = len(pduTextParts)
         tpduFirstOctet |= 0x40
+
+    pdu = bytearray()
+    if smsc:
+        pdu.extend(_encodeAddressField(smsc, smscField=True))
     else:
-        concatHeaderPrototype = None
-        pduCount = 1
+        pdu.append(0x00) # Don't supply an SMSC number - use the one configured in the device
+    pdu.append(tpduFirstOctet)
+    pdu.append(reference) # message reference
+    # Add destination number
+    pdu.extend(_encodeAddressField(number))
+    pdu.append(0x00) # Protocol identifier - no higher-level protocol
+    pdu.append(alphabet if not sendFlash else (0x10 if alphabet == 0x00 else 0x18))
+    if validityPeriod:
+        pdu.extend(validityPeriod)
+    headerLength = len(pdu)
 
     # Construct required PDU(s)
-    pdus = []
-    for i in xrange(pduCount):
-        pdu = bytearray()
-        if smsc:
-            pdu.extend(_encodeAddressField(smsc, smscField=True))
-        else:
-            pdu.append(0x00) # Don't supply an SMSC number - use the one configured in the device
-
-        udh = bytearray()
-        if concatHeaderPrototype != None:
-            concatHeader = copy(concatHeaderPrototype)
+    for i, pduText in enumerate(pduTextParts):
+        del pdu[headerLength:]
+        if multipart:
             concatHeader.number = i + 1
-            pduText = pduTextParts[i]
-            pduTextLength = len(pduText)
-            udh.extend(concatHeader.encode())
+            udh = concatHeader.encode()
+            udhLen = len(udh)
         else:
-            pduText = text
-
-        udhLen = len(udh)
-
-        pdu.append(tpduFirstOctet)
-        pdu.append(reference) # message reference
-        # Add destination number
-        pdu.extend(_encodeAddressField(number))
-        pdu.append(0x00) # Protocol identifier - no higher-level protocol
-
-        pdu.append(alphabet if not sendFlash else (0x10 if alphabet == 0x00 else 0x18))
-        if validityPeriod:
-            pdu.extend(validityPeriod)
+            udhLen = 0
 
         if alphabet == 0x00: # GSM-7
-            encodedText = encodeGsm7(pduText)
-            userDataLength = len(encodedText) # Payload size in septets/characters
+            userDataLength = len(pduText) # Payload size in septets/characters
             if udhLen > 0:
                 shift = ((udhLen + 1) * 8) % 7 # "fill bits" needed to make the UDH end on a septet boundary
-                userData = packSeptets(encodedText, padBits=shift)
+                userData = packSeptets(pduText, padBits=shift)
                 if shift > 0:
                     userDataLength += 1 # take padding bits into account
             else:
-                userData = packSeptets(encodedText)
+                userData = packSeptets(pduText)
         elif alphabet == 0x08: # UCS2
-            userData = encodeUcs2(pduText)
+            userData = pduText
             userDataLength = len(userData)
 
         if udhLen > 0:
@@ -364,107 +394,180 @@ def encodeSmsSubmitPdu(number, text, reference=0, validity=None, smsc=None, requ
         else:
             pdu.append(userDataLength)
         pdu.extend(userData) # User Data (message payload)
-        tpdu_length = len(pdu) - 1
-        pdus.append((pdu, tpdu_length))
-    return pdus
+        yield pdu, len(pdu) - 1
+
+def _divideGsm7(text, octets):
+    """ Divides GSM-7 encoded text the same way as divideTextGsm7, without an escaped character ending up in two parts """
+    if '\x1b' in text:
+        # a literal ESC is a single septet and can't be told apart from an escape by looking at the octets
+        return [encodeGsm7(part) for part in divideTextGsm7(text)]
+    size = MAX_MULTIPART_MESSAGE_LENGTH[0x00]
+    result = []
+    start = 0
+    while start < len(octets):
+        end = start + size
+        if end < len(octets) and octets[end - 1] == 0x1B:
+            end -= 1
+        result.append(octets[start:end])
+        start = end
+    return result
+
+def _divideUcs2(octets):
+    """ Divides UTF-16 encoded text into parts of as many characters as divideTextUcs2, without splitting a surrogate pair """
+    size = MAX_MULTIPART_MESSAGE_LENGTH[0x08] * 2
+    result = []
+    start = 0
+    while start < len(octets):
+        end = start + size
+        if end < len(octets) and 0xD8 <= octets[end - 2] <= 0xDB:
+            end -= 2
+        result.append(octets[start:end])
+        start = end
+    return result
+
+class SmsPdu(object):
+    """ A decoded SMS PDU
+
+    Fields that are not part of the PDU's type are left unset. They can also be read as
+    items, e.g. pdu['text'], like the dictionary decodeSmsPdu used to return.
+    """
+
+    __slots__ = ('smsc', 'tpdu_length', 'type', 'reference', 'number', 'protocol_id', 'data_coding', 'time',
+                 'validity', 'discharge', 'status', 'udh', 'text')
+
+    @property
+    def concatenation(self):
+        """ The Concatenation IE if this is part of a concatenated message, otherwise None """
+        for ie in getattr(self, 'udh', ()):
+            if type(ie) == Concatenation:
+                return ie
+        return None
+
+    def __getitem__(self, key):
+        if key not in self.__slots__ or not hasattr(self, key):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and hasattr(self, key)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def keys(self):
+        return [key for key in self.__slots__ if hasattr(self, key)]
+
+    def __repr__(self):
+        return 'SmsPdu({0})'.format(', '.join('{0}={1!r}'.format(key, self[key]) for key in self.keys()))
 
 def decodeSmsPdu(pdu):
-    """ Decodes SMS pdu data and returns a tuple in format (number, text)
+    """ Decodes SMS pdu data
+
+    The PDU is read in place through a memoryview, every field is decoded at an explicit offset.
 
     :param pdu: PDU data as a hex string, or a bytearray containing PDU octects
-    :type pdu: str or bytearray
+    :type pdu: str, bytes (hex) or bytearray/memoryview (octets)
 
     :raise EncodingError: If the specified PDU data cannot be decoded
 
-    :return: The decoded SMS data as a dictionary
-    :rtype: dict
+    :return: The decoded SMS data
+    :rtype: SmsPdu
     """
+    if type(pdu) == str:
+        pdu = bytes.fromhex(pdu)
+    elif type(pdu) == bytes:
+        pdu = binascii.unhexlify(pdu)
+    pdu = memoryview(pdu)
     try:
-        pdu = toByteArray(pdu)
-    except:
-        raise 
-    result = {}
-    pduIter = iter(pdu)
+        return _decodeTpdu(pdu)
+    except IndexError:
+        raise EncodingError('PDU is truncated: {0}'.format(pdu.hex())) from None
 
-    smscNumber, smscBytesRead = _decodeAddressField(pduIter, smscField=True)
-    result['smsc'] = smscNumber
-    result['tpdu_length'] = len(pdu) - smscBytesRead
+def _decodeTpdu(pdu):
+    result = SmsPdu()
+    result.smsc, offset = _decodeAddressField(pdu, 0, smscField=True)
+    result.tpdu_length = len(pdu) - offset
 
-    tpduFirstOctet = next(pduIter)
+    tpduFirstOctet = pdu[offset]
+    offset += 1
 
     pduType = tpduFirstOctet & 0x03 # bits 1-0
     if pduType == 0x00: # SMS-DELIVER or SMS-DELIVER REPORT
-        result['type'] = 'SMS-DELIVER'
-        result['number'] = _decodeAddressField(pduIter)[0]
-        result['protocol_id'] = next(pduIter)
-        dataCoding = _decodeDataCoding(next(pduIter))
-        result['time'] = _decodeTimestamp(pduIter)
-        userDataLen = next(pduIter)
+        result.type = 'SMS-DELIVER'
+        result.number, offset = _decodeAddressField(pdu, offset)
+        result.protocol_id = pdu[offset]
+        result.data_coding = dataCoding = _decodeDataCoding(pdu[offset + 1])
+        result.time = _decodeTimestamp(pdu, offset + 2)
+        userDataLen = pdu[offset + 9]
         udhPresent = (tpduFirstOctet & 0x40) != 0
-        ud = _decodeUserData(pduIter, userDataLen, dataCoding, udhPresent)
-        result.update(ud)
+        _decodeUserData(result, pdu, offset + 10, userDataLen, dataCoding, udhPresent)
     elif pduType == 0x01: # SMS-SUBMIT or SMS-SUBMIT-REPORT
-        result['type'] = 'SMS-SUBMIT'
-        result['reference'] = next(pduIter) # message reference - we don't really use this
-        result['number'] = _decodeAddressField(pduIter)[0]
-        result['protocol_id'] = next(pduIter)
-        dataCoding = _decodeDataCoding(next(pduIter))
+        result.type = 'SMS-SUBMIT'
+        result.reference = pdu[offset] # message reference - we don't really use this
+        result.number, offset = _decodeAddressField(pdu, offset + 1)
+        result.protocol_id = pdu[offset]
+        result.data_coding = dataCoding = _decodeDataCoding(pdu[offset + 1])
+        offset += 2
         validityPeriodFormat = (tpduFirstOctet & 0x18) >> 3 # bits 4,3
         if validityPeriodFormat == 0x02: # TP-VP field present and integer represented (relative)
-            result['validity'] = _decodeRelativeValidityPeriod(next(pduIter))
+            result.validity = _decodeRelativeValidityPeriod(pdu[offset])
+            offset += 1
         elif validityPeriodFormat == 0x03: # TP-VP field present and semi-octet represented (absolute)
-            result['validity'] = _decodeTimestamp(pduIter)
-        userDataLen = next(pduIter)
+            result.validity = _decodeTimestamp(pdu, offset)
+            offset += 7
+        userDataLen = pdu[offset]
         udhPresent = (tpduFirstOctet & 0x40) != 0
-        ud = _decodeUserData(pduIter, userDataLen, dataCoding, udhPresent)
-        result.update(ud)
+        _decodeUserData(result, pdu, offset + 1, userDataLen, dataCoding, udhPresent)
     elif pduType == 0x02: # SMS-STATUS-REPORT or SMS-COMMAND
-        result['type'] = 'SMS-STATUS-REPORT'
-        result['reference'] = next(pduIter)
-        result['number'] = _decodeAddressField(pduIter)[0]
-        result['time'] = _decodeTimestamp(pduIter)
-        result['discharge'] = _decodeTimestamp(pduIter)
-        result['status'] = next(pduIter)
+        result.type = 'SMS-STATUS-REPORT'
+        result.reference = pdu[offset]
+        result.number, offset = _decodeAddressField(pdu, offset + 1)
+        result.time = _decodeTimestamp(pdu, offset)
+        result.discharge = _decodeTimestamp(pdu, offset + 7)
+        result.status = pdu[offset + 14]
     else:
         raise EncodingError('Unknown SMS message type: {0}. First TPDU octet was: {1}'.format(pduType, tpduFirstOctet))
 
     return result
 
-def _decodeUserData(byteIter, userDataLen, dataCoding, udhPresent):
-    """ Decodes PDU user data (UDHI (if present) and message text) """
-    result = {}
+def _decodeUserData(result, pdu, offset, userDataLen, dataCoding, udhPresent):
+    """ Decodes PDU user data (UDHI (if present) and message text) starting at offset """
+    prevOctet = None
+    shift = 7
     if udhPresent:
         # User Data Header is present
-        result['udh'] = []
-        udhLen = next(byteIter)
+        result.udh = []
+        udhLen = pdu[offset]
+        offset += 1
         ieLenRead = 0
         # Parse and store UDH fields
         while ieLenRead < udhLen:
-            ie = InformationElement.decode(byteIter)
-            ieLenRead += len(ie)
-            result['udh'].append(ie)
-        del ieLenRead
+            iei = pdu[offset]
+            ieLen = pdu[offset + 1]
+            ieData = pdu[offset + 2:offset + 2 + ieLen].tolist()
+            if len(ieData) < ieLen:
+                raise IndexError('Information element is truncated')
+            result.udh.append(InformationElement(iei, ieLen, ieData))
+            offset += ieLen + 2
+            ieLenRead += ieLen + 2
         if dataCoding == 0x00: # GSM-7
             # Since we are using 7-bit data, "fill bits" may have been added to make the UDH end on a septet boundary
             shift = ((udhLen + 1) * 8) % 7 # "fill bits" needed to make the UDH end on a septet boundary
             # Simulate another "shift" in the unpackSeptets algorithm in order to ignore the fill bits
-            prevOctet = next(byteIter)
+            prevOctet = pdu[offset]
+            offset += 1
             shift += 1
 
     if dataCoding == 0x00: # GSM-7
-        if udhPresent:
-            userDataSeptets = unpackSeptets(byteIter, userDataLen, prevOctet, shift)
-        else:
-            userDataSeptets = unpackSeptets(byteIter, userDataLen)
-        result['text'] = decodeGsm7(userDataSeptets)
+        result.text = decodeGsm7(unpackSeptets(pdu[offset:], userDataLen, prevOctet, shift))
     elif dataCoding == 0x02: # UCS2
-        result['text'] = decodeUcs2(byteIter, userDataLen)
+        userData = pdu[offset:offset + userDataLen]
+        result.text = userData[:len(userData) & ~1].tobytes().decode('utf-16-be', 'surrogatepass')
     else: # 8-bit (data)
-        userData = []
-        for b in byteIter:
-            userData.append(unichr(b))
-        result['text'] = ''.join(userData)
-    return result
+        result.text = pdu[offset:].tobytes().decode('latin-1')
 
 def _decodeRelativeValidityPeriod(tpVp):
     """ Calculates the relative SMS validity period (based on the table in section 9.2.3.12 of GSM 03.40)
@@ -502,11 +605,27 @@ def _encodeRelativeValidityPeriod(validityPeriod):
         raise ValueError('Validity period too long; tpVp limited to 1 octet (max value: 255)')
     return tpVp
 
-def _decodeTimestamp(byteIter):
-    """ Decodes a 7-octet timestamp """
-    dateStr = decodeSemiOctets(byteIter, 7)
-    timeZoneStr = dateStr[-2:]
-    return datetime.strptime(dateStr[:-2], '%y%m%d%H%M%S').replace(tzinfo=SmsPduTzInfo(timeZoneStr))
+# Value of each octet as two swapped BCD digits, None if either digit is not decimal
+SEMI_OCTET_VALUES = tuple((octet & 0x0F) * 10 + (octet >> 4) if (octet & 0x0F) < 10 and (octet >> 4) < 10 else None for octet in range(256))
+
+@lru_cache(maxsize=None)
+def _pduTzInfo(octet):
+    """ Shared SmsPduTzInfo for a timezone octet, there are at most 256 of them """
+    return SmsPduTzInfo('{0:x}{1:x}'.format(octet & 0x0F, octet >> 4))
+
+def _decodeTimestamp(pdu, offset):
+    """ Decodes the 7-octet timestamp at offset """
+    octets = pdu[offset:offset + 7]
+    if len(octets) < 7:
+        raise IndexError('Timestamp is truncated')
+    year, month, day, hour, minute, second = values = [SEMI_OCTET_VALUES[octet] for octet in octets[:6]]
+    if None in values or octets[6] >= 0xF0:
+        # not plain digits, leave it to strptime to make sense of or reject
+        dateStr = decodeSemiOctets(octets, 7)
+        return datetime.strptime(dateStr[:-2], '%y%m%d%H%M%S').replace(tzinfo=SmsPduTzInfo(dateStr[-2:]))
+    # the two digit year is read like strptime's %y
+    year += 2000 if year < 69 else 1900
+    return datetime(year, month, day, hour, minute, second, tzinfo=_pduTzInfo(octets[6]))
 
 def _encodeTimestamp(timestamp):
     """ Encodes a 7-octet timestamp from the specified date
@@ -547,39 +666,37 @@ def _decodeDataCoding(octet):
 def nibble2octet(addressLen):
     return int((addressLen + 1) / 2)
 
-def _decodeAddressField(byteIter, smscField=False, log=False):
-    """ Decodes the address field at the current position of the bytearray iterator
-
-    :param byteIter: Iterator over bytearray
-    :type byteIter: iter(bytearray)
+def _decodeAddressField(pdu, offset, smscField=False):
+    """ Decodes the address field at offset
 
-    :return: Tuple containing the address value and amount of bytes read (value is or None if it is empty (zero-length))
+    :return: Tuple containing the address value (or None if it is empty (zero-length)) and the offset after the field
     :rtype: tuple
     """
-    addressLen = next(byteIter)
+    addressLen = pdu[offset]
     if addressLen > 0:
-        toa = next(byteIter)
+        toa = pdu[offset + 1]
+        offset += 2
         ton = (toa & 0x70) # bits 6,5,4 of type-of-address == type-of-number
         if ton == 0x50:
             # Alphanumberic number
             addressLen = nibble2octet(addressLen)
-            septets = unpackSeptets(byteIter, addressLen)
-            addressValue = decodeGsm7(septets)
-            return (addressValue, (addressLen + 2))
+            septets = unpackSeptets(pdu[offset:offset + addressLen], addressLen)
+            return (decodeGsm7(septets), offset + addressLen)
         else:
             # ton == 0x00: Unknown (might be international, local, etc) - leave as is
             # ton == 0x20: National number
             if smscField:
-                addressValue = decodeSemiOctets(byteIter, addressLen-1)
+                addressLen -= 1
             else:
                 addressLen = nibble2octet(addressLen)
-                addressValue = decodeSemiOctets(byteIter, addressLen)
-                addressLen += 1 # for the return value, add the toa byte
+            if len(pdu) < offset + addressLen:
+                raise IndexError('Address is truncated')
+            addressValue = decodeSemiOctets(pdu[offset:offset + addressLen])
             if ton == 0x10: # International number
                 addressValue = '+' + addressValue
-            return (addressValue, (addressLen + 1))
+            return (addressValue, offset + addressLen)
     else:
-        return (None, 1)
+        return (None, offset + 1)
 
 def _encodeAddressField(address, smscField=False):
     """ Encodes the address into an address field
@@ -640,6 +757,9 @@ def encodeSemiOctets(number):
     octets = [int(number[i+1] + number[i], 16) for i in xrange(0, len(number), 2)]
     return bytearray(octets)
 
+# Swapped hex digits of each octet, a high nibble of 0xF is filler and left out
+SEMI_OCTET_DIGITS = tuple('{0:x}{1:x}'.format(octet & 0x0F, octet >> 4) if octet < 0xF0 else '{0:x}'.format(octet & 0x0F) for octet in range(256))
+
 def decodeSemiOctets(encodedNumber, numberOfOctets=None):
     """ Semi-octet decoding algorithm(e.g. for phone numbers)
 
@@ -656,11 +776,8 @@ def decodeSemiOctets(encodedNumber, numberOfOctets=None):
         encodedNumber = bytearray(codecs.decode(encodedNumber, 'hex_codec'))
     i = 0
     for octet in encodedNumber:
-        hexVal = hex(octet)[2:].zfill(2)
-        number.append(hexVal[1])
-        if hexVal[0] != 'f':
-            number.append(hexVal[0])
-        else:
+        number.append(SEMI_OCTET_DIGITS[octet])
+        if octet >= 0xF0:
             break
         if numberOfOctets != None:
             i += 1
@@ -708,20 +825,12 @@ def encodeGsm7(plaintext, discardInvalid=False):
     :return: A bytearray containing the string encoded in GSM-7 encoding
     :rtype: bytearray
     """
-    result = bytearray()
     plaintext = str(plaintext)
-
-
-    for char in plaintext:
-        idx = GSM7_BASIC.find(char)
-        if idx != -1:
-            result.append(idx)
-        elif char in GSM7_EXTENDED:
-            result.append(0x1B) # ESC - switch to extended table
-            result.append(ord(GSM7_EXTENDED[char]))
-        elif not discardInvalid:
-            raise ValueError('Cannot encode char "{0}" using GSM-7 encoding'.format(char))
-    return result
+    try:
+        encoded, _ = codecs.charmap_encode(plaintext, 'ignore' if discardInvalid else 'strict', GSM7_ENCODING_MAP)
+    except UnicodeEncodeError as e:
+        raise ValueError('Cannot encode char "{0}" using GSM-7 encoding'.format(plaintext[e.start])) from None
+    return bytearray(encoded)
 
 def decodeGsm7(encodedText):
     """ GSM-7 text decoding algorithm
@@ -734,20 +843,27 @@ def decodeGsm7(encodedText):
     :return: A string containing the decoded text
     :rtype: str
     """
-    result = []
     if type(encodedText) == str:
         encodedText = rawStrToByteArray(encodedText) #bytearray(encodedText)
-    iterEncoded = iter(encodedText)
-    for b in iterEncoded:
-        if b == 0x1B: # ESC - switch to extended table
-            c = chr(next(iterEncoded))
-            for char, value in dictItemsIter(GSM7_EXTENDED):
-                if c == value:
-                    result.append(char)
-                    break
-        else:
-            result.append(GSM7_BASIC[b])
-    return ''.join(result)
+    result = codecs.charmap_decode(bytes(encodedText), 'strict', GSM7_DECODING_TABLE)[0]
+    if '\x1b' in result:
+        # ESC - switch to extended table, unknown extended characters are dropped
+        result = GSM7_ESCAPE_PATTERN.sub(lambda match: GSM7_EXTENDED_DECODING_TABLE.get(match.group(1), ''), result)
+    return result
+
+def gsm7Length(plainText):
+    """ Number of GSM-7 septets needed to encode the text, or None if it cannot be encoded using GSM-7
+
+    :param plainText: the text string to check
+    :type plainText: str
+
+    :rtype: int or None
+    """
+    chars = set(plainText)
+    if not chars <= GSM7_CHARACTERS:
+        return None
+    extended = chars & GSM7_EXTENDED_CHARACTERS
+    return len(plainText) + sum(plainText.count(char) for char in extended)
 
 def divideTextGsm7(plainText):
     """ GSM7 message dividing algorithm
@@ -763,28 +879,26 @@ def divideTextGsm7(plainText):
     result = []
 
     plainStartPtr = 0
-    plainStopPtr  = 0
     chunkByteSize = 0
+    maxChunkSize = MAX_MULTIPART_MESSAGE_LENGTH[0x00]
+    septets = GSM7_SEPTETS.get
 
     plainText = str(plainText)
 
-    while plainStopPtr < len(plainText):
-        char = plainText[plainStopPtr]
-        idx = GSM7_BASIC.find(char)
-        if idx != -1:
-            chunkByteSize = chunkByteSize + 1;
-        elif char in GSM7_EXTENDED:
-            chunkByteSize = chunkByteSize + 2;
-        else:
+    for plainStopPtr, char in enumerate(plainText):
+        size = septets(char)
+        if size is None:
             raise ValueError('Cannot encode char "{0}" using GSM-7 encoding'.format(char))
 
-        plainStopPtr = plainStopPtr + 1
-        if chunkByteSize > MAX_MULTIPART_MESSAGE_LENGTH[0x00]:
-            plainStopPtr = plainStopPtr - 1
-
-        if chunkByteSize >= MAX_MULTIPART_MESSAGE_LENGTH[0x00]:
+        chunkByteSize += size
+        if chunkByteSize > maxChunkSize:
+            # an escaped character that doesn't fit starts the next chunk
             result.append(plainText[plainStartPtr:plainStopPtr])
             plainStartPtr = plainStopPtr
+            chunkByteSize = size
+        elif chunkByteSize == maxChunkSize:
+            result.append(plainText[plainStartPtr:plainStopPtr + 1])
+            plainStartPtr = plainStopPtr + 1
             chunkByteSize = 0
 
     if chunkByteSize > 0:
@@ -792,8 +906,10 @@ def divideTextGsm7(plainText):
 
     return result
 
-def packSeptets(octets, padBits=0):
-    """ Packs the specified octets into septets
+def packSeptetsReference(octets, padBits=0):
+    """ Packs the specified octets into septets, one bit shift per octet
+
+    Reference implementation of packSeptets, kept to test the bulk version against.
 
     Typically the output of encodeGsm7 would be used as input to this function. The resulting
     bytearray contains the original GSM-7 characters packed into septets ready for transmission.
@@ -829,8 +945,10 @@ def packSeptets(octets, padBits=0):
         result.append(prevSeptet >> shift)
     return result
 
-def unpackSeptets(septets, numberOfSeptets=None, prevOctet=None, shift=7):
-    """ Unpacks the specified septets into octets
+def unpackSeptetsReference(septets, numberOfSeptets=None, prevOctet=None, shift=7):
+    """ Unpacks the specified septets into octets, one bit shift per octet
+
+    Reference implementation of unpackSeptets, kept to test the bulk version against.
 
     :param septets: Iterator or iterable containing the septets packed into octets
     :type septets: iter(bytearray), bytearray or str
@@ -878,6 +996,103 @@ def unpackSeptets(septets, numberOfSeptets=None, prevOctet=None, shift=7):
             result.append(b)
     return result
 
+# Clears the top bit of every octet, for bytes.translate
+SEPTET_MASK = bytes(octet & 0x7F for octet in range(256))
+
+@lru_cache(maxsize=None)
+def _septetMasks(levels):
+    """ Masks to merge or split the septets held in 2 ** levels octets, one level at a time
+
+    At level k every lane of 2 ** k octets holds two halves of 7 * 2 ** (k - 1) bits, either
+    in the low bits of each half of the lane (spread) or next to each other (merged).
+
+    :return: (low half, spread high half, merged high half, distance between them) for each level
+    """
+    size = 1 << levels
+    result = []
+    for k in range(1, levels + 1):
+        lane = 1 << k
+        halfBits = lane * 4
+        septetBits = 7 << (k - 1)
+        septets = (1 << septetBits) - 1
+        def repeat(mask):
+            return int.from_bytes(mask.to_bytes(lane, 'little') * (size // lane), 'little')
+        result.append((repeat(septets), repeat(septets << halfBits), repeat(septets << septetBits), halfBits - septetBits))
+    return result
+
+def _toBytes(octets):
+    if type(octets) == str:
+        return rawStrToByteArray(octets)
+    if type(octets) in (bytes, bytearray):
+        return octets
+    return bytes(octets)
+
+def packSeptets(octets, padBits=0):
+    """ Packs the specified octets into septets
+
+    Typically the output of encodeGsm7 would be used as input to this function. The resulting
+    bytearray contains the original GSM-7 characters packed into septets ready for transmission.
+
+    The septets are packed all at once: the whole text is held in a single integer in which
+    pairs of neighbouring septets, then pairs of those pairs and so on, are merged with a mask
+    and a shift each, so a 160 character text takes 8 such steps.
+
+    :rtype: bytearray
+    """
+    octets = _toBytes(octets).translate(SEPTET_MASK)
+    count = len(octets)
+    fillBits = (7 - padBits) % 7 if padBits else 0
+    length = (fillBits + count * 7 + 7) // 8
+    if count == 0:
+        return bytearray(length)
+
+    value = int.from_bytes(octets, 'little')
+    for low, high, _, distance in _septetMasks((count - 1).bit_length()):
+        value = (value & low) | ((value & high) >> distance)
+    return bytearray((value << fillBits).to_bytes(length, 'little'))
+
+def unpackSeptets(septets, numberOfSeptets=None, prevOctet=None, shift=7):
+    """ Unpacks the specified septets into octets
+
+    At most numberOfSeptets octets are read from "septets". If prevOctet is given, its top
+    "shift" bits come before the octets that are read. A final septet that fills its octets
+    exactly is only kept when it is not 0. This is the inverse of packSeptets, the merge
+    steps are undone from the largest down to single septets.
+
+    :param septets: Iterator or iterable containing the septets packed into octets
+    :type septets: iter(bytearray), bytearray or str
+    :param numberOfSeptets: The amount of septets to unpack (or None for all remaining in "septets")
+    :type numberOfSeptets: int or None
+
+    :return: The septets unpacked into octets
+    :rtype: bytearray
+    """
+    if numberOfSeptets == 0:
+        return bytearray()
+    if type(septets) in (str, bytes, bytearray, memoryview):
+        octets = septets if type(septets) == memoryview else _toBytes(septets)
+        if numberOfSeptets != None:
+            octets = octets[:numberOfSeptets]
+    else:
+        octets = bytes(islice(septets, numberOfSeptets))
+
+    value = int.from_bytes(octets, 'little')
+    bits = len(octets) * 8
+    if prevOctet != None:
+        value = (value << shift) | (prevOctet >> (8 - shift))
+        bits += shift
+    count = bits // 7
+    if count == 0:
+        return bytearray()
+
+    value &= (1 << (count * 7)) - 1
+    for low, _, high, distance in reversed(_septetMasks((count - 1).bit_length())):
+        value = (value & low) | ((value & high) << distance)
+    result = bytearray(value.to_bytes(count, 'little'))
+    if bits % 7 == 0 and result[-1] == 0:
+        result.pop()
+    return result
+
 def decodeUcs2(byteIter, numBytes):
     """ Decodes UCS2-encoded text from the specified byte iterator, up to a maximum of numBytes """
     userData = []
@@ -7,10 +7,7 @@ class Response:
     chunks: List[bytes]
 
     def __str__(self):
-        try:
-            return f'Response({" | ".join([chunk.decode() for chunk in self.chunks])})'
-        except UnicodeDecodeError:
-            return f'Response({" | ".join([chunk for chunk in self.chunks])})'
+        return f'Response({" | ".join([chunk.decode(errors="replace") for chunk in self.chunks])})'
 
     def __repr__(self):
         return self.__str__()
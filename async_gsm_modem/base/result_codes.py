@@ -0,0 +1,30 @@
+from functools import lru_cache
+from typing import NamedTuple, Tuple
+
+class ResultCode(NamedTuple):
+    code: bytes
+    n_chunks: int = 1
+    error: bool = False
+
+class ResultCodeIndex:
+    """URC and error code tables indexed on the token before the first ``:``
+
+    A received line is classified with a single dictionary lookup instead of a
+    ``startswith`` scan over every table entry.
+    """
+
+    def __init__(self, urc: Tuple[Tuple[bytes, int], ...], error_codes: Tuple[bytes, ...]):
+        self.index = {}
+        for code in error_codes:
+            self.index[code] = ResultCode(code, error=True)
+        for code, n_chunks in urc:
+            self.index.setdefault(code, ResultCode(code, n_chunks))
+
+    def classify(self, line: bytes) -> ResultCode:
+        end = line.find(b':')
+        return self.index.get(line if end == -1 else line[:end])
+
+@lru_cache(maxsize=None)
+def compile_result_codes(urc: Tuple[Tuple[bytes, int], ...], error_codes: Tuple[bytes, ...]) -> ResultCodeIndex:
+    """Build the index for a URC/error table pair, shared by every modem using the same tables"""
+    return ResultCodeIndex(urc, error_codes)
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, List
+from .modem import ATModem
+
+@dataclass
+class ShardStats:
+    name: str
+    modems: int
+    calls: int
+    errors: int
+    cpu_time: float # seconds of CPU used by the shard's thread
+    mean_latency: float # seconds from submitting a call to receiving its result
+    max_latency: float
+
+class Shard:
+    """Runs modems on a dedicated thread with its own event loop
+
+    Reads, framing and parsing of the attached modems then happen on that thread,
+    so a slow modem only delays the modems sharing its shard. Calls are made from
+    the application loop through the ``ShardedModem`` facade returned by ``attach``.
+    A modem's ``urc_handler`` runs on the shard's thread.
+    """
+
+    def __init__(self, name: str = 'shard'):
+        self.name = name
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run_forever, name=name, daemon=True)
+        self.modems = []
+
+        self.calls = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def start(self) -> None:
+        self.thread.start()
+
+    async def stop(self) -> None:
+        """Close the attached modems that are still open, then stop the shard's loop"""
+        if self.thread.is_alive():
+            open_modems = [modem for modem in self.modems if modem.read_loop_task is not None and not modem.closing]
+            closing = [asyncio.run_coroutine_threadsafe(modem.close(), self.loop) for modem in open_modems]
+            await asyncio.gather(*(asyncio.wrap_future(future) for future in closing), return_exceptions=True)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            await asyncio.to_thread(self.thread.join)
+
+    def run_forever(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    async def run(self, coroutine: Awaitable):
+        """Run a coroutine on the shard's loop and wait for it from the calling loop"""
+        start = time.monotonic()
+        try:
+            return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self.loop))
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            latency = time.monotonic() - start
+            self.calls += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def attach(self, modem: ATModem) -> 'ShardedModem':
+        self.modems.append(modem)
+        return ShardedModem(modem, self)
+
+    async def stats(self) -> ShardStats:
+        async def cpu_time():
+            return time.thread_time()
+
+        return ShardStats(
+            name=self.name,
+            modems=len(self.modems),
+            calls=self.calls,
+            errors=self.errors,
+            cpu_time=await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(cpu_time(), self.loop)),
+            mean_latency=self.total_latency / self.calls if self.calls else 0.0,
+            max_latency=self.max_latency
+        )
+
+class ShardedModem:
+    """Thread-safe facade of a modem running on a shard
+
+    Coroutine methods of the modem are run on the shard and awaited from the
+    calling loop. Attributes set on the facade, e.g. ``urc_handler``, are set on the
+    modem. Other attributes are passed through unchanged and belong to the shard's
+    thread: read plain values such as counters, but don't call their methods, e.g.
+    ``metrics.snapshot()`` or anything on ``command_queue``, from another thread.
+    """
+
+    def __init__(self, modem: ATModem, shard: Shard):
+        object.__setattr__(self, 'modem', modem)
+        object.__setattr__(self, 'shard', shard)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self.modem, name, value)
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.modem, name)
+        if not asyncio.iscoroutinefunction(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            return await self.shard.run(attribute(*args, **kwargs))
+        return call
+
+class ShardGroup:
+    """A fixed number of shards, modems are attached to the shard running the fewest"""
+
+    def __init__(self, shards: int = 1):
+        if shards < 1:
+            raise ValueError('At least one shard is required')
+        self.shards = [Shard(f'modem-shard-{n}') for n in range(shards)]
+
+    def start(self) -> None:
+        for shard in self.shards:
+            shard.start()
+
+    async def stop(self) -> None:
+        await asyncio.gather(*(shard.stop() for shard in self.shards))
+
+    def attach(self, modem: ATModem) -> ShardedModem:
+        shard = min(self.shards, key=lambda shard: len(shard.modems))
+        return shard.attach(modem)
+
+    async def stats(self) -> List[ShardStats]:
+        return list(await asyncio.gather(*(shard.stats() for shard in self.shards)))
@@ -0,0 +1,172 @@
+import asyncio
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Iterator, List, Union
+from .command import Command, CompoundCommand
+from .response import Response, UnsolicitedResultCode
+
+# File layout: MAGIC, then one record per read, write or event. A record is a
+# header of direction (1 byte), microseconds since the recorder started (8 bytes)
+# and data length (4 bytes), all little endian, followed by the data. Every
+# connection starts with a SESSION record, its data is the wall clock time it
+# started at as a little endian double.
+MAGIC = b'ATTRACE1'
+RECORD_HEADER = struct.Struct('<BQI')
+SESSION_START = struct.Struct('<d')
+
+RECEIVED = 0
+SENT = 1
+ABANDONED = 2 # a command stopped waiting for its result, data is the command
+SENTINELS_LOST = 3 # resync gave up on unanswered sentinels
+SESSION = 4
+
+@dataclass
+class TraceRecord:
+    direction: int
+    timestamp: float # seconds since the recorder started
+    data: bytes
+
+    @property
+    def started(self) -> float:
+        """Wall clock time a SESSION record's recorder started at"""
+        return SESSION_START.unpack(self.data)[0]
+
+class TraceRecorder:
+    """Appends every byte read from or written to a modem to a binary trace file
+
+    Each recorder starts a new session in the file and so does every reconnect,
+    timestamps restart at 0 there.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.session()
+
+    def session(self) -> None:
+        """Start a new session, e.g. when the connection was reopened"""
+        self.start = time.monotonic()
+        self.file.write(RECORD_HEADER.pack(SESSION, 0, SESSION_START.size) + SESSION_START.pack(time.time()))
+
+    def record(self, direction: int, data: bytes) -> None:
+        elapsed = int((time.monotonic() - self.start) * 1e6)
+        self.file.write(RECORD_HEADER.pack(direction, elapsed, len(data)))
+        self.file.write(data)
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+def read_trace(path: str) -> Iterator[TraceRecord]:
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a modem trace')
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                # a recorder that was killed may leave a partial record behind
+                return
+            direction, elapsed, length = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield TraceRecord(direction, elapsed / 1e6, data)
+
+@dataclass
+class ReplayResult:
+    responses: List[Union[Response, Exception]] = field(default_factory=list) # final result of each sent command
+    urcs: List[UnsolicitedResultCode] = field(default_factory=list)
+    unanswered: int = 0 # commands that had no final result before the next one was sent
+    lines: int = 0
+    bytes_received: int = 0
+    elapsed: float = 0.0
+
+class TraceReplayer:
+    """Feeds a recorded session back through a modem's line parser
+
+    The modem is not connected, received data goes straight into its framer and
+    ``handle_line``. Every sent command in the trace becomes the pending command
+    again and recorded timeouts abandon it again, so responses, URCs and stray
+    lines are routed as they were live. Each session is replayed from its own start.
+    """
+
+    def __init__(self, modem, path: str):
+        self.modem = modem
+        self.path = path
+
+    async def replay(self, speed: float = None) -> ReplayResult:
+        """Replay the trace, at ``speed`` times the original pace or as fast as possible if None"""
+        modem = self.modem
+        result = ReplayResult()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        pending = None
+
+        for record in read_trace(self.path):
+            if speed:
+                delay = start + record.timestamp / speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            if record.direction == SENT:
+                pending = self.send(record.data, pending, result)
+                continue
+            if record.direction == SESSION:
+                # a new connection, nothing carries over from the previous one
+                if pending is not None:
+                    result.unanswered += 1
+                    modem.pending, pending = None, None
+                modem.orphaned = 0
+                modem.abort_input = False
+                modem.reset_sentinels()
+                modem.framer.flush()
+                start = loop.time()
+                continue
+            if record.direction == ABANDONED:
+                if pending is not None:
+                    result.unanswered += 1
+                    modem.abandon(pending)
+                    pending = None
+                continue
+            if record.direction == SENTINELS_LOST:
+                modem.reset_sentinels()
+                continue
+
+            result.bytes_received += len(record.data)
+            for line in modem.framer.feed(record.data):
+                result.lines += 1
+                urc = modem.handle_line(line)
+                if urc:
+                    result.urcs.append(urc)
+            if pending is not None and pending.future.done():
+                result.responses.append(pending.future.exception() or pending.future.result())
+                pending = None
+
+        if pending is not None:
+            result.unanswered += 1
+            modem.pending = None
+        result.elapsed = loop.time() - start
+        return result
+
+    def send(self, data: bytes, pending, result: ReplayResult):
+        modem = self.modem
+        if pending is not None:
+            result.unanswered += 1
+        if data.endswith(b'\x1a'):
+            # message input after a prompt, answered with +CMGS
+            return modem.expect(Command(data[:-1]), expected_response=b'+CMGS')
+        line = data.rstrip(modem.CMD_TERMINATOR)
+        if line == modem.ABORT_INPUT:
+            modem.abort_input = False
+            return None
+        if line == bytes(modem.SENTINEL):
+            modem.expect_sentinel()
+            return None
+        parts = line[2:].split(b';')
+        command = CompoundCommand(*(Command(b'AT' + part) for part in parts)) if len(parts) > 1 else Command(line)
+        return modem.expect(command, prompt=line.upper().startswith(b'AT+CMGS='))
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import tty
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+import serial_asyncio
+
+class Transport:
+    """A byte stream to a modem, selected by the scheme of the device URL"""
+
+    def __init__(self, url: str, baud_rate: int = None):
+        self.url = url
+        self.baud_rate = baud_rate
+
+    async def open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        raise NotImplementedError
+
+class SerialTransport(Transport):
+    """Local serial port, e.g. ``/dev/ttyUSB2`` or ``serial:///dev/ttyUSB2``
+
+    URLs with schemes not handled here (``rfc2217://``, ``socket://``, ...) are
+    passed through to pyserial unchanged.
+    """
+
+    async def open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        url = self.url[len('serial://'):] if self.url.startswith('serial://') else self.url
+        return await serial_asyncio.open_serial_connection(url=url, baudrate=self.baud_rate)
+
+class TcpTransport(Transport):
+    """Raw TCP connection to a networked serial server, e.g. ``tcp://192.168.1.10:4001``"""
+
+    async def open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        url = urlsplit(self.url)
+        return await asyncio.open_connection(url.hostname, url.port)
+
+class PtyStreamWriter(asyncio.StreamWriter):
+    """Writer for a pseudo-terminal that also closes the read side of the terminal"""
+
+    def __init__(self, transport, protocol, reader, loop, read_transport):
+        super().__init__(transport, protocol, reader, loop)
+        self.read_transport = read_transport
+
+    def close(self) -> None:
+        self.read_transport.close()
+        super().close()
+
+async def open_terminal(fd: int) -> Tuple[asyncio.StreamReader, PtyStreamWriter]:
+    """Wrap a terminal file descriptor in a stream pair, the descriptor is owned by the streams afterwards"""
+    loop = asyncio.get_running_loop()
+    read_file = os.fdopen(fd, 'rb', buffering=0)
+    write_file = os.fdopen(os.dup(fd), 'wb', buffering=0)
+
+    reader = asyncio.StreamReader()
+    read_transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), read_file)
+    write_transport, write_protocol = await loop.connect_write_pipe(
+        lambda: asyncio.StreamReaderProtocol(asyncio.StreamReader()), write_file
+    )
+    return reader, PtyStreamWriter(write_transport, write_protocol, reader, loop, read_transport)
+
+class PtyTransport(Transport):
+    """Pseudo-terminal, e.g. ``pty:///dev/pts/3``
+
+    The terminal is switched to raw mode and has no baud rate or modem control lines.
+    """
+
+    async def open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        fd = os.open(urlsplit(self.url).path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        tty.setraw(fd)
+        return await open_terminal(fd)
+
+class MemoryStreamWriter:
+    """Writer half of an in-memory link, written bytes are fed straight into the peer's reader"""
+
+    def __init__(self, peer: asyncio.StreamReader):
+        self.peer = peer
+        self.closed = False
+
+    def write(self, data: bytes) -> None:
+        if self.closed:
+            raise ConnectionResetError('Memory link closed')
+        self.peer.feed_data(data)
+
+    async def drain(self) -> None:
+        if self.closed:
+            raise ConnectionResetError('Memory link closed')
+
+    def is_closing(self) -> bool:
+        return self.closed
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.peer.feed_eof()
+
+    async def wait_closed(self) -> None:
+        pass
+
+    def get_extra_info(self, name: str, default=None):
+        return default
+
+class MemoryLink:
+    """In-memory loopback between a modem and a stand-in device
+
+    The device side registers the link under a name, a modem then reaches it with
+    ``memory://<name>``.
+    """
+
+    links: Dict[str, 'MemoryLink'] = {}
+
+    def __init__(self, name: str):
+        if name in self.links:
+            raise ValueError(f'Memory link {name} already exists')
+        self.name = name
+        self.host_reader = asyncio.StreamReader()
+        self.device_reader = asyncio.StreamReader()
+        self.host_writer = MemoryStreamWriter(self.device_reader)
+        self.device_writer = MemoryStreamWriter(self.host_reader)
+        self.links[name] = self
+
+    def host(self) -> Tuple[asyncio.StreamReader, MemoryStreamWriter]:
+        return self.host_reader, self.host_writer
+
+    def device(self) -> Tuple[asyncio.StreamReader, MemoryStreamWriter]:
+        return self.device_reader, self.device_writer
+
+    def close(self) -> None:
+        self.links.pop(self.name, None)
+        self.host_writer.close()
+        self.device_writer.close()
+
+class MemoryTransport(Transport):
+    """In-memory loopback, e.g. ``memory://modem0``"""
+
+    async def open(self) -> Tuple[asyncio.StreamReader, MemoryStreamWriter]:
+        name = urlsplit(self.url).netloc
+        link = MemoryLink.links.get(name)
+        if link is None:
+            raise ConnectionRefusedError(f'No memory link named {name}')
+        return link.host()
+
+TRANSPORTS = {
+    'serial': SerialTransport,
+    'tcp': TcpTransport,
+    'pty': PtyTransport,
+    'memory': MemoryTransport
+}
+
+def get_transport(url: str, baud_rate: int = None) -> Transport:
+    scheme, seperator, _ = url.partition('://')
+    transport = TRANSPORTS.get(scheme, SerialTransport) if seperator else SerialTransport
+    return transport(url, baud_rate)
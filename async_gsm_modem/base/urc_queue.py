@@ -0,0 +1,62 @@
+import asyncio
+import logging
+from collections import deque
+from .response import UnsolicitedResultCode
+
+class URCQueue(asyncio.Queue):
+    """Bounded queue of unsolicited result codes waiting to be handled
+
+    When the queue is full the overflow policy decides what happens to a new URC:
+    ``drop_oldest`` discards the oldest queued URC to make room, ``block`` keeps it
+    in a backlog that is moved into the queue as the handler catches up. The
+    producer is never made to wait, it watches ``drained`` to apply backpressure
+    when it can.
+
+    Attributes:
+        queued -- Total number of URCs accepted into the queue
+        dropped -- Total number of URCs discarded because the queue was full
+        backlog -- URCs waiting for room in the queue, in order
+        drained -- Set while the backlog is empty
+    """
+
+    DROP_OLDEST = 'drop_oldest'
+    BLOCK = 'block'
+    OVERFLOW_POLICIES = (DROP_OLDEST, BLOCK)
+
+    def __init__(self, maxsize: int = 256, overflow: str = DROP_OLDEST):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f'Invalid overflow policy {overflow}: {self.OVERFLOW_POLICIES}')
+        if maxsize <= 0:
+            raise ValueError('URC queue must be bounded')
+        super().__init__(maxsize)
+        self.overflow = overflow
+        self.queued = 0
+        self.dropped = 0
+        self.backlog = deque()
+        self.drained = asyncio.Event()
+        self.drained.set()
+        self.logger = logging.getLogger('ATModem')
+
+    def put_nowait(self, urc: UnsolicitedResultCode) -> None:
+        if self.overflow == self.BLOCK and (self.backlog or self.full()):
+            self.backlog.append(urc)
+            self.drained.clear()
+            self.queued += 1
+            return
+        if self.full():
+            dropped = super().get_nowait()
+            self.dropped += 1
+            self.logger.warning(f'URC queue full, dropped {dropped.code}')
+        super().put_nowait(urc)
+        self.queued += 1
+
+    async def put(self, urc: UnsolicitedResultCode) -> None:
+        self.put_nowait(urc)
+
+    def get_nowait(self) -> UnsolicitedResultCode:
+        urc = super().get_nowait()
+        if self.backlog:
+            super().put_nowait(self.backlog.popleft())
+            if not self.backlog:
+                self.drained.set()
+        return urc
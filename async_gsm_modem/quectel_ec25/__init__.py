@@ -1,2 +1,4 @@
 from .modem import Modem
+from .pool import ModemPool
+from .discovery import discover
 from .sms import SMS
\ No newline at end of file
@@ -22,6 +22,16 @@ DELETE_FLAG = {
     'ALL': b'4'
 }
 
+# Worst case response times (seconds) for slow commands, adaptive deadlines never exceed these
+COMMAND_DEADLINES = {
+    b'AT+CMGS': 120,
+    b'AT+CMGL': 30,
+    b'AT+CMGD': 30,
+    b'AT+COPN': 30,
+    b'AT+COPS': 180,
+    b'AT+CFUN': 15
+}
+
 ERROR_CODES = [
     b'+CMS ERROR',
     b'+CME ERROR'
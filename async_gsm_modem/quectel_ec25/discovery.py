@@ -0,0 +1,65 @@
+import asyncio
+import glob
+import logging
+from dataclasses import dataclass
+from typing import List, Tuple
+from .modem import Modem
+from .info import ProductInfo
+
+logger = logging.getLogger('QuectelEC25Modem')
+
+@dataclass
+class DiscoveredModem:
+    """A physical modem with its connected AT ports, ordered by device name"""
+    imei: str
+    product_info: ProductInfo
+    modems: List[Modem]
+
+    @property
+    def devices(self) -> List[str]:
+        return [modem.device for modem in self.modems]
+
+async def probe(device: str, baud_rate: int, timeout: float = 1, **kwargs) -> Tuple[Modem, ProductInfo, str]:
+    """Connect to a port and identify the modem behind it, returns None if it is not an AT port
+
+    Every step must finish within ``timeout`` so ports that never answer, e.g. NMEA
+    or diagnostic ports, are given up on quickly.
+    """
+    modem = Modem(device, baud_rate, **kwargs)
+    try:
+        await asyncio.wait_for(modem.connect(), timeout)
+    except Exception:
+        logger.debug(f'No AT port at {device}')
+        if modem.read_loop_task:
+            await modem.close()
+        return None
+
+    try:
+        product_info = await asyncio.wait_for(modem.product_info(), timeout)
+        imei = await asyncio.wait_for(modem.imei(), timeout)
+    except Exception:
+        logger.debug(f'Failed to identify modem at {device}', exc_info=True)
+        await modem.close()
+        return None
+    return modem, product_info, imei
+
+async def discover(devices: List[str] = None, baud_rate: int = 115200, timeout: float = 1, **kwargs) -> List[DiscoveredModem]:
+    """Probe all candidate ports at once and group the AT ports by modem IMEI
+
+    ``devices`` defaults to every ``/dev/ttyUSB*`` port, extra keyword arguments
+    are passed on to ``Modem``.
+    """
+    if devices is None:
+        devices = sorted(glob.glob('/dev/ttyUSB*'))
+    results = await asyncio.gather(*(probe(device, baud_rate, timeout, **kwargs) for device in devices))
+
+    discovered = {}
+    for result in results:
+        if result is None:
+            continue
+        modem, product_info, imei = result
+        if imei not in discovered:
+            discovered[imei] = DiscoveredModem(imei=imei, product_info=product_info, modems=[])
+        discovered[imei].modems.append(modem)
+        logger.debug(f'Found {product_info.model} {imei} at {modem.device}')
+    return list(discovered.values())
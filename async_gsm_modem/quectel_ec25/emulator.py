@@ -0,0 +1,340 @@
+import asyncio
+import os
+import re
+import tty
+from asyncio.exceptions import CancelledError
+from dataclasses import dataclass
+from typing import Dict, List
+from ..base.transport import MemoryLink, open_terminal
+from ..base.latency import command_family
+
+# Replies of the static information commands, without the final result
+RESPONSES = {
+    b'AT': [],
+    b'ATI': [b'Quectel', b'EC25', b'Revision: EC25AFFAR07A08M4G'],
+    b'AT+GMI': [b'Quectel'],
+    b'AT+GMM': [b'EC25'],
+    b'AT+GMR': [b'EC25AFFAR07A08M4G'],
+    b'AT+CGMI': [b'Quectel'],
+    b'AT+CGMM': [b'EC25'],
+    b'AT+CGMR': [b'EC25AFFAR07A08M4G'],
+    b'AT&V': [b'&C: 1', b'&D: 2', b'&F: 0', b'&W: 0', b'E: 0', b'Q: 0', b'V: 1', b'X: 1', b'Z: 0', b'S0: 0', b'S3: 13',
+              b'S4: 10', b'S5: 8', b'S6: 2', b'S7: 0', b'S8: 2', b'S10: 15'],
+    b'ATS3?': [b'013'],
+    b'AT+CPAS': [b'+CPAS: 0'],
+    b'AT+CEER': [b'+CEER: 5,36'],
+    b'AT+CIMI': [b'0000000000000000'],
+    b'AT+QCCID': [b'+QCCID: 0000000000000000F'],
+    b'AT+QINISTAT': [b'+QINISTAT: 7'],
+    b'AT+CSQ': [b'+CSQ: 16,99'],
+    b'AT+COPN': [b'+COPN: "00101","Test PLMN 1-1"', b'+COPN: "00102","Test PLMN 1-2"', b'+COPN: "00201","Test PLMN 2-1"'],
+    b'AT+QLTS': [b'+QLTS: "2021/04/21,07:11:49-28,1"'],
+    b'AT+QNWINFO': [b'+QNWINFO: "FDD LTE","310000","LTE BAND 2",1125'],
+    b'AT+QSPN': [b'+QSPN: "T-Mobile","T-Mobile","",0,"310000"'],
+    b'AT+CNUM': [b'+CNUM: ,"10000000000",129'],
+    b'AT+CMGF?': [b'+CMGF: 0'],
+}
+
+# AT+CMGD <delflag> -> message statuses deleted
+DELETE_STATUSES = {
+    b'1': (1,),
+    b'2': (1, 3),
+    b'3': (1, 2, 3),
+    b'4': (0, 1, 2, 3),
+}
+
+PART_PATTERN = re.compile(br'^(\+[A-Z0-9]+|&[A-Z]|[A-Z])(=\?|\?|=)?(.*)$', re.IGNORECASE)
+
+class EmulatorError(Exception):
+    """Raised by a command handler to answer with an error result"""
+
+    def __init__(self, error: bytes = b'ERROR'):
+        self.error = error
+        super().__init__(error)
+
+@dataclass
+class StoredMessage:
+    status: int # 0 received unread, 1 received read, 2 stored unsent, 3 stored sent
+    pdu: bytes # hex encoded, including the SMSC
+
+    @property
+    def length(self) -> int:
+        # TPDU length, i.e. without the SMSC information
+        return len(self.pdu) // 2 - int(self.pdu[:2], 16) - 1
+
+@dataclass
+class Fault:
+    family: bytes
+    lines: List[bytes] = None # replaces the reply, an empty list to not answer at all
+    delay: float = 0 # extra seconds before answering
+    times: int = 1
+
+class Emulator:
+    """Scriptable Quectel EC25 that answers AT commands over a pseudo-terminal or a memory link
+
+    Static information commands are answered from ``RESPONSES``, messages are kept
+    in a simulated store for ``AT+CMGL``, ``AT+CMGR``, ``AT+CMGD`` and ``AT+CMGS``
+    and URCs can be emitted directly or on a schedule.
+
+    Attributes:
+        latency -- Seconds to wait before answering, keyed on command family
+        default_latency -- Seconds to wait before answering other commands
+        baud_rate -- Throttles output to the speed of a serial line, None for no limit
+        messages -- The SMS store keyed on index
+        sent -- Submitted PDUs, hex encoded
+        commands -- Every command line received
+    """
+
+    def __init__(self, latency: Dict[bytes, float] = None, default_latency: float = 0, baud_rate: int = None,
+                 imei: bytes = b'866758042177355', registration: bytes = b'0,1'):
+        self.latency = dict(latency) if latency else {}
+        self.default_latency = default_latency
+        self.baud_rate = baud_rate
+        self.imei = imei
+        self.registration = registration
+        self.echo = True
+
+        self.messages: Dict[int, StoredMessage] = {}
+        self.sent: List[bytes] = []
+        self.commands: List[bytes] = []
+        self.faults: List[Fault] = []
+        self.message_reference = 0
+
+        self.reader = None
+        self.writer = None
+        self.link = None
+        self.slave = None
+        self.task = None
+        self.schedules = []
+        self.output_lock = asyncio.Lock()
+
+        self.handlers = {
+            b'E': self.handle_echo,
+            b'+GSN': self.handle_imei,
+            b'+CGSN': self.handle_imei,
+            b'+CREG': self.handle_registration,
+            b'+CMGL': self.handle_list,
+            b'+CMGR': self.handle_read,
+            b'+CMGD': self.handle_delete,
+        }
+
+    async def open_pty(self) -> str:
+        """Serve on a new pseudo-terminal and return the device URL for ``Modem``"""
+        master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.start(*await open_terminal(master))
+        return f'pty://{os.ttyname(self.slave)}'
+
+    def open_memory(self, name: str) -> str:
+        """Serve on a new memory link and return the device URL for ``Modem``"""
+        self.link = MemoryLink(name)
+        self.start(*self.link.device())
+        return f'memory://{name}'
+
+    def start(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader, self.writer = reader, writer
+        self.task = asyncio.create_task(self.run())
+
+    async def close(self) -> None:
+        for task in self.schedules + [self.task]:
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except (CancelledError, ConnectionError):
+                    pass
+        self.schedules = []
+        self.disconnect()
+
+    def disconnect(self) -> None:
+        """Drop the connection as if the device had been unplugged"""
+        if self.link:
+            self.link.close()
+            self.link = None
+        elif self.writer:
+            self.writer.close()
+        if self.slave is not None:
+            os.close(self.slave)
+            self.slave = None
+
+    def inject(self, family: bytes, lines: List[bytes] = None, delay: float = 0, times: int = 1) -> None:
+        """Disturb the next ``times`` commands of a family
+
+        The reply is replaced with ``lines`` if given, an empty list leaves the command
+        unanswered, and ``delay`` holds the reply back.
+        """
+        self.faults.append(Fault(family, lines, delay, times))
+
+    def store(self, pdu: bytes, status: int = 0) -> int:
+        index = next(n for n in range(len(self.messages) + 1) if n not in self.messages)
+        self.messages[index] = StoredMessage(status, pdu)
+        return index
+
+    async def deliver(self, pdu: bytes) -> int:
+        """Store a received message and announce it with ``+CMTI``"""
+        index = self.store(pdu)
+        await self.send_urc(f'+CMTI: "ME",{index}'.encode())
+        return index
+
+    async def set_registration(self, status: bytes) -> None:
+        self.registration = b'0,' + status
+        await self.send_urc(b'+CREG: ' + status)
+
+    def schedule(self, line: bytes, interval: float, count: int = None) -> None:
+        """Emit a URC every ``interval`` seconds, ``count`` times or until closed"""
+        async def emit():
+            n = 0
+            while count is None or n < count:
+                await asyncio.sleep(interval)
+                await self.send_urc(line)
+                n += 1
+        self.schedules.append(asyncio.create_task(emit()))
+
+    async def send_urc(self, line: bytes) -> None:
+        await self.write(b'\r\n' + line + b'\r\n')
+
+    async def write(self, data: bytes) -> None:
+        async with self.output_lock:
+            if self.baud_rate:
+                # 10 bits on the line per byte, sent in small bursts
+                for n in range(0, len(data), 64):
+                    chunk = data[n:n + 64]
+                    self.writer.write(chunk)
+                    await asyncio.sleep(len(chunk) * 10 / self.baud_rate)
+            else:
+                self.writer.write(data)
+            await self.writer.drain()
+
+    async def run(self) -> None:
+        buffer = bytearray()
+        while True:
+            data = await self.reader.read(4096)
+            if not data:
+                return
+            buffer += data
+            while True:
+                end = buffer.find(b'\r')
+                if end == -1:
+                    break
+                line = bytes(buffer[:end]).strip(b'\n')
+                del buffer[:end + 1]
+                if line:
+                    await self.handle_command(line, buffer)
+
+    async def handle_command(self, line: bytes, buffer: bytearray) -> None:
+        self.commands.append(line)
+        if self.echo:
+            await self.write(line + b'\r')
+
+        family = command_family(line)
+        await asyncio.sleep(self.latency.get(family, self.default_latency))
+
+        fault = next((fault for fault in self.faults if fault.family == family and fault.times > 0), None)
+        if fault:
+            fault.times -= 1
+            await asyncio.sleep(fault.delay)
+            if fault.lines is not None:
+                await self.write(b''.join(b'\r\n' + l + b'\r\n' for l in fault.lines))
+                return
+
+        if family == b'AT+CMGS':
+            await self.handle_submit(buffer)
+            return
+
+        lines = []
+        try:
+            if not line[:2].upper() == b'AT':
+                raise EmulatorError()
+            for part in self.split(line[2:]):
+                lines += self.handle_part(part)
+        except EmulatorError as e:
+            await self.write(b''.join(b'\r\n' + l + b'\r\n' for l in lines + [e.error]))
+            return
+        await self.write(b''.join(b'\r\n' + l + b'\r\n' for l in lines + [b'OK']))
+
+    def split(self, body: bytes) -> List[bytes]:
+        if body[:1] in (b'+', b'&'):
+            return body.split(b';')
+        # a basic command, possibly followed by extended commands, e.g. E0+CSQ
+        name, plus, rest = body.partition(b'+')
+        return [name] + (self.split(plus + rest) if plus else [])
+
+    def handle_part(self, part: bytes) -> List[bytes]:
+        if b'AT' + part in RESPONSES:
+            return RESPONSES[b'AT' + part]
+        match = PART_PATTERN.match(part)
+        handler = self.handlers.get(match.group(1).upper()) if match else None
+        if handler is None:
+            raise EmulatorError()
+        _, kind, arguments = match.groups()
+        return handler(kind or b'', [a.strip(b'"') for a in arguments.split(b',')] if arguments else [])
+
+    def handle_echo(self, kind: bytes, arguments: List[bytes]) -> List[bytes]:
+        self.echo = arguments == [b'1']
+        return []
+
+    def handle_imei(self, kind: bytes, arguments: List[bytes]) -> List[bytes]:
+        return [self.imei]
+
+    def handle_registration(self, kind: bytes, arguments: List[bytes]) -> List[bytes]:
+        if kind == b'?':
+            return [b'+CREG: ' + self.registration]
+        if kind == b'=?':
+            return [b'+CREG: (0-2)']
+        return []
+
+    def handle_list(self, kind: bytes, arguments: List[bytes]) -> List[bytes]:
+        if kind != b'=' or len(arguments) != 1 or arguments[0] not in (b'0', b'1', b'2', b'3', b'4'):
+            raise EmulatorError(b'+CMS ERROR: 302')
+        status = int(arguments[0])
+        lines = []
+        for index, message in sorted(self.messages.items()):
+            if status == 4 or message.status == status:
+                lines += [f'+CMGL: {index},{message.status},,{message.length}'.encode(), message.pdu]
+                if message.status == 0:
+                    message.status = 1
+        return lines
+
+    def handle_read(self, kind: bytes, arguments: List[bytes]) -> List[bytes]:
+        if kind != b'=' or len(arguments) != 1 or not arguments[0].isdigit():
+            raise EmulatorError(b'+CMS ERROR: 302')
+        message = self.messages.get(int(arguments[0]))
+        if message is None:
+            return []
+        lines = [f'+CMGR: {message.status},,{message.length}'.encode(), message.pdu]
+        if message.status == 0:
+            message.status = 1
+        return lines
+
+    def handle_delete(self, kind: bytes, arguments: List[bytes]) -> List[bytes]:
+        if kind != b'=' or not arguments or not arguments[0].isdigit():
+            raise EmulatorError(b'+CMS ERROR: 302')
+        if len(arguments) > 1 and arguments[1] in DELETE_STATUSES:
+            statuses = DELETE_STATUSES[arguments[1]]
+            for index in [i for i, message in self.messages.items() if message.status in statuses]:
+                del self.messages[index]
+        else:
+            self.messages.pop(int(arguments[0]), None)
+        return []
+
+    async def handle_submit(self, buffer: bytearray) -> None:
+        await self.write(b'\r\n> ')
+        while True:
+            end = next((n for n, octet in enumerate(buffer) if octet in (0x1A, 0x1B)), -1)
+            if end != -1:
+                break
+            data = await self.reader.read(4096)
+            if not data:
+                return
+            buffer += data
+
+        pdu, terminator = bytes(buffer[:end]), buffer[end]
+        del buffer[:end + 1]
+        if terminator == 0x1B:
+            # input aborted with ESC
+            await self.write(b'\r\nOK\r\n')
+            return
+
+        self.sent.append(pdu)
+        self.message_reference = (self.message_reference + 1) % 256
+        await self.write(f'\r\n+CMGS: {self.message_reference}\r\n\r\nOK\r\n'.encode())
@@ -3,4 +3,10 @@ from pydantic import BaseModel
 class ProductInfo(BaseModel):
     manufacturer: str
     model: str
-    revision: str
\ No newline at end of file
+    revision: str
+
+class NetworkStatus(BaseModel):
+    signal_quality: str
+    network_registration: str
+    network_info: str
+    registered_network: str
@@ -1,25 +1,36 @@
 from ..base.modem import ATModem
+from ..base.transport import Transport
 from ..base.response import Response
 from ..base.command import Command, ExtendedCommand
-from ..base.pdu import encodeSmsSubmitPdu, encodeGsm7
-from .sms import SMS
+from ..base.command_queue import Priority
+from ..base.metrics import QUEUE_WAIT
+from ..base.pdu import encodeSmsSubmitPduHex, encodeGsm7, decodeSmsPdu
+from .sms import SMS, Concatenation
 from .exceptions import *
-from .constants import STATUS_MAP, STATUS_MAP_R, DELETE_FLAG, UNSOLICITED_RESULT_CODES
+from .constants import STATUS_MAP, STATUS_MAP_R, DELETE_FLAG, COMMAND_DEADLINES, ERROR_CODES, UNSOLICITED_RESULT_CODES
 from typing import List, Type
-from .info import ProductInfo
+from .info import ProductInfo, NetworkStatus
 import logging
-from io import StringIO
-from smspdu.fields import SMSDeliver
+import time
+from datetime import timezone
 
 class Modem(ATModem):
 
-    def __init__(self, device: str, baud_rate: int):
-        super().__init__(device, baud_rate, UNSOLICITED_RESULT_CODES)
+    RESET_URCS = (b'RDY', b'POWERED DOWN')
+
+    def __init__(self, device: str, baud_rate: int, **kwargs):
+        kwargs.setdefault('deadlines', COMMAND_DEADLINES)
+        super().__init__(device, baud_rate, UNSOLICITED_RESULT_CODES, ERROR_CODES, **kwargs)
 
         self.logger = logging.getLogger('QuectelEC25Modem')
 
+    def spawn(self, transport: Transport) -> 'Modem':
+        modem = Modem(self.device, self.baud_rate, **self.config)
+        modem.transport = transport
+        return modem
+
     async def ping(self):
-        response = await self.send_command(Command(b'AT'))
+        response = await self.send_command(Command(b'AT'), priority=Priority.INTERACTIVE)
         return response == Response([])
 
     async def product_info(self) -> ProductInfo:
@@ -69,12 +80,31 @@ class Modem(ATModem):
         response = response[0].decode().replace('+CSQ: ','')
         return response
 
+    async def network_status(self) -> NetworkStatus:
+        commands = [
+            Command(b'AT+CSQ'),
+            Command(b'AT+CREG?'),
+            Command(b'AT+QNWINFO'),
+            Command(b'AT+QSPN')
+        ]
+        responses = await self.send_commands(commands)
+        signal_quality, network_registration, network_info, registered_network = [
+            response[0].decode().split(': ', 1)[1] for response in responses
+        ]
+        return NetworkStatus(
+            signal_quality=signal_quality,
+            network_registration=network_registration,
+            network_info=network_info,
+            registered_network=registered_network
+        )
+
     def parse_message(self, index, status, alpha, length, pdu) -> SMS:
-        data = SMSDeliver.decode(StringIO(pdu.decode()))
+        data = decodeSmsPdu(pdu)
 
-        text = str(data['user_data']['data'])
-        from_number = data['sender']['number']
-        date = data['scts']
+        # numbers and dates as they have always been reported: without '+' and in UTC
+        date = data.get('time')
+        discharge_date = data.get('discharge')
+        concatenation = data.concatenation
 
         return SMS(
             index=index,
@@ -82,15 +112,26 @@ class Modem(ATModem):
             alpha=alpha,
             length=length,
             pdu=pdu,
-            text=text,
-            from_number=from_number,
-            date=date
+            text=data.get('text', ''),
+            from_number=(data.number or '').lstrip('+'),
+            date=date.astimezone(timezone.utc) if date else None,
+            type=data.type,
+            smsc=data.smsc,
+            data_coding=data.get('data_coding'),
+            concatenation=Concatenation(
+                reference=concatenation.reference,
+                parts=concatenation.parts,
+                number=concatenation.number
+            ) if concatenation else None,
+            message_reference=data.get('reference'),
+            discharge_date=discharge_date.astimezone(timezone.utc) if discharge_date else None,
+            report_status=data.get('status')
         )
     
     async def read_message(self, index: int) -> SMS:
         try:
             command = ExtendedCommand(b'AT+CMGR').write(str(index).encode())
-            response = await self.send_command(command)
+            response = await self.send_command(command, priority=Priority.INTERACTIVE)
         except Exception as e:
             self.logger.error('Failed to read message', exc_info=True)
             raise ReadMessageError from e
@@ -103,20 +144,21 @@ class Modem(ATModem):
         else:
             return
 
-    async def send_message(self, to_number: str, text: str, timeout: int = 5) -> None:
+    async def send_message(self, to_number: str, text: str, timeout: float = None) -> List[str]:
         try:
-            pdus = encodeSmsSubmitPdu(to_number, text)
+            pdus = encodeSmsSubmitPduHex(to_number, text)
             message_references = []
-            async with self.write_lock:
-                for pdu in pdus:
-                    length = str(pdu[1]).encode()
-                    command = ExtendedCommand(b'AT+CMGS').write(length)
-                    await self.write(command)
-                    await self.read(seperator=b'> ') # read out and discard prompt
-                    command = ExtendedCommand(pdu[0].hex().upper().encode()).execute()
-                    await self.write(command, terminator=chr(26).encode()) # send pdu with CTRL-Z terminator
-                    response = await self.read_response(expected_response=b'+CMGS', timeout=timeout)
-                    self.at_logger.debug(response)
+            queued = time.monotonic() if self.metrics else None
+            async with self.command_queue.slot(Priority.BULK):
+                if self.metrics:
+                    self.metrics.observe(b'AT+CMGS', QUEUE_WAIT, time.monotonic() - queued)
+                for pdu, length in pdus:
+                    command = ExtendedCommand(b'AT+CMGS').write(str(length).encode())
+                    await self.transact(command, prompt=True, timeout=timeout) # wait for and discard prompt
+                    command = ExtendedCommand(pdu).execute()
+                    # send pdu with CTRL-Z terminator
+                    response = await self.transact(command, terminator=chr(26).encode(), expected_response=b'+CMGS', timeout=timeout, family=b'AT+CMGS')
+                    self.at_logger.debug('%s', response)
                     message_references.append(response[0].replace(b'+CMGS: ', b'').decode())
             return message_references
         except Exception as e:
@@ -130,7 +172,7 @@ class Modem(ATModem):
 
         try:
             command = ExtendedCommand(b'AT+CMGL').write(status)
-            response = await self.send_command(command)
+            response = await self.send_command(command, priority=Priority.BULK)
             
             if len(response)%2 > 0:
                 raise ValueError(f'Expecting even number of parts in response: {response}')
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from typing import List, Tuple
+from ..base.command import Command
+from ..base.command_queue import Priority
+from ..base.response import Response, UnsolicitedResultCode
+from .modem import Modem
+from .info import ProductInfo, NetworkStatus
+from .sms import SMS
+
+class ModemPool:
+    """Several AT ports of one EC25, e.g. ``/dev/ttyUSB2`` and ``/dev/ttyUSB3``, used as a pool of channels
+
+    Every port runs its own ``Modem`` and every call is routed to the least loaded
+    channel. Channels running or queueing bulk operations (message listing and
+    sending) count as the most loaded, and while there is more than one port the
+    first is kept free of bulk operations, so queries are not stuck behind a long
+    ``AT+CMGS``. URCs from every port are passed to ``urc_handler``.
+    """
+
+    def __init__(self, devices: List[str], baud_rate: int, **kwargs):
+        if not devices:
+            raise ValueError('At least one device is required')
+        self.channels = [Modem(device, baud_rate, **kwargs) for device in devices]
+        for channel in self.channels:
+            channel.urc_handler = self.dispatch_urc
+
+        self.logger = logging.getLogger('QuectelEC25Modem')
+
+    async def connect(self) -> None:
+        results = await asyncio.gather(*(channel.connect() for channel in self.channels), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            await asyncio.gather(*(
+                channel.close() for channel, result in zip(self.channels, results) if result is None
+            ))
+            raise errors[0]
+
+    async def close(self) -> None:
+        await asyncio.gather(*(channel.close() for channel in self.channels))
+
+    async def dispatch_urc(self, response: UnsolicitedResultCode) -> None:
+        # looked up on every URC, so urc_handler can be replaced after the pool was created
+        await self.urc_handler(response)
+
+    async def urc_handler(self, response: UnsolicitedResultCode) -> None:
+        pass
+
+    def load(self, channel: Modem) -> Tuple[int, int]:
+        queue = channel.command_queue
+        bulk = (queue.running == Priority.BULK) + sum(1 for entry in queue.waiters if entry[0] == Priority.BULK)
+        return bulk, queue.depth + queue.locked()
+
+    def route(self, priority: Priority = Priority.NORMAL) -> Modem:
+        if priority == Priority.BULK:
+            # on ties prefer the last port, furthest from the query channel
+            channels = reversed(self.channels[1:] or self.channels)
+        else:
+            channels = self.channels
+        return min(channels, key=self.load)
+
+    async def send_command(self, command: Command, response_terminator: bytes = None, timeout: float = None,
+                           priority: Priority = Priority.NORMAL) -> Response:
+        return await self.route(priority).send_command(command, response_terminator, timeout, priority)
+
+    async def ping(self) -> bool:
+        return await self.route(Priority.INTERACTIVE).ping()
+
+    async def product_info(self) -> ProductInfo:
+        return await self.route().product_info()
+
+    async def imei(self):
+        return await self.route().imei()
+
+    async def imsi(self):
+        return await self.route().imsi()
+
+    async def iccid(self):
+        return await self.route().iccid()
+
+    async def number(self):
+        return await self.route().number()
+
+    async def network_info(self):
+        return await self.route().network_info()
+
+    async def network_registration(self):
+        return await self.route().network_registration()
+
+    async def registered_network(self):
+        return await self.route().registered_network()
+
+    async def signal_quality(self):
+        return await self.route().signal_quality()
+
+    async def network_status(self) -> NetworkStatus:
+        return await self.route().network_status()
+
+    async def read_message(self, index: int) -> SMS:
+        return await self.route(Priority.INTERACTIVE).read_message(index)
+
+    async def send_message(self, to_number: str, text: str, timeout: float = None) -> List[str]:
+        return await self.route(Priority.BULK).send_message(to_number, text, timeout)
+
+    async def list_messages(self, status: str = 'ALL') -> List[SMS]:
+        return await self.route(Priority.BULK).list_messages(status)
+
+    async def delete_message(self, index: int):
+        return await self.route().delete_message(index)
+
+    async def delete_messages(self, del_flag: str = 'ALL'):
+        return await self.route().delete_messages(del_flag)
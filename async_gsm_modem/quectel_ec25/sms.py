@@ -1,5 +1,11 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
+
+class Concatenation(BaseModel):
+    reference: int
+    parts: int
+    number: int
 
 class SMS(BaseModel):
     index: int
@@ -9,4 +15,11 @@ class SMS(BaseModel):
     pdu: bytes
     text: str
     from_number: str
-    date: datetime
\ No newline at end of file
+    date: Optional[datetime] = None
+    type: str = 'SMS-DELIVER'
+    smsc: Optional[str] = None
+    data_coding: Optional[int] = None # 0 GSM-7, 1 8-bit data, 2 UCS2
+    concatenation: Optional[Concatenation] = None
+    message_reference: Optional[int] = None # SMS-SUBMIT and SMS-STATUS-REPORT only
+    discharge_date: Optional[datetime] = None # SMS-STATUS-REPORT only
+    report_status: Optional[int] = None # SMS-STATUS-REPORT only
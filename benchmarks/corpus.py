@@ -0,0 +1,34 @@
+"""Fixed message corpus shared by the benchmarks, so results stay comparable between runs"""
+from datetime import datetime, timedelta
+from async_gsm_modem.base.pdu import encodeSmsSubmitPdu, _encodeTimestamp, SmsPduTzInfo
+
+NUMBER = '+12345678900'
+TIMESTAMP = datetime(2021, 4, 26, 15, 40, 59, tzinfo=SmsPduTzInfo('-28'))
+
+TEXTS = {
+    'gsm7_short': 'Test',
+    'gsm7_long': 'The quick brown fox jumps over the lazy dog, then naps under the old oak tree until sunset. 0123456789 (ok?)',
+    'gsm7_extended': 'Price: 10€ [incl. tax] {ref: ~42} ^_^ |a\\b|',
+    'gsm7_multipart': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 8,
+    'ucs2_short': 'Привет, как дела? 你好',
+    'ucs2_multipart': 'Привет, как дела? 你好世界 ' * 12,
+}
+
+def submit_to_deliver(pdu: bytes) -> str:
+    """Turn an encoded SMS-SUBMIT (without SMSC or validity period) into the SMS-DELIVER a recipient would read"""
+    first_octet = pdu[1]
+    address_length = 2 + (pdu[3] + 1) // 2
+    address = pdu[3:3 + address_length]
+    rest = pdu[3 + address_length:] # PID, DCS, UDL, UD
+    deliver = bytes((0x00, 0x04 | (first_octet & 0x40))) + address + rest[:2] + bytes(_encodeTimestamp(TIMESTAMP)) + rest[2:]
+    return deliver.hex().upper()
+
+def submit_pdus(text: str):
+    return encodeSmsSubmitPdu(NUMBER, text, reference=7, requestStatusReport=False)
+
+# text name -> SMS-DELIVER PDUs in hex, as listed by AT+CMGL
+DELIVER_PDUS = {
+    name: [submit_to_deliver(bytes(pdu)) for pdu, _ in submit_pdus(text)] for name, text in TEXTS.items()
+}
+# a PDU as received from a network, with an SMSC address
+DELIVER_PDUS['gsm7_network'] = ['07912160130350F7040B912108378482F500001240625104958A04D4F29C0E']
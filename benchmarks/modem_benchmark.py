@@ -0,0 +1,137 @@
+"""End-to-end throughput of Modem against emulated EC25s as the number of modems grows
+
+Each modem is driven at a fixed rate with a mix of AT+CSQ queries, message
+listings and message sends. For every modem count the run reports completed
+commands/sec, latency percentiles per operation, event loop lag and process
+CPU time. The emulators run in the same process and loop, so CPU time covers
+both sides of the link. Run it with the package importable, e.g. after
+``pip install -e .``:
+
+    python benchmarks/modem_benchmark.py --modems 1,10,50,100,200 --output modems.json
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, List
+from async_gsm_modem.base.command import Command
+from async_gsm_modem.quectel_ec25.modem import Modem
+from async_gsm_modem.quectel_ec25.emulator import Emulator
+from corpus import NUMBER, TEXTS, DELIVER_PDUS
+from report import write_results, compare
+
+# operation -> share of the commands sent
+MIX = {
+    'send_command': 0.8,
+    'list_messages': 0.1,
+    'send_message': 0.1,
+}
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[round(fraction * (len(ordered) - 1))]
+
+async def monitor_lag(interval: float, lags: List[float]) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - start - interval)
+
+async def drive(modem: Modem, rate: float, duration: float, latencies: Dict[str, List[float]], errors: List[int]) -> None:
+    """Issue operations on a fixed schedule, the schedule does not wait for slow responses"""
+    loop = asyncio.get_running_loop()
+    operations = [name for name, share in MIX.items() for _ in range(round(share * 10))]
+    calls = {
+        'send_command': lambda: modem.send_command(Command(b'AT+CSQ')),
+        'list_messages': lambda: modem.list_messages(),
+        'send_message': lambda: modem.send_message(NUMBER, TEXTS['gsm7_long']),
+    }
+
+    async def run(name):
+        start = loop.time()
+        try:
+            await calls[name]()
+        except Exception:
+            errors[0] += 1
+            return
+        latencies[name].append(loop.time() - start)
+
+    tasks = []
+    start = loop.time()
+    n = 0
+    while loop.time() - start < duration:
+        tasks.append(asyncio.create_task(run(operations[n % len(operations)])))
+        n += 1
+        await asyncio.sleep(max(start + n / rate - loop.time(), 0))
+    await asyncio.gather(*tasks)
+
+async def run_scale(modems: int, rate: float, duration: float, transport: str, messages: int) -> dict:
+    emulators, clients = [], []
+    for n in range(modems):
+        emulator = Emulator()
+        for pdu in DELIVER_PDUS['gsm7_long'] * messages:
+            emulator.store(pdu, status=1)
+        device = await emulator.open_pty() if transport == 'pty' else emulator.open_memory(f'bench{n}')
+        emulators.append(emulator)
+        clients.append(Modem(device, 115200))
+    await asyncio.gather(*(modem.connect() for modem in clients))
+
+    latencies = {name: [] for name in MIX}
+    errors = [0]
+    lags = []
+    lag_monitor = asyncio.create_task(monitor_lag(0.01, lags))
+    wall, cpu = time.monotonic(), time.process_time()
+    await asyncio.gather(*(drive(modem, rate, duration, latencies, errors) for modem in clients))
+    wall, cpu = time.monotonic() - wall, time.process_time() - cpu
+    lag_monitor.cancel()
+
+    await asyncio.gather(*(modem.close() for modem in clients))
+    await asyncio.gather(*(emulator.close() for emulator in emulators))
+
+    completed = sum(len(samples) for samples in latencies.values())
+    result = {
+        'modems': modems,
+        'commands_per_sec': completed / wall,
+        'errors': errors[0],
+        'loop_lag_p99_ms': percentile(lags, 0.99) * 1e3,
+        'loop_lag_max_ms': max(lags, default=0) * 1e3,
+        'cpu_seconds': cpu,
+        'cpu_per_modem_pct': cpu / wall / modems * 100,
+    }
+    for name, samples in latencies.items():
+        result[f'{name}_p50_ms'] = percentile(samples, 0.5) * 1e3
+        result[f'{name}_p99_ms'] = percentile(samples, 0.99) * 1e3
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modems', default='1,10,50,100,200', help='comma separated modem counts')
+    parser.add_argument('--rate', type=float, default=5, help='commands per second per modem')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per modem count')
+    parser.add_argument('--transport', choices=('memory', 'pty'), default='memory')
+    parser.add_argument('--messages', type=int, default=5, help='stored messages per emulator')
+    parser.add_argument('--output', default='modem_benchmark.json', help='results file')
+    parser.add_argument('--compare', metavar='BASELINE', help='results file of an earlier run')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    results = {}
+    for modems in [int(n) for n in args.modems.split(',')]:
+        result = asyncio.run(run_scale(modems, args.rate, args.duration, args.transport, args.messages))
+        results[f'{args.transport}[modems={modems}]'] = result
+        print(
+            f'{modems:>4} modems {result["commands_per_sec"]:>9,.0f} cmd/s'
+            f'  AT+CSQ p50 {result["send_command_p50_ms"]:6.2f} ms p99 {result["send_command_p99_ms"]:6.2f} ms'
+            f'  lag p99 {result["loop_lag_p99_ms"]:6.2f} ms  cpu/modem {result["cpu_per_modem_pct"]:5.2f}%'
+            f'  errors {result["errors"]}'
+        )
+
+    write_results(args.output, 'modem', results)
+    if args.compare:
+        compare(results, args.compare, 'commands_per_sec')
+
+if __name__ == '__main__':
+    main()
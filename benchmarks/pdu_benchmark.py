@@ -0,0 +1,84 @@
+"""Micro-benchmarks of the PDU codec in async_gsm_modem/base/pdu.py
+
+Every function is timed over the fixed corpus in corpus.py. Results hold the
+best of several repeats as ops/sec, and the memory allocated by a single call
+as traced by tracemalloc: the transient peak and what is still held
+afterwards (CPython has no per-call allocation counter, bytes are the
+closest stable measure). Run it with the package importable, e.g. after
+``pip install -e .``:
+
+    python benchmarks/pdu_benchmark.py --output pdu.json
+    python benchmarks/pdu_benchmark.py --compare pdu.json
+"""
+import argparse
+import gc
+import timeit
+import tracemalloc
+from typing import Callable, Dict
+from async_gsm_modem.base.pdu import (
+    encodeGsm7, decodeGsm7, gsm7Length, packSeptets, unpackSeptets, divideTextGsm7, decodeSmsPdu, encodeSmsSubmitPdu,
+    encodeSmsSubmitPduHex
+)
+from corpus import NUMBER, TEXTS, DELIVER_PDUS
+from report import write_results, compare
+
+def benchmarks() -> Dict[str, Callable]:
+    cases = {}
+    for name, text in TEXTS.items():
+        if name.startswith('gsm7'):
+            octets = encodeGsm7(text)
+            septets = packSeptets(octets)
+            cases[f'encodeGsm7[{name}]'] = lambda text=text: encodeGsm7(text)
+            cases[f'decodeGsm7[{name}]'] = lambda octets=octets: decodeGsm7(octets)
+            cases[f'gsm7Length[{name}]'] = lambda text=text: gsm7Length(text)
+            cases[f'packSeptets[{name}]'] = lambda octets=octets: packSeptets(octets)
+            cases[f'unpackSeptets[{name}]'] = lambda septets=septets: unpackSeptets(septets)
+            cases[f'divideTextGsm7[{name}]'] = lambda text=text: divideTextGsm7(text)
+        cases[f'encodeSmsSubmitPdu[{name}]'] = lambda text=text: encodeSmsSubmitPdu(NUMBER, text, reference=7)
+        cases[f'encodeSmsSubmitPduHex[{name}]'] = lambda text=text: encodeSmsSubmitPduHex(NUMBER, text, reference=7)
+    for name, pdus in DELIVER_PDUS.items():
+        cases[f'decodeSmsPdu[{name}]'] = lambda pdus=pdus: [decodeSmsPdu(pdu) for pdu in pdus]
+    return cases
+
+def allocations(function: Callable) -> Dict[str, int]:
+    function() # warm up caches so only the steady state is measured
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = function()
+        _, peak = tracemalloc.get_traced_memory()
+        del result
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'peak_bytes': peak - before, 'retained_bytes': max(current - before, 0)}
+
+def measure(function: Callable, repeat: int) -> Dict[str, float]:
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat, number)) / number
+    return {'ops_per_sec': 1 / best, 'ns_per_op': best * 1e9, 'loops': number, **allocations(function)}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default='pdu_benchmark.json', help='results file')
+    parser.add_argument('--compare', metavar='BASELINE', help='results file of an earlier run')
+    parser.add_argument('--filter', default='', help='only run benchmarks containing this string')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    for name, function in benchmarks().items():
+        if args.filter in name:
+            results[name] = measure(function, args.repeat)
+            result = results[name]
+            print(f'{name:<50} {result["ops_per_sec"]:>12,.0f} ops/s {result["peak_bytes"]:>8} B peak')
+
+    write_results(args.output, 'pdu', results)
+    if args.compare:
+        compare(results, args.compare, 'ops_per_sec')
+
+if __name__ == '__main__':
+    main()
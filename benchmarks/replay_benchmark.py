@@ -0,0 +1,47 @@
+"""Line parser throughput on a recorded modem session
+
+Replays a trace written with ``Modem(..., trace=path)`` through a fresh EC25
+parser as fast as possible and reports MB/s and lines/s. Run it with the
+package importable, e.g. after ``pip install -e .``:
+
+    python benchmarks/replay_benchmark.py session.trace --output replay.json
+"""
+import argparse
+import asyncio
+import logging
+from async_gsm_modem.base.trace import TraceReplayer
+from async_gsm_modem.quectel_ec25.modem import Modem
+from report import write_results, compare
+
+async def replay(path: str) -> dict:
+    result = await TraceReplayer(Modem('replay', 115200), path).replay()
+    return {
+        'bytes_per_sec': result.bytes_received / result.elapsed,
+        'lines_per_sec': result.lines / result.elapsed,
+        'lines': result.lines,
+        'responses': len(result.responses),
+        'urcs': len(result.urcs),
+        'unanswered': result.unanswered,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('trace', help='trace file')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default='replay_benchmark.json', help='results file')
+    parser.add_argument('--compare', metavar='BASELINE', help='results file of an earlier run')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    runs = [asyncio.run(replay(args.trace)) for _ in range(args.repeat)]
+    best = max(runs, key=lambda run: run['bytes_per_sec'])
+    print(f'{best["bytes_per_sec"] / 1e6:.2f} MB/s {best["lines_per_sec"]:,.0f} lines/s '
+          f'({best["responses"]} responses, {best["urcs"]} URCs, {best["unanswered"]} unanswered)')
+
+    results = {'replay': best}
+    write_results(args.output, 'replay', results)
+    if args.compare:
+        compare(results, args.compare, 'bytes_per_sec')
+
+if __name__ == '__main__':
+    main()
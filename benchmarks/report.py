@@ -0,0 +1,39 @@
+"""Machine readable benchmark results and comparison against an earlier run"""
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Dict
+
+def metadata() -> Dict[str, str]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+
+def write_results(path: str, benchmark: str, results: Dict[str, dict]) -> None:
+    with open(path, 'w') as f:
+        json.dump({'benchmark': benchmark, 'meta': metadata(), 'results': results}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def compare(results: Dict[str, dict], baseline_path: str, key: str, higher_is_better: bool = True) -> None:
+    """Print the change of ``key`` for every result also present in the baseline file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    for name, result in results.items():
+        if name not in baseline or not baseline[name].get(key):
+            continue
+        change = result[key] / baseline[name][key] - 1
+        worse = change < 0 if higher_is_better else change > 0
+        print(f'{name:<50} {key} {change:+8.1%}{"  REGRESSION" if worse and abs(change) > 0.1 else ""}')
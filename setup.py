@@ -19,5 +19,5 @@ setuptools.setup(
         "Operating System :: OS Independent",
     ],
     python_requires='>=3.6',
-    install_requires=['pyserial-asyncio', 'smspdudecoder','pydantic']
+    install_requires=['pyserial-asyncio', 'pydantic']
 )
\ No newline at end of file
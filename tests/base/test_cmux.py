@@ -0,0 +1,99 @@
+import pytest
+import asyncio
+from async_gsm_modem.base.modem import ATModem
+from async_gsm_modem.base.command import Command
+from async_gsm_modem.base.response import Response
+from async_gsm_modem.base.transport import MemoryLink
+from async_gsm_modem.base.cmux import *
+
+class CmuxDevice:
+    """Device side of a memory link that switches to basic mode multiplexing on AT+CMUX"""
+
+    def __init__(self, name):
+        self.link = MemoryLink(name)
+        self.reader, self.writer = self.link.device()
+        self.decoder = CmuxDecoder()
+        self.commands = {}
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        while not (await self.reader.readuntil(b'\r')).startswith(b'AT+CMUX=0,0,5,'):
+            self.writer.write(b'\r\nOK\r\n')
+        self.writer.write(b'\r\nOK\r\n')
+        while True:
+            data = await self.reader.read(4096)
+            if not data:
+                return
+            for frame in self.decoder.feed(data):
+                self.handle_frame(frame)
+
+    def handle_frame(self, frame):
+        if frame.control == SABM:
+            # the responding station sets C/R in its responses
+            self.writer.write(encode_frame(frame.dlci, UA | PF))
+        elif frame.control == UIH and frame.dlci:
+            self.commands.setdefault(frame.dlci, []).append(frame.data)
+            for _ in range(frame.data.count(b'\r')):
+                self.writer.write(encode_frame(frame.dlci, UIH, b'\r\nOK\r\n', command=False))
+
+    async def close(self):
+        self.link.close()
+        self.task.cancel()
+        try:
+            await self.task
+        except (asyncio.CancelledError, asyncio.IncompleteReadError):
+            pass
+
+@pytest.fixture
+async def device():
+    device = CmuxDevice('ttyXRUSB2')
+    yield device
+    await device.close()
+
+def test_fcs_table():
+    assert FCS_TABLE[0] == 0x00
+    assert FCS_TABLE[1] == 0x91
+
+@pytest.mark.parametrize('frame, encoded', [
+    ((0, SABM | PF), bytes.fromhex('F9033F011CF9')),
+    ((0, UA | PF), bytes.fromhex('F9037301D7F9')),
+])
+def test_encode_frame(frame, encoded):
+    assert encode_frame(*frame) == encoded
+
+def test_decode_frame():
+    decoder = CmuxDecoder()
+    data = encode_frame(1, UIH, b'AT\r') + encode_frame(2, UIH, b'x' * 200)
+    frames = decoder.feed(data[:5]) + decoder.feed(data[5:])
+    assert frames == [CmuxFrame(1, UIH, True, b'AT\r'), CmuxFrame(2, UIH, True, b'x' * 200)]
+
+def test_decode_corrupt_frame():
+    decoder = CmuxDecoder()
+    corrupt = bytearray(encode_frame(1, UIH, b'AT\r'))
+    corrupt[-2] ^= 0xFF
+    frames = decoder.feed(b'\x00' + bytes(corrupt) + encode_frame(1, UIH, b'OK'))
+    assert frames == [CmuxFrame(1, UIH, True, b'OK')]
+    assert decoder.dropped == 1
+
+def test_decode_corrupt_length():
+    decoder = CmuxDecoder(max_length=127)
+    frames = [encode_frame(1, UIH, b'OK') for _ in range(21)]
+    assert decoder.feed(bytes.fromhex('F905EF0CFF') + b''.join(frames)) == [CmuxFrame(1, UIH, True, b'OK')] * 21
+    assert decoder.dropped == 1
+    assert decoder.buffer == bytearray(b'\xf9')
+
+@pytest.mark.asyncio
+async def test_multiplex(device):
+    modem = ATModem('memory://ttyXRUSB2', 115200)
+    await modem.connect()
+
+    channels = await modem.multiplex(channels=2)
+    assert len(channels) == 2
+    assert modem.mux.decoder.max_length == 127
+    responses = await asyncio.gather(*(channel.send_command(Command(b'AT+CSQ'), timeout=1) for channel in channels))
+    assert responses == [Response([]), Response([])]
+    assert b''.join(device.commands[1]) == b''.join(device.commands[2]) == b'ATE0\rAT+CSQ\r'
+
+    for channel in channels:
+        await channel.close()
+    await modem.close()
@@ -0,0 +1,41 @@
+import pytest
+from async_gsm_modem.base.command import Command, ExtendedCommand, CompoundCommand
+from async_gsm_modem.base.response import Response
+
+def test_compound_command():
+    command = CompoundCommand(
+        Command(b'AT+CSQ'),
+        ExtendedCommand(b'AT+CREG').read(),
+        ExtendedCommand(b'AT+CMGF').write(b'0'),
+        Command(b'AT+QNWINFO')
+    )
+    assert bytes(command) == b'AT+CSQ;+CREG?;+CMGF=0;+QNWINFO'
+    assert command.prefixes == [b'+CSQ', b'+CREG', b'+CMGF', b'+QNWINFO']
+
+def test_compound_basic_commands():
+    assert bytes(CompoundCommand(Command(b'AT'), Command(b'ATE0'), Command(b'AT+CMEE=1'))) == b'ATE0+CMEE=1'
+    assert bytes(CompoundCommand(Command(b'AT+CSQ'), Command(b'AT'), Command(b'AT+CREG?'))) == b'AT+CSQ;+CREG?'
+
+def test_compound_split():
+    command = CompoundCommand(Command(b'AT+CSQ'), ExtendedCommand(b'AT+CMGF').write(b'0'), Command(b'AT+QSPN'))
+    responses = command.split([b'+CSQ: 16,99', b'+QSPN: "T-Mobile","T-Mobile","",0,"310000"'])
+    assert responses == [
+        Response([b'+CSQ: 16,99']),
+        Response([]),
+        Response([b'+QSPN: "T-Mobile","T-Mobile","",0,"310000"'])
+    ]
+    assert responses[0] == [b'+CSQ: 16,99']
+
+def test_compound_failed_index():
+    command = CompoundCommand(Command(b'AT+CSQ'), Command(b'AT+QSPN'), Command(b'AT+QNWINFO'))
+    assert command.failed_index(command.split([b'+CSQ: 16,99'])) == 1
+    assert command.failed_index(command.split([])) == 0
+
+    # AT+CMGF=0 succeeds silently, the error may belong to it or to AT+CREG?
+    command = CompoundCommand(Command(b'AT+CSQ'), ExtendedCommand(b'AT+CMGF').write(b'0'), Command(b'AT+CREG?'))
+    assert command.failed_index(command.split([b'+CSQ: 16,99'])) is None
+    assert command.failed_index(command.split([b'+CSQ: 16,99', b'+CREG: 0,1'])) == 2
+    command = CompoundCommand(Command(b'AT'), Command(b'ATE0'))
+    assert command.failed_index(command.split([])) is None
+    command = CompoundCommand(Command(b'AT+CSQ'), Command(b'AT+CREG?'), Command(b'ATE0'))
+    assert command.failed_index(command.split([b'+CSQ: 16,99'])) == 1
@@ -0,0 +1,60 @@
+import pytest
+import asyncio
+from async_gsm_modem.base.command_queue import CommandQueue, Priority
+from async_gsm_modem.base.exceptions import CommandQueueFull
+
+@pytest.mark.asyncio
+async def test_priority_order():
+    queue = CommandQueue()
+    order = []
+
+    async def run(name, priority):
+        async with queue.slot(priority):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    await queue.acquire(Priority.BULK)
+    tasks = [
+        asyncio.create_task(run('list', Priority.BULK)),
+        asyncio.create_task(run('csq', Priority.NORMAL)),
+        asyncio.create_task(run('ping', Priority.INTERACTIVE)),
+        asyncio.create_task(run('send', Priority.BULK)),
+    ]
+    await asyncio.sleep(0)
+    assert queue.depth == 4
+    queue.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ['ping', 'csq', 'list', 'send']
+    assert not queue.locked()
+    assert queue.max_depth == 4
+    assert queue.acquired[Priority.BULK] == 3
+
+@pytest.mark.asyncio
+async def test_queue_full():
+    queue = CommandQueue(maxsize=1)
+    await queue.acquire()
+    waiter = asyncio.create_task(queue.acquire())
+    await asyncio.sleep(0)
+
+    with pytest.raises(CommandQueueFull):
+        await queue.acquire()
+
+    queue.release()
+    await waiter
+    queue.release()
+    assert not queue.locked()
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter():
+    queue = CommandQueue()
+    await queue.acquire()
+    waiter = asyncio.create_task(queue.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert queue.depth == 0
+    queue.release()
+    assert not queue.locked()
@@ -0,0 +1,24 @@
+import pytest
+from async_gsm_modem.base.framer import LineFramer
+
+def test_feed_lines():
+    framer = LineFramer()
+    assert framer.feed(b'\r\n+CSQ: 16,99\r\n\r\nOK\r\n') == [b'', b'+CSQ: 16,99', b'', b'OK']
+    assert not framer.buffer
+
+def test_feed_partial_line():
+    framer = LineFramer()
+    assert framer.feed(b'+CMGL: 0,0,,23\r\n0791') == [b'+CMGL: 0,0,,23']
+    assert framer.feed(b'2160\r\nO') == [b'07912160']
+    assert framer.feed(b'K\r\n') == [b'OK']
+
+def test_feed_prompt():
+    framer = LineFramer()
+    assert framer.feed(b'\r\n> ') == [b'', b'> ']
+    assert not framer.buffer
+
+def test_flush():
+    framer = LineFramer()
+    framer.feed(b'OK\r\n+CM')
+    assert framer.flush() == b'+CM'
+    assert not framer.buffer
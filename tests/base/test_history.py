@@ -0,0 +1,46 @@
+import pytest
+import asyncio
+import logging
+from async_gsm_modem.base.modem import ATModem
+from async_gsm_modem.base.command import Command
+from async_gsm_modem.base.exceptions import CommandFailed
+from async_gsm_modem.base.transport import MemoryLink
+from async_gsm_modem.base.history import History
+from async_gsm_modem.base.trace import RECEIVED, SENT
+
+def test_history_wraps_around():
+    history = History(3)
+    for n in range(5):
+        history.record(SENT if n % 2 else RECEIVED, bytes([0x30 + n]))
+    assert [(direction, data) for _, direction, data in history.entries()] == [(RECEIVED, b'2'), (SENT, b'3'), (RECEIVED, b'4')]
+    assert history.count == 5
+
+def test_history_dump():
+    history = History(4)
+    assert history.dump() == ''
+    history.record(SENT, b'AT+CSQ\r')
+    history.record(RECEIVED, b'+CSQ: 16,99')
+    lines = history.dump().split('\n')
+    assert lines[0].endswith("s > b'AT+CSQ\\r'")
+    assert lines[1] == "   +0.000s < b'+CSQ: 16,99'"
+
+def test_history_size():
+    with pytest.raises(ValueError):
+        History(0)
+    assert ATModem('ttyUSB0', 115200, history=0).history is None
+
+@pytest.mark.asyncio
+async def test_timeout_dumps_history(mocker, caplog):
+    mocker.patch.object(ATModem, 'initialize', return_value=None)
+    link = MemoryLink('ttyHistory')
+    reader, writer = link.device()
+    modem = ATModem('memory://ttyHistory', 115200)
+    await modem.connect()
+    with caplog.at_level(logging.WARNING):
+        writer.write(b'\r\n+CSQ: 16,99\r\n')
+        with pytest.raises(CommandFailed):
+            await modem.send_command(Command(b'AT+CSQ'), timeout=0.1)
+    await modem.close()
+    link.close()
+    assert "Timed out waiting for Command(AT+CSQ), last 2 line(s) exchanged" in caplog.text
+    assert "> b'AT+CSQ\\r'" in caplog.text
@@ -0,0 +1,48 @@
+import pytest
+from async_gsm_modem.base.command import Command, ExtendedCommand, CompoundCommand
+from async_gsm_modem.base.latency import LatencyTracker, command_family
+
+def test_command_family():
+    assert command_family(ExtendedCommand(b'AT+CREG').read()) == b'AT+CREG'
+    assert command_family(ExtendedCommand(b'AT+CREG').write(b'2')) == b'AT+CREG'
+    assert command_family(Command(b'AT+CSQ')) == b'AT+CSQ'
+    assert command_family(Command(b'AT')) == b'AT'
+    assert command_family(Command(b'ATE0')) == b'ATE'
+    assert command_family(CompoundCommand(Command(b'AT+CSQ'), Command(b'AT+QSPN'))) == b'AT+CSQ;+QSPN'
+
+def test_learned_deadline():
+    latency = LatencyTracker(default=5, min_samples=4)
+    for _ in range(3):
+        latency.record(b'AT', 0.01)
+    assert latency.deadline(b'AT') == 5
+
+    latency.record(b'AT', 0.01)
+    assert latency.deadline(b'AT') == latency.minimum
+
+    for _ in range(4):
+        latency.record(b'AT+COPN', 1)
+    assert latency.deadline(b'AT+COPN') == 3
+
+def test_deadline_ceiling():
+    latency = LatencyTracker(default=5, defaults={b'AT+CMGS': 120}, min_samples=1)
+    latency.record(b'AT+CMGS', 50)
+    assert latency.deadline(b'AT+CMGS') == 120
+    latency.record(b'AT+CSQ', 50)
+    assert latency.deadline(b'AT+CSQ') == 5
+
+def test_configured_deadline_not_learned():
+    latency = LatencyTracker(default=5, defaults={b'AT+CMGL': 30}, min_samples=2)
+    for _ in range(8):
+        latency.record(b'AT+CMGL', 0.01)
+    assert latency.deadline(b'AT+CMGL') == 30
+    latency.record(b'AT+CMGL', 1.5)
+    assert latency.deadline(b'AT+CMGL') == 30
+
+def test_timeout_widens_deadline():
+    latency = LatencyTracker(default=5, min_samples=2, window=4)
+    latency.record(b'AT', 0.1)
+    latency.record(b'AT', 0.1)
+    assert latency.deadline(b'AT') == pytest.approx(0.5)
+
+    latency.record(b'AT', latency.deadline(b'AT'))
+    assert latency.deadline(b'AT') == pytest.approx(1.5)
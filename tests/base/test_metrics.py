@@ -0,0 +1,61 @@
+import pytest
+import asyncio
+from async_gsm_modem.base.modem import ATModem
+from async_gsm_modem.base.command import Command
+from async_gsm_modem.base.exceptions import *
+from async_gsm_modem.base.transport import MemoryLink
+from async_gsm_modem.base.metrics import *
+
+async def answer(reader, writer):
+    while True:
+        line = await reader.readuntil(b'\r')
+        if line == b'AT+CSQ\r':
+            writer.write(b'\r\n+CMTI: "ME",1\r\n\r\n+CSQ: 16,99\r\n\r\nOK\r\n')
+        elif line == b'AT+CMGD=1\r':
+            writer.write(b'\r\n+CMS ERROR: 321\r\n')
+
+@pytest.fixture
+async def modem(mocker):
+    mocker.patch.object(ATModem, 'initialize', return_value=None)
+    link = MemoryLink('ttyMetrics')
+    device = asyncio.create_task(answer(*link.device()))
+    modem = ATModem('memory://ttyMetrics', 115200, urc=[(b'+CMTI', 1)], error_codes=[b'+CMS ERROR'], metrics=True)
+    await modem.connect()
+    yield modem
+    await modem.close()
+    link.close()
+    device.cancel()
+
+def test_histogram():
+    histogram = Histogram((0.1, 1))
+    for value in (0.05, 0.1, 0.5, 2):
+        histogram.observe(value)
+    assert histogram.snapshot() == {'count': 4, 'sum': 2.65, 'buckets': {'0.1': 2, '1': 3, '+Inf': 4}}
+
+def test_disabled():
+    assert ATModem('/dev/ttyUSB2', 115200).metrics is None
+
+@pytest.mark.asyncio
+async def test_metrics(modem):
+    await modem.send_command(Command(b'AT+CSQ'))
+    with pytest.raises(CommandFailed):
+        await modem.send_command(Command(b'AT+CMGD=1'))
+    with pytest.raises(CommandFailed):
+        await modem.send_command(Command(b'ATI'), timeout=0.01)
+
+    snapshot = modem.metrics.snapshot()
+    csq = snapshot['commands']['AT+CSQ']
+    assert csq['commands'] == 1
+    assert set(csq['timings']) == {QUEUE_WAIT, WRITE, FIRST_LINE, TOTAL}
+    assert csq['timings'][TOTAL]['count'] == 1
+    assert snapshot['commands']['AT+CMGD']['errors'] == 1
+    assert snapshot['commands']['ATI']['timeouts'] == 1
+    assert snapshot['urcs'] == {'+CMTI': 1}
+    assert snapshot['bytes_out'] == len(b'AT+CSQ\rAT+CMGD=1\rATI\r')
+    assert snapshot['bytes_in'] > 0
+
+    text = prometheus([modem])
+    assert '# TYPE gsm_modem_command_seconds histogram' in text
+    assert 'gsm_modem_command_seconds_count{device="memory://ttyMetrics",family="AT+CSQ",phase="total"} 1' in text
+    assert 'gsm_modem_command_timeouts_total{device="memory://ttyMetrics",family="ATI"} 1' in text
+    assert 'gsm_modem_urcs_total{device="memory://ttyMetrics",code="+CMTI"} 1' in text
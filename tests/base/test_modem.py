@@ -5,36 +5,18 @@ from async_gsm_modem.base.command import Command
 from async_gsm_modem.base.response import Response
 from async_gsm_modem.base.exceptions import *
 import asyncio
-import serial_asyncio
+from scripted_device import ScriptedDevice, frame
 
-class DummyReader:
-    
-    async def readuntil(self, *args, **kwargs):
-        pass
-
-class DummyWriter:
-
-    def write(self, *args, **kwargs):
-        pass
-
-    async def drain(self, *args, **kwargs):
-        pass
-
-    def close(self, *args, **kwargs):
-        pass
-
-    async def wait_closed(self, *args, **kwargs):
-        pass
-
-@pytest.fixture(autouse=True)
-def mock_serial_connection(mocker):
-    mocker.patch.object(serial_asyncio, 'open_serial_connection', return_value=(DummyReader(), DummyWriter()))
+@pytest.fixture
+async def device():
+    device = ScriptedDevice('ttyXRUSB2')
+    yield device
+    await device.close()
 
 @pytest.fixture
-async def mock_modem(mocker):
-    mocker.patch.object(ATModem, 'start_read_loop', return_value=None)
+async def mock_modem(mocker, device):
     mocker.patch.object(ATModem, 'initialize', return_value=None)
-    modem = ATModem('/dev/ttyXRUSB2', 115200)
+    modem = ATModem('memory://ttyXRUSB2', 115200)
     modem.at_logger.setLevel(logging.DEBUG)
     await modem.connect()
     yield modem
@@ -45,65 +27,274 @@ def test_init():
     assert modem
 
 @pytest.mark.asyncio
-async def test_connect(mocker):
-    mocker.patch.object(ATModem, 'start_read_loop', return_value=None)
+async def test_connect(mocker, device):
     mocker.patch.object(ATModem, 'initialize', return_value=None)
-    modem = ATModem('/dev/ttyXRUSB2', 115200)
+    modem = ATModem('memory://ttyXRUSB2', 115200)
     await modem.connect()
     assert modem.reader
     assert modem.writer
     await modem.close()
 
 @pytest.mark.asyncio
-async def test_connect_fail(mocker):
-    mocker.patch.object(ATModem, 'start_read_loop', return_value=None)
-    mocker.patch.object(ATModem, 'read', side_effect=asyncio.TimeoutError)
+async def test_connect_fail(mocker, device):
+    mocker.patch.object(ATModem, 'transact', side_effect=asyncio.TimeoutError)
 
     with pytest.raises(ModemConnectionError):
-        modem = ATModem('/dev/ttyXRUSB2', 115200)
+        modem = ATModem('memory://ttyXRUSB2', 115200)
+        await modem.connect()
+
+@pytest.mark.asyncio
+async def test_connect_refused():
+    with pytest.raises(ModemConnectionError):
+        modem = ATModem('memory://ttyMISSING', 115200)
         await modem.connect()
         
 @pytest.mark.asyncio
-async def test_read(mocker, mock_modem):
-    mocker.patch.object(DummyReader, 'readuntil', return_value=b'OK\r\n')
-    response = await mock_modem.read()
-    assert response == b'OK'
+async def test_read(device):
+    modem = ATModem('memory://ttyXRUSB2', 115200)
+    modem.reader, modem.writer = await modem.transport.open()
+    device.send(b'+CSQ: 16,99\r\n\r\nOK\r\n')
+    response = await modem.read()
+    assert response == [b'+CSQ: 16,99', b'', b'OK']
 
 @pytest.mark.asyncio
-async def test_read_timeout(mocker, mock_modem):
-    async def sleep(*args, **kwargs):
-        await asyncio.sleep(1)
-        return b'OK\r\n'
-    mocker.patch.object(DummyReader, 'readuntil', side_effect=sleep)
-    exception = None
-    with pytest.raises(asyncio.TimeoutError):
-        response = await mock_modem.read(timeout=0)
+async def test_read_closed(device):
+    modem = ATModem('memory://ttyXRUSB2', 115200)
+    modem.reader, modem.writer = await modem.transport.open()
+    device.writer.close()
+    with pytest.raises(asyncio.IncompleteReadError):
+        await modem.read()
 
 @pytest.mark.asyncio
-async def test_send_command(mocker, mock_modem, generic_test_command):
+async def test_send_command(mocker, mock_modem, generic_test_command, device):
     command, expected_response, terminator = generic_test_command
-    mocker.patch.object(DummyReader, 'readuntil', side_effect=expected_response + [terminator])
+    device.responses = [frame(expected_response + [terminator])]
 
     response = await mock_modem.send_command(command, response_terminator=terminator, timeout=1)
     assert response == Response(expected_response)
 
 @pytest.mark.asyncio
-async def test_send_command_with_urc(mocker, mock_modem, generic_test_command):
+async def test_send_command_with_urc(mocker, mock_modem, generic_test_command, device):
     mock_modem.urc = [(b'+CMT', 2)]
 
     command, expected_response, terminator = generic_test_command
     response_with_urc = expected_response[:-1] + [b'+CMT', b'mock'] + expected_response[-1:] + [terminator]
-    mocker.patch.object(DummyReader, 'readuntil', side_effect=response_with_urc)
+    device.responses = [frame(response_with_urc)]
 
     response = await mock_modem.send_command(command, response_terminator=terminator, timeout=1)
     assert response == Response(expected_response)
-    assert mock_modem.urc_buffer
+    assert mock_modem.urc_queue.queued == 1
 
 @pytest.mark.asyncio
-async def test_send_command_with_error(mocker, mock_modem, generic_test_command):
+async def test_send_command_with_error(mocker, mock_modem, generic_test_command, device):
     command, expected_response, terminator = generic_test_command
     expected_response = [b'ERROR']
-    mocker.patch.object(DummyReader, 'readuntil', side_effect=expected_response + [terminator])
+    device.responses = [frame(expected_response + [terminator])]
+
+    with pytest.raises(CommandFailed):
+        response = await mock_modem.send_command(command, response_terminator=terminator, timeout=1)
+
+@pytest.mark.asyncio
+async def test_send_command_timeout(mocker, mock_modem):
+    with pytest.raises(CommandFailed):
+        await mock_modem.send_command(Command(b'AT'), timeout=0.1)
+    assert mock_modem.pending is None
+
+@pytest.mark.asyncio
+async def test_unsolicited_line_between_commands(mocker, mock_modem, device):
+    mock_modem.urc = [(b'+CMTI', 1)]
+    device.send(frame([b'+CMTI: "SM",3']))
+    await asyncio.sleep(0)
+
+    device.responses = [frame([b'OK'])]
+    response = await mock_modem.send_command(Command(b'AT'), timeout=1)
+    assert response == Response([])
+    assert mock_modem.urc_queue.queued == 1
+
+@pytest.mark.asyncio
+async def test_urc_handler_wakes_on_urc(mocker, mock_modem, device):
+    mock_modem.urc = [(b'+CMTI', 1)]
+    handled = asyncio.Event()
+    async def urc_handler(urc):
+        handled.set()
+    mocker.patch.object(mock_modem, 'urc_handler', side_effect=urc_handler)
+
+    device.send(frame([b'+CMTI: "SM",3']))
+    await asyncio.wait_for(handled.wait(), 0.05)
+
+@pytest.mark.asyncio
+async def test_send_commands(mocker, mock_modem, device):
+    mock_modem.urc = [(b'+CREG', 1)]
+    device.responses = [frame([b'+CSQ: 16,99', b'', b'+CREG: 0,1', b'', b'OK'])]
+
+    responses = await mock_modem.send_commands([Command(b'AT+CSQ'), Command(b'AT+CREG?')], timeout=1)
+    assert responses == [Response([b'+CSQ: 16,99']), Response([b'+CREG: 0,1'])]
+    assert mock_modem.urc_queue.queued == 0
+
+@pytest.mark.asyncio
+async def test_send_commands_with_error(mocker, mock_modem, device):
+    commands = [Command(b'AT+CSQ'), Command(b'AT+QSPN'), Command(b'AT+QNWINFO')]
+    device.responses = [frame([b'+CSQ: 16,99', b'ERROR'])] * 2
+
+    with pytest.raises(CommandFailed) as e:
+        await mock_modem.send_commands(commands, timeout=1)
+    assert e.value.__cause__.command is commands[1]
+
+    responses = await mock_modem.send_commands(commands, timeout=1, return_exceptions=True)
+    assert responses[0] == Response([b'+CSQ: 16,99'])
+    assert isinstance(responses[1], CommandError)
+    assert isinstance(responses[2], CommandFailed)
+
+@pytest.mark.asyncio
+async def test_send_commands_with_ambiguous_error(mocker, mock_modem, device):
+    commands = [Command(b'AT+CSQ'), Command(b'AT+CMGF=0'), Command(b'AT+CREG?')]
+    device.responses = [frame([b'+CSQ: 16,99', b'ERROR'])] * 2
+
+    with pytest.raises(CommandFailed) as e:
+        await mock_modem.send_commands(commands, timeout=1)
+    assert e.value.__cause__.command is None
+
+    responses = await mock_modem.send_commands(commands, timeout=1, return_exceptions=True)
+    assert responses[0] == Response([b'+CSQ: 16,99'])
+    assert isinstance(responses[1], CommandError)
+    assert responses[2] is responses[1]
+
+@pytest.mark.asyncio
+async def test_resync_after_timeout(mocker, mock_modem, device):
+    device.responses = [
+        b'', # AT+CSQ goes unanswered until after the timeout
+        frame([b'+CSQ: 16,99', b'OK', b'013', b'OK']), # late response then the sentinel's reply
+        frame([b'+QSPN: "T-Mobile","T-Mobile","",0,"310000"', b'OK'])
+    ]
+    with pytest.raises(CommandFailed):
+        await mock_modem.send_command(Command(b'AT+CSQ'), timeout=0.1)
+    assert mock_modem.orphaned == 1
 
+    response = await mock_modem.send_command(Command(b'AT+QSPN'), timeout=1)
+    assert response == Response([b'+QSPN: "T-Mobile","T-Mobile","",0,"310000"'])
+    assert mock_modem.orphaned == 0
+    assert mock_modem.resyncs == 1
+    assert mock_modem.discarded_lines == 2
+
+@pytest.mark.asyncio
+async def test_resync_unanswered_orphan(mocker, mock_modem, device):
+    device.responses = [
+        b'', # AT+CSQ is never answered
+        frame([b'013', b'OK']),
+        frame([b'+QSPN: "T-Mobile","T-Mobile","",0,"310000"', b'OK'])
+    ]
+    with pytest.raises(CommandFailed):
+        await mock_modem.send_command(Command(b'AT+CSQ'), timeout=0.1)
+
+    response = await asyncio.wait_for(mock_modem.send_command(Command(b'AT+QSPN'), timeout=1), 0.5)
+    assert response == Response([b'+QSPN: "T-Mobile","T-Mobile","",0,"310000"'])
+    assert mock_modem.orphaned == 0
+    assert mock_modem.sentinels == 0
+
+@pytest.mark.asyncio
+async def test_resync_late_sentinel(mocker, mock_modem, device):
+    mock_modem.latency.deadlines[b'AT'] = 0.05
+    with pytest.raises(CommandFailed):
+        await mock_modem.send_command(Command(b'AT+CSQ'), timeout=0.1)
+
+    # the sentinel is answered after its deadline, the next command is written regardless
+    query = asyncio.create_task(mock_modem.send_command(Command(b'AT+QSPN'), timeout=1))
+    await asyncio.sleep(0.1)
+    assert mock_modem.sentinels == 1
+    device.send(frame([b'+CSQ: 16,99', b'OK', b'013', b'OK', b'+QSPN: "T-Mobile","T-Mobile","",0,"310000"', b'OK']))
+    assert await query == Response([b'+QSPN: "T-Mobile","T-Mobile","",0,"310000"'])
+    assert mock_modem.sentinels == 0
+    assert mock_modem.discarded_lines == 2
+
+@pytest.mark.asyncio
+async def test_orphan_custom_terminator(mocker, mock_modem, device):
+    with pytest.raises(CommandFailed):
+        await mock_modem.send_command(Command(b'ATD12345;'), response_terminator=b'CONNECT', timeout=0.1)
+    device.send(frame([b'CONNECT']))
+    await asyncio.sleep(0)
+    assert mock_modem.orphaned == 0
+
+    device.responses = [frame([b'OK'])]
+    await mock_modem.send_command(Command(b'AT'), timeout=1)
+    assert mock_modem.resyncs == 0
+
+@pytest.mark.asyncio
+async def test_stray_lines_before_next_command(mocker, mock_modem, device):
+    with pytest.raises(CommandFailed):
+        await mock_modem.send_command(Command(b'AT+CSQ'), timeout=0.1)
+    device.send(frame([b'+CSQ: 16,99', b'OK']))
+    await asyncio.sleep(0)
+    assert mock_modem.orphaned == 0
+
+    device.responses = [frame([b'OK'])]
+    await mock_modem.send_command(Command(b'AT'), timeout=1)
+    assert mock_modem.resyncs == 0
+
+@pytest.mark.asyncio
+async def test_adaptive_deadline(mocker, mock_modem, device):
+    mock_modem.latency.min_samples = 2
+    for _ in range(2):
+        device.responses = [frame([b'OK'])]
+        await mock_modem.send_command(Command(b'AT'))
+    assert mock_modem.latency.deadline(b'AT') == mock_modem.latency.minimum
+
+    wait_for = mocker.spy(asyncio, 'wait_for')
     with pytest.raises(CommandFailed):
-        response = await mock_modem.send_command(command, response_terminator=terminator, timeout=1)
\ No newline at end of file
+        await mock_modem.send_command(Command(b'AT'))
+    assert wait_for.call_args.args[1] == mock_modem.latency.minimum
+
+@pytest.mark.asyncio
+async def test_reconnect(mocker, device):
+    mocker.patch.object(ATModem, 'initialize', return_value=None)
+    modem = ATModem('memory://ttyXRUSB2', 115200, reconnect=True, reconnect_delay=0.01)
+    await modem.connect()
+
+    # the port disappears with a command in flight
+    query = asyncio.create_task(modem.send_command(Command(b'AT+CSQ'), timeout=1))
+    await asyncio.sleep(0.01)
+    device.link.close()
+    await asyncio.sleep(0.05)
+    assert not modem.connected.is_set()
+    with pytest.raises(ModemConnectionError):
+        await modem.send_command(Command(b'AT+CMGS=23'))
+
+    device.responses = [frame([b'+CSQ: 16,99', b'OK'])]
+    device.reopen()
+    assert await query == Response([b'+CSQ: 16,99'])
+    assert modem.reconnects == 1
+    assert modem.downtime > 0
+    await modem.close()
+
+@pytest.mark.parametrize('command, idempotent', [
+    (b'AT+CSQ', True),
+    (b'AT+CMGL=4', True),
+    (b'AT+CMGR=1', True),
+    (b'AT+CMGD=1', False),
+    (b'AT+CMGD=0,4', False),
+    (b'AT+CMGL=0', False),
+    (b'AT+CMGL="REC UNREAD"', False),
+])
+def test_idempotent(command, idempotent):
+    assert ATModem('memory://ttyXRUSB2', 115200).idempotent(Command(command)) == idempotent
+
+@pytest.mark.asyncio
+async def test_delete_not_replayed(mocker, device):
+    mocker.patch.object(ATModem, 'initialize', return_value=None)
+    modem = ATModem('memory://ttyXRUSB2', 115200, reconnect=True, reconnect_delay=0.01)
+    await modem.connect()
+
+    # the slot may be refilled by the time the link is back, deleting it again would lose a new message
+    delete = asyncio.create_task(modem.send_command(Command(b'AT+CMGD=1'), timeout=1))
+    await asyncio.sleep(0.01)
+    device.link.close()
+    with pytest.raises(ModemConnectionError):
+        await delete
+    device.reopen()
+    await modem.close()
+
+@pytest.mark.asyncio
+async def test_no_reconnect(mock_modem, device):
+    device.link.close()
+    await asyncio.sleep(0.01)
+    with pytest.raises(ModemConnectionError):
+        await mock_modem.send_command(Command(b'AT'))
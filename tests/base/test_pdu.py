@@ -0,0 +1,147 @@
+import pytest
+import random
+from datetime import datetime, timedelta, timezone
+from async_gsm_modem.base.pdu import *
+from async_gsm_modem.base.exceptions import EncodingError
+
+@pytest.mark.parametrize('text, septets', [
+    ('', 0),
+    ('Test', 4),
+    ('@£$¥', 4),
+    ('Price: 10€ [incl. tax]', 25),
+    ('^{}\\[~]|', 16),
+    ('Привет', None),
+    ('tab\there', None),
+])
+def test_gsm7_length(text, septets):
+    assert gsm7Length(text) == septets
+    if septets is not None:
+        assert len(encodeGsm7(text)) == septets
+
+def test_encode_gsm7():
+    assert encodeGsm7('@Aa€') == bytearray(b'\x00\x41\x61\x1b\x65')
+    assert encodeGsm7('a\tb€', discardInvalid=True) == bytearray(b'\x61\x62\x1b\x65')
+    with pytest.raises(ValueError, match='"П"'):
+        encodeGsm7('aП')
+
+def test_decode_gsm7():
+    assert decodeGsm7(bytearray(b'\x00\x41\x61\x1b\x65')) == '@Aa€'
+    assert decodeGsm7('\x1b\x3c\x1b\x3e') == '[]'
+    # unknown extended characters and a trailing ESC are dropped
+    assert decodeGsm7(b'A\x1b\x41B\x1b\x1bC\x1b') == 'ABC'
+
+def test_gsm7_round_trip():
+    text = GSM7_BASIC.replace('\x1b', '') + ''.join(GSM7_EXTENDED_CHARACTERS)
+    assert decodeGsm7(encodeGsm7(text)) == text
+
+def test_divide_text_gsm7():
+    assert divideTextGsm7('a' * 153) == ['a' * 153]
+    assert divideTextGsm7('a' * 154) == ['a' * 153, 'a']
+    # an escaped character is never split over two parts
+    parts = divideTextGsm7('a' * 152 + '€b')
+    assert parts == ['a' * 152, '€b']
+    with pytest.raises(ValueError):
+        divideTextGsm7('П')
+
+@pytest.mark.parametrize('text, alphabet, parts', [
+    ('Test', 0x00, 1),
+    ('€' * 81, 0x00, 2),
+    ('Привет', 0x08, 1),
+    ('П' * 71, 0x08, 2),
+], ids=['gsm7', 'gsm7_multipart', 'ucs2', 'ucs2_multipart'])
+def test_encode_sms_submit_alphabet(text, alphabet, parts):
+    pdus = encodeSmsSubmitPdu('+31612345678', text)
+    assert len(pdus) == parts
+    pdu, _ = pdus[0]
+    # SMSC, first octet, reference, 8 address octets, PID then the DCS
+    assert pdu[12] == alphabet
+
+@pytest.fixture
+def rng():
+    return random.Random(7)
+
+@pytest.mark.parametrize('padBits', range(8))
+def test_pack_septets_matches_reference(rng, padBits):
+    for _ in range(200):
+        octets = bytearray(rng.randrange(0x80) for _ in range(rng.randrange(170)))
+        assert packSeptets(octets, padBits) == packSeptetsReference(octets, padBits)
+
+@pytest.mark.parametrize('prevOctet, shift', [(None, 7), (0x00, 7), (0xA5, 7), (0xA5, 1), (0x5A, 6)])
+def test_unpack_septets_matches_reference(rng, prevOctet, shift):
+    for _ in range(200):
+        septets = bytearray(rng.randrange(0x100) for _ in range(rng.randrange(150)))
+        numberOfSeptets = rng.choice([None, 0, rng.randrange(170)])
+        assert unpackSeptets(septets, numberOfSeptets, prevOctet, shift) == unpackSeptetsReference(septets, numberOfSeptets, prevOctet, shift)
+        # only the octets that are unpacked are taken from an iterator
+        bulk, reference = iter(septets), iter(septets)
+        assert unpackSeptets(bulk, numberOfSeptets, prevOctet, shift) == unpackSeptetsReference(reference, numberOfSeptets, prevOctet, shift)
+        assert list(bulk) == list(reference)
+
+def test_septets_round_trip():
+    octets = encodeGsm7('The quick brown fox jumps over the lazy dog €' * 4)[:160]
+    assert unpackSeptets(packSeptets(octets), 160) == octets
+    assert len(packSeptets(octets)) == 140
+
+DELIVER = '07912160130350F7040B912108378482F500001240625104958A04D4F29C0E'
+DELIVER_UCS2 = '00040B912143658709F000081240625104958D28041F04400438043204350442002C0020043A0430043A002004340435043B0430003F00204F60597D'
+STATUS_REPORT = '0006360B911316325476F8123021800121014080123080808000'
+
+def test_decode_deliver():
+    pdu = decodeSmsPdu(DELIVER)
+    assert pdu.type == 'SMS-DELIVER'
+    assert pdu.smsc == '+12063130057'
+    assert pdu.number == '+12807348285'
+    assert pdu.tpdu_length == 23
+    assert pdu.time == datetime(2021, 4, 26, 15, 40, 59, tzinfo=timezone(-timedelta(hours=7)))
+    assert pdu.text == 'Test'
+    assert decodeSmsPdu(DELIVER_UCS2).text == 'Привет, как дела? 你好'
+
+def test_decode_as_mapping():
+    pdu = decodeSmsPdu(bytearray.fromhex(DELIVER))
+    assert pdu['text'] == 'Test'
+    assert 'udh' not in pdu and pdu.get('udh') is None
+    assert dict(pdu)['number'] == '+12807348285'
+    with pytest.raises(KeyError):
+        pdu['validity']
+
+def test_decode_submit():
+    text = 'Lorem ipsum dolor sit amet € ' * 8
+    validity = timedelta(hours=5)
+    parts = [decodeSmsPdu(pdu) for pdu, _ in encodeSmsSubmitPdu('+31612345678', text, reference=9, validity=validity)]
+    assert [part.type for part in parts] == ['SMS-SUBMIT'] * 2
+    assert parts[0].validity == validity
+    assert [(part.udh[0].reference, part.udh[0].number, part.udh[0].parts) for part in parts] == [(9, 1, 2), (9, 2, 2)]
+    assert ''.join(part.text for part in parts) == text
+
+def test_decode_status_report():
+    pdu = decodeSmsPdu(STATUS_REPORT.encode())
+    assert (pdu.type, pdu.reference, pdu.number, pdu.status) == ('SMS-STATUS-REPORT', 0x36, '+31612345678', 0)
+    assert pdu.discharge == datetime(2004, 8, 21, 3, 8, 8, tzinfo=timezone(timedelta(hours=2)))
+    # timezones are shared between PDUs
+    assert pdu.time.tzinfo is decodeSmsPdu(STATUS_REPORT).time.tzinfo
+
+@pytest.mark.parametrize('pdu', [DELIVER[:30], DELIVER[:-20], STATUS_REPORT[:-2], '0004'])
+def test_decode_truncated(pdu):
+    with pytest.raises(EncodingError):
+        decodeSmsPdu(pdu)
+
+def test_decode_unknown_type():
+    with pytest.raises(EncodingError, match='Unknown SMS message type'):
+        decodeSmsPdu('0003')
+
+@pytest.mark.parametrize('text', ['Test', 'Lorem ipsum € ' * 20, 'Привет ' * 15, '\x1b' * 200])
+def test_encode_sms_submit_hex(text):
+    pdus = encodeSmsSubmitPdu('+31612345678', text, reference=3, validity=timedelta(days=2))
+    hexPdus = encodeSmsSubmitPduHex('+31612345678', text, reference=3, validity=timedelta(days=2))
+    assert hexPdus == [(pdu.hex().upper().encode(), tpduLength) for pdu, tpduLength in pdus]
+
+def test_encode_sms_submit_parts():
+    # parts are independent copies even though they are built in one buffer
+    first, second = encodeSmsSubmitPdu('+31612345678', 'a' * 200)
+    assert first[0] != second[0]
+    assert ''.join(decodeSmsPdu(pdu).text for pdu, _ in (first, second)) == 'a' * 200
+
+def test_encode_sms_submit_surrogates():
+    text = '\U0001F600' * 40
+    parts = [decodeSmsPdu(pdu) for pdu, _ in encodeSmsSubmitPdu('+31612345678', text)]
+    assert [part.text for part in parts] == ['\U0001F600' * 33, '\U0001F600' * 7]
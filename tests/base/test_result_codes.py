@@ -0,0 +1,18 @@
+import pytest
+from async_gsm_modem.base.result_codes import ResultCode, compile_result_codes
+
+URC = ((b'+CMTI', 1), (b'+CMT', 2), (b'RDY', 1))
+ERROR_CODES = (b'+CMS ERROR', b'ERROR')
+
+def test_classify():
+    index = compile_result_codes(URC, ERROR_CODES)
+    assert index.classify(b'+CMTI: "SM",3') == ResultCode(b'+CMTI', 1)
+    assert index.classify(b'+CMT: "",24') == ResultCode(b'+CMT', 2)
+    assert index.classify(b'RDY') == ResultCode(b'RDY', 1)
+    assert index.classify(b'+CMS ERROR: 300') == ResultCode(b'+CMS ERROR', error=True)
+    assert index.classify(b'ERROR') == ResultCode(b'ERROR', error=True)
+    assert index.classify(b'+CSQ: 16,99') is None
+    assert index.classify(b'OK') is None
+
+def test_shared_index():
+    assert compile_result_codes(URC, ERROR_CODES) is compile_result_codes(tuple(URC), tuple(ERROR_CODES))
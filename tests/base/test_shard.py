@@ -0,0 +1,59 @@
+import pytest
+import asyncio
+from async_gsm_modem.base.modem import ATModem
+from async_gsm_modem.base.command import Command
+from async_gsm_modem.base.response import Response
+from async_gsm_modem.base.shard import *
+
+async def answer_ok(reader, writer):
+    while await reader.readuntil(b'\r'):
+        writer.write(b'\r\nOK\r\n')
+
+@pytest.mark.asyncio
+async def test_shard_group(mocker):
+    mocker.patch.object(ATModem, 'initialize', return_value=None)
+    server = await asyncio.start_server(answer_ok, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+
+    group = ShardGroup(shards=2)
+    group.start()
+    modems = [group.attach(ATModem(f'tcp://127.0.0.1:{port}', 115200)) for _ in range(4)]
+    assert [len(shard.modems) for shard in group.shards] == [2, 2]
+
+    await asyncio.gather(*(modem.connect() for modem in modems))
+    responses = await asyncio.gather(*(modem.send_command(Command(b'AT'), timeout=1) for modem in modems))
+    assert responses == [Response([])] * 4
+    assert modems[0].modem.read_loop_task.get_loop() is modems[0].shard.loop
+
+    await asyncio.gather(*(modem.close() for modem in modems))
+    stats = await group.stats()
+    assert [s.calls for s in stats] == [6, 6]
+    assert all(s.errors == 0 and s.max_latency >= s.mean_latency > 0 for s in stats)
+
+    await group.stop()
+    assert not any(shard.thread.is_alive() for shard in group.shards)
+    server.close()
+    await server.wait_closed()
+
+@pytest.mark.asyncio
+async def test_sharded_modem(mocker):
+    mocker.patch.object(ATModem, 'initialize', return_value=None)
+    server = await asyncio.start_server(answer_ok, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+
+    shard = Shard()
+    shard.start()
+    modem = shard.attach(ATModem(f'tcp://127.0.0.1:{port}', 115200))
+    async def urc_handler(urc):
+        pass
+    modem.urc_handler = urc_handler
+    assert modem.modem.urc_handler is urc_handler
+    assert 'urc_handler' not in vars(modem)
+
+    # stopping the shard closes the modems still open on it
+    await modem.connect()
+    await shard.stop()
+    assert modem.modem.closing
+    assert modem.modem.read_loop_task.done()
+    server.close()
+    await server.wait_closed()
@@ -0,0 +1,127 @@
+import pytest
+import asyncio
+from async_gsm_modem.base.modem import ATModem
+from async_gsm_modem.base.command import Command
+from async_gsm_modem.base.response import Response
+from async_gsm_modem.base.exceptions import *
+from async_gsm_modem.base.transport import MemoryLink
+from async_gsm_modem.base.trace import *
+from scripted_device import ScriptedDevice
+
+URC = [(b'+CMTI', 1), (b'+CREG', 1)]
+ERROR_CODES = [b'+CMS ERROR']
+
+async def answer(reader, writer):
+    replies = {
+        b'AT+CSQ;+CREG?\r': b'\r\n+CSQ: 16,99\r\n\r\n+CREG: 0,1\r\n\r\nOK\r\n',
+        b'AT+CMGR=0\r': b'\r\n+CMTI: "ME",1\r\n\r\n+CMGR: 0,,23\r\n\r\n0791\r\n\r\nOK\r\n',
+        b'AT+CMGD=9\r': b'\r\n+CMS ERROR: 321\r\n',
+    }
+    while True:
+        writer.write(replies[await reader.readuntil(b'\r')])
+
+@pytest.fixture
+async def trace_path(mocker, tmp_path):
+    mocker.patch.object(ATModem, 'initialize', return_value=None)
+    link = MemoryLink('ttyTrace')
+    device = asyncio.create_task(answer(*link.device()))
+    path = str(tmp_path / 'session.trace')
+    modem = ATModem('memory://ttyTrace', 115200, URC, ERROR_CODES, trace=path)
+    await modem.connect()
+    await modem.send_commands([Command(b'AT+CSQ'), Command(b'AT+CREG?')])
+    await modem.send_command(Command(b'AT+CMGR=0'))
+    with pytest.raises(CommandFailed):
+        await modem.send_command(Command(b'AT+CMGD=9'))
+    await modem.close()
+    link.close()
+    device.cancel()
+    return path
+
+def test_read_trace(trace_path):
+    records = list(read_trace(trace_path))
+    assert [record.direction for record in records] == [SESSION] + [SENT, RECEIVED] * 3
+    assert records[1].data == b'AT+CSQ;+CREG?\r'
+    assert all(a.timestamp <= b.timestamp for a, b in zip(records, records[1:]))
+
+def test_read_truncated_trace(trace_path):
+    with open(trace_path, 'ab') as f:
+        f.write(RECORD_HEADER.pack(RECEIVED, 0, 100) + b'partial')
+    assert len(list(read_trace(trace_path))) == 7
+
+@pytest.mark.asyncio
+async def test_trace_sessions(mocker, trace_path):
+    modem = ATModem('memory://ttyTrace', 115200, trace=trace_path)
+    link = MemoryLink('ttyTrace')
+    await modem.connect()
+    await modem.close()
+    link.close()
+    assert modem.trace is None
+
+    sessions = [record for record in read_trace(trace_path) if record.direction == SESSION]
+    assert len(sessions) == 2
+    assert sessions[0].timestamp == sessions[1].timestamp == 0
+    assert sessions[0].started <= sessions[1].started
+
+    result = await TraceReplayer(ATModem('replay', 115200, URC, ERROR_CODES), trace_path).replay()
+    assert len(result.responses) == 3
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('speed', [None, 1])
+async def test_replay(trace_path, speed):
+    result = await TraceReplayer(ATModem('replay', 115200, URC, ERROR_CODES), trace_path).replay(speed)
+    assert result.responses[0] == Response([b'+CSQ: 16,99', b'+CREG: 0,1'])
+    assert result.responses[1] == Response([b'+CMGR: 0,,23', b'0791'])
+    assert isinstance(result.responses[2], CommandError)
+    assert [urc.chunks for urc in result.urcs] == [[b'+CMTI: "ME",1']]
+    assert result.unanswered == 0
+    assert result.lines == 16
+
+@pytest.mark.asyncio
+async def test_replay_abandoned(mocker, tmp_path):
+    mocker.patch.object(ATModem, 'initialize', return_value=None)
+    link = MemoryLink('ttyAbandoned')
+    reader, writer = link.device()
+    path = str(tmp_path / 'abandoned.trace')
+    modem = ATModem('memory://ttyAbandoned', 115200, URC, ERROR_CODES, trace=path)
+    await modem.connect()
+    with pytest.raises(CommandFailed):
+        await modem.send_command(Command(b'AT+CSQ'), timeout=0.05)
+    # the late reply is discarded, not taken as the response
+    writer.write(b'\r\n+CSQ: 16,99\r\n\r\nOK\r\n')
+    await asyncio.sleep(0.01)
+    assert modem.discarded_lines == 2
+    await modem.close()
+    link.close()
+
+    replayed = ATModem('replay', 115200, URC, ERROR_CODES)
+    result = await TraceReplayer(replayed, path).replay()
+    assert result.responses == []
+    assert result.unanswered == 1
+    assert replayed.discarded_lines == 2
+    assert replayed.orphaned == 0
+
+@pytest.mark.asyncio
+async def test_reconnect_starts_session(mocker, tmp_path):
+    mocker.patch.object(ATModem, 'initialize', return_value=None)
+    device = ScriptedDevice('ttyReconnect')
+    path = str(tmp_path / 'reconnect.trace')
+    modem = ATModem('memory://ttyReconnect', 115200, reconnect=True, reconnect_delay=0.01, trace=path)
+    await modem.connect()
+
+    # the link drops halfway through a line
+    query = asyncio.create_task(modem.send_command(Command(b'AT+CSQ'), timeout=1))
+    await asyncio.sleep(0.01)
+    device.send(b'\r\n+CSQ: 1')
+    await asyncio.sleep(0.01)
+    device.link.close()
+    await asyncio.sleep(0.05)
+    device.responses = [b'\r\n+CSQ: 16,99\r\n\r\nOK\r\n']
+    device.reopen()
+    assert await query == Response([b'+CSQ: 16,99'])
+    await modem.close()
+    await device.close()
+
+    assert [record.direction for record in read_trace(path)].count(SESSION) == 2
+    result = await TraceReplayer(ATModem('replay', 115200), path).replay()
+    assert result.responses == [Response([b'+CSQ: 16,99'])]
+    assert result.unanswered == 1
@@ -0,0 +1,69 @@
+import pytest
+import asyncio
+import os
+from async_gsm_modem.base.modem import ATModem
+from async_gsm_modem.base.command import Command
+from async_gsm_modem.base.response import Response
+from async_gsm_modem.base.transport import *
+
+@pytest.mark.parametrize('url, transport', [
+    ('/dev/ttyUSB2', SerialTransport),
+    ('serial:///dev/ttyUSB2', SerialTransport),
+    ('rfc2217://192.168.1.10:4001', SerialTransport),
+    ('tcp://192.168.1.10:4001', TcpTransport),
+    ('pty:///dev/pts/3', PtyTransport),
+    ('memory://modem0', MemoryTransport),
+])
+def test_get_transport(url, transport):
+    assert type(get_transport(url, 115200)) is transport
+
+async def answer_ok(reader, writer):
+    while await reader.readuntil(b'\r'):
+        writer.write(b'\r\nOK\r\n')
+
+@pytest.mark.asyncio
+async def test_tcp_transport(mocker):
+    mocker.patch.object(ATModem, 'initialize', return_value=None)
+    server = await asyncio.start_server(answer_ok, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+
+    modem = ATModem(f'tcp://127.0.0.1:{port}', 115200)
+    await modem.connect()
+    assert await modem.send_command(Command(b'AT'), timeout=1) == Response([])
+    await modem.close()
+    server.close()
+    await server.wait_closed()
+
+@pytest.mark.asyncio
+async def test_pty_transport(mocker):
+    mocker.patch.object(ATModem, 'initialize', return_value=None)
+    loop = asyncio.get_running_loop()
+    master, slave = os.openpty()
+
+    def answer():
+        if b'\r' in os.read(master, 1024):
+            os.write(master, b'\r\nOK\r\n')
+    loop.add_reader(master, answer)
+
+    modem = ATModem(f'pty://{os.ttyname(slave)}', 115200)
+    await modem.connect()
+    assert await modem.send_command(Command(b'AT'), timeout=1) == Response([])
+    await modem.close()
+    loop.remove_reader(master)
+    os.close(slave)
+    os.close(master)
+
+@pytest.mark.asyncio
+async def test_memory_link():
+    link = MemoryLink('modem0')
+    with pytest.raises(ValueError):
+        MemoryLink('modem0')
+
+    reader, writer = await MemoryTransport('memory://modem0').open()
+    writer.write(b'AT\r')
+    assert await link.device_reader.readuntil(b'\r') == b'AT\r'
+
+    link.close()
+    assert await reader.read() == b''
+    with pytest.raises(ConnectionRefusedError):
+        await MemoryTransport('memory://modem0').open()
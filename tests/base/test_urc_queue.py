@@ -0,0 +1,37 @@
+import pytest
+import asyncio
+from async_gsm_modem.base.response import UnsolicitedResultCode
+from async_gsm_modem.base.urc_queue import URCQueue
+
+def urc(n):
+    return UnsolicitedResultCode(chunks=[b'+CMTI: "SM",%d' % n], code=b'+CMTI')
+
+@pytest.mark.asyncio
+async def test_drop_oldest():
+    queue = URCQueue(maxsize=2)
+    for n in range(3):
+        await queue.put(urc(n))
+
+    assert queue.queued == 3
+    assert queue.dropped == 1
+    assert queue.get_nowait() == urc(1)
+    assert queue.get_nowait() == urc(2)
+
+@pytest.mark.asyncio
+async def test_block():
+    queue = URCQueue(maxsize=1, overflow=URCQueue.BLOCK)
+    for n in range(3):
+        await queue.put(urc(n))
+    assert list(queue.backlog) == [urc(1), urc(2)]
+    assert not queue.drained.is_set()
+
+    assert queue.get_nowait() == urc(0)
+    assert await asyncio.wait_for(queue.get(), 1) == urc(1)
+    assert queue.drained.is_set()
+    assert queue.get_nowait() == urc(2)
+    assert queue.queued == 3
+    assert queue.dropped == 0
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        URCQueue(overflow='drop_newest')
@@ -0,0 +1,146 @@
+import pytest
+import asyncio
+from async_gsm_modem.quectel_ec25.modem import Modem
+from async_gsm_modem.quectel_ec25.info import ProductInfo
+from async_gsm_modem.quectel_ec25.exceptions import *
+from async_gsm_modem.quectel_ec25.emulator import Emulator, RESPONSES
+from async_gsm_modem.base.command import Command
+from async_gsm_modem.base.exceptions import *
+from async_gsm_modem.base.metrics import QUEUE_WAIT
+
+PDU = b'07912160130350F7040B912108378482F500001240625104958A04D4F29C0E'
+
+@pytest.fixture
+async def emulator():
+    emulator = Emulator()
+    yield emulator
+    await emulator.close()
+
+@pytest.fixture
+async def modem(emulator):
+    modem = Modem(emulator.open_memory('ttyEC25'), 115200)
+    await modem.connect()
+    yield modem
+    await modem.close()
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('command, expected_response', list(RESPONSES.items()) + [(b'AT+GSN', [b'866758042177355'])])
+async def test_commands(modem, emulator, command, expected_response):
+    assert await modem.send_command(Command(command)) == expected_response
+    assert not emulator.echo
+
+@pytest.mark.asyncio
+async def test_network_status(modem):
+    status = await modem.network_status()
+    assert status.signal_quality == '16,99'
+    assert status.network_registration == '0,1'
+
+@pytest.mark.asyncio
+async def test_message_store(modem, emulator):
+    received = asyncio.Queue()
+    modem.urc_handler = received.put
+    index = await emulator.deliver(PDU)
+    urc = await asyncio.wait_for(received.get(), 1)
+    assert urc.chunks == [f'+CMTI: "ME",{index}'.encode()]
+
+    message = await modem.read_message(index)
+    assert message.text == 'Test'
+    assert emulator.messages[index].status == 1
+    assert len(await modem.list_messages('RECEIVED_READ')) == 1
+
+    await modem.delete_message(index)
+    assert await modem.list_messages() == []
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('command', [b'AT+CMGL=12', b'AT+CMGL=', b'AT+CMGL=x', b'AT+CMGR=', b'AT+CMGR=x',
+                                     b'AT+CMGD=x'])
+async def test_invalid_arguments(modem, emulator, command):
+    with pytest.raises(CommandFailed) as e:
+        await modem.send_command(Command(command))
+    assert e.value.__cause__.error == b'+CMS ERROR: 302'
+    # the emulator keeps answering
+    assert await modem.signal_quality() == '16,99'
+
+@pytest.mark.asyncio
+async def test_slow_listing_after_fast_ones(modem, emulator):
+    for _ in range(modem.latency.min_samples):
+        assert await modem.list_messages() == []
+    # a listing that takes longer than the fast ones did must still get its configured deadline
+    emulator.latency = {b'AT+CMGL': 0.6}
+    assert await modem.list_messages() == []
+
+@pytest.mark.asyncio
+async def test_blocked_urc_handler_sends_commands(emulator):
+    modem = Modem(emulator.open_memory('ttyBlock'), 115200, urc_queue_size=1, urc_overflow='block')
+    await modem.connect()
+    read = []
+    async def urc_handler(urc):
+        index = int(urc.chunks[0].split(b',')[1])
+        read.append(await modem.read_message(index))
+    modem.urc_handler = urc_handler
+
+    for _ in range(4):
+        await emulator.deliver(PDU)
+    for _ in range(100):
+        if len(read) == 4:
+            break
+        await asyncio.sleep(0.01)
+    assert [message.text for message in read] == ['Test'] * 4
+    await modem.close()
+
+@pytest.mark.asyncio
+async def test_send_message(modem, emulator):
+    assert await modem.send_message('+12345678900', 'TEST MESSAGE ' * 14) == ['1', '2']
+    assert len(emulator.sent) == 2
+
+@pytest.mark.asyncio
+async def test_send_message_queue_wait(emulator):
+    modem = Modem(emulator.open_memory('ttyMetrics'), 115200, metrics=True)
+    await modem.connect()
+    await modem.send_message('+12345678900', 'Test')
+    assert modem.metrics.snapshot()['commands']['AT+CMGS']['timings'][QUEUE_WAIT]['count'] == 1
+    await modem.close()
+
+@pytest.mark.asyncio
+async def test_fault_injection(modem, emulator):
+    emulator.inject(b'AT+CSQ', [b'+CME ERROR: 100'])
+    with pytest.raises(CommandFailed):
+        await modem.signal_quality()
+
+    # the late reply is discarded before the next command
+    emulator.inject(b'AT+CSQ', delay=0.1)
+    with pytest.raises(CommandFailed):
+        await modem.send_command(Command(b'AT+CSQ'), timeout=0.05)
+    assert await modem.signal_quality() == '16,99'
+    assert modem.resyncs == 1
+
+@pytest.mark.asyncio
+async def test_late_prompt(modem, emulator):
+    emulator.inject(b'AT+CMGS', delay=0.1)
+    with pytest.raises(SendMessageError):
+        await modem.send_message('+12345678900', 'Test', timeout=0.05)
+    await asyncio.sleep(0.1)
+    assert modem.orphaned == 0
+
+    # the prompt is aborted, the next command must not be taken as message input
+    assert await modem.signal_quality() == '16,99'
+    assert modem.resyncs == 1
+    assert emulator.sent == []
+
+@pytest.mark.asyncio
+async def test_schedule(modem, emulator):
+    received = asyncio.Queue()
+    modem.urc_handler = received.put
+    emulator.schedule(b'+CREG: 5', 0.01, count=2)
+    for _ in range(2):
+        urc = await asyncio.wait_for(received.get(), 1)
+        assert urc.chunks == [b'+CREG: 5']
+
+@pytest.mark.asyncio
+async def test_pty(emulator):
+    emulator.baud_rate = 115200
+    emulator.latency = {b'ATI': 0.01}
+    modem = Modem(await emulator.open_pty(), 115200)
+    await modem.connect()
+    assert await modem.product_info() == ProductInfo(manufacturer='Quectel', model='EC25', revision='EC25AFFAR07A08M4G')
+    await modem.close()
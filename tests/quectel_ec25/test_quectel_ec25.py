@@ -1,41 +1,28 @@
 import pytest
 import logging
 from async_gsm_modem.quectel_ec25.modem import Modem
+from async_gsm_modem.quectel_ec25.pool import ModemPool
+from async_gsm_modem.quectel_ec25.discovery import discover
+from async_gsm_modem.base.command_queue import Priority
 from async_gsm_modem.quectel_ec25.info import ProductInfo
 from async_gsm_modem.base.command import Command, ExtendedCommand
 from async_gsm_modem.base.exceptions import *
 from async_gsm_modem.quectel_ec25.exceptions import *
 import asyncio
-import serial_asyncio
+from datetime import datetime, timezone
+from scripted_device import ScriptedDevice, frame
+from async_gsm_modem.quectel_ec25.sms import Concatenation
 
-class DummyReader:
-    
-    async def readuntil(self, *args, **kwargs):
-        pass
-
-class DummyWriter:
-
-    def write(self, *args, **kwargs):
-        pass
-
-    async def drain(self, *args, **kwargs):
-        pass
-
-    def close(self, *args, **kwargs):
-        pass
-
-    async def wait_closed(self, *args, **kwargs):
-        pass
-
-@pytest.fixture(autouse=True)
-def mock_serial_connection(mocker):
-    mocker.patch.object(serial_asyncio, 'open_serial_connection', return_value=(DummyReader(), DummyWriter()))
+@pytest.fixture
+async def device():
+    device = ScriptedDevice('ttyXRUSB2')
+    yield device
+    await device.close()
 
 @pytest.fixture
-async def modem(mocker):
-    mocker.patch.object(Modem, 'start_read_loop', return_value=None)
+async def modem(mocker, device):
     mocker.patch.object(Modem, 'initialize', return_value=None)
-    modem = Modem('/dev/ttyXRUSB2', 115200)
+    modem = Modem('memory://ttyXRUSB2', 115200)
     modem.at_logger.setLevel(logging.DEBUG)
     await modem.connect()
     yield modem
@@ -46,73 +33,163 @@ def test_init():
     assert modem
 
 @pytest.mark.asyncio
-async def test_ping(mocker, modem):
-    mocker.patch.object(DummyReader, 'readuntil', side_effect=[b'OK'])
+async def test_ping(mocker, modem, device):
+    device.responses = [frame([b'OK'])]
 
     assert await modem.ping()
 
 @pytest.mark.asyncio
-async def test_product_info(mocker, modem):
+async def test_product_info(mocker, modem, device):
     expected_response = [b'Quectel', b'EC25', b'Revision: EC25AFFAR07A08M4G', b'OK']
-    mocker.patch.object(DummyReader, 'readuntil', side_effect=expected_response)
+    device.responses = [frame(expected_response)]
 
     product_info = await modem.product_info()
     assert product_info == ProductInfo(manufacturer='Quectel', model='EC25', revision='EC25AFFAR07A08M4G')
 
 @pytest.mark.asyncio
-async def test_read_message(mocker, modem):
+async def test_read_message(mocker, modem, device):
     expected_response = [b'+CMGR: 0,,23', b'07912160130350F7040B912108378482F500001240625104958A04D4F29C0E', b'OK']
-    mocker.patch.object(DummyReader, 'readuntil', side_effect=expected_response)
+    device.responses = [frame(expected_response)]
 
     message = await modem.read_message(0)
-    assert message
+    assert message.text == 'Test'
+    assert message.from_number == '12807348285'
+    assert message.smsc == '+12063130057'
+    assert message.date == datetime(2021, 4, 26, 22, 40, 59, tzinfo=timezone.utc)
+    assert (message.type, message.data_coding, message.concatenation) == ('SMS-DELIVER', 0, None)
 
 @pytest.mark.asyncio
-async def test_read_message_no_message(mocker, modem):
+async def test_read_message_no_message(mocker, modem, device):
     expected_response = [b'OK']
-    mocker.patch.object(DummyReader, 'readuntil', side_effect=expected_response)
+    device.responses = [frame(expected_response)]
 
     message = await modem.read_message(0)
     assert not message
 
 @pytest.mark.asyncio
-async def test_read_message_error(mocker, modem):
+async def test_read_message_error(mocker, modem, device):
     expected_response = [b'+CMS ERROR: 300']
-    mocker.patch.object(DummyReader, 'readuntil', side_effect=expected_response)
+    device.responses = [frame(expected_response)]
 
     with pytest.raises(ReadMessageError):
         message = await modem.read_message(0)
 
 @pytest.mark.asyncio
-async def test_list_messages(mocker, modem):
+async def test_list_messages(mocker, modem, device):
     expected_response = [b'+CMGL: 0,0,,23', b'07912160130350F7040B912108378482F500001240625104958A04D4F29C0E', b'+CMGL: 1,0,,23', b'07912160130350F7040B912108378482F500001240625104958A04D4F29C0E', b'OK']
-    mocker.patch.object(DummyReader, 'readuntil', side_effect=expected_response)
+    device.responses = [frame(expected_response)]
 
     messages = await modem.list_messages()
     assert len(messages) == 2
 
+def test_parse_message_part():
+    modem = Modem('/dev/ttyXRUSB2', 115200)
+    pdu = (b'00440B912143658709F000001240625104958DA0050003070301986F79B90D4AC3E7F53688FC66BFE5A0799A0E0AB7CB741668FC76CFCB637A995E9783C2E4343C3D1FA7DD6750999DA6BB40CCB7BCDC06A5E1F37A1B447EB3DF72D03C4D0785DB653A0B347EBBE7E531BD4CAFCB4161721A9E9E8FD3EE33A8CC4ED35D20E65B5E6E83D2F079BD0D22BFD96F39689EA683C2ED329D051ABFDDF3F2985EA6D7E5')
+    message = modem.parse_message(b'3', b'1', b'', b'159', pdu)
+    assert message.smsc is None
+    assert message.text.startswith('Lorem ipsum dolor sit amet')
+    assert message.concatenation == Concatenation(reference=7, parts=3, number=1)
+
+def test_parse_status_report():
+    modem = Modem('/dev/ttyXRUSB2', 115200)
+    message = modem.parse_message(b'4', b'0', b'', b'25', b'0006360B911316325476F8123021800121014080123080808000')
+    assert (message.type, message.from_number, message.message_reference, message.report_status) == ('SMS-STATUS-REPORT', '31612345678', 0x36, 0)
+    assert message.discharge_date == datetime(2004, 8, 21, 1, 8, 8, tzinfo=timezone.utc)
+    assert message.text == ''
+
 @pytest.mark.asyncio
-async def test_list_messages_no_messages(mocker, modem):
+async def test_list_messages_no_messages(mocker, modem, device):
     expected_response = [b'OK']
-    mocker.patch.object(DummyReader, 'readuntil', side_effect=expected_response)
+    device.responses = [frame(expected_response)]
 
     messages = await modem.list_messages()
     assert isinstance(messages, list)
     assert not messages
 
 @pytest.mark.asyncio
-async def test_send_message(mocker, modem):
-    expected_response = [b'> ', b'+CMGS: 245', b'OK']
-    mocker.patch.object(DummyReader, 'readuntil', side_effect=expected_response)
+async def test_send_message(mocker, modem, device):
+    device.responses = [b'\r\n> ', frame([b'+CMGS: 245', b'OK'])]
 
     message_references = await modem.send_message('TEST_NUMBER', 'TEST MESSAGE')
     assert message_references == ['245']
 
 @pytest.mark.asyncio
-async def test_send_message_concatenated(mocker, modem):
-    expected_response = [b'> ', b'+CMGS: 245', b'OK', b'> ', b'+CMGS: 246', b'OK']
-    mocker.patch.object(DummyReader, 'readuntil', side_effect=expected_response)
+async def test_send_message_concatenated(mocker, modem, device):
+    device.responses = [b'\r\n> ', frame([b'+CMGS: 245', b'OK']), b'\r\n> ', frame([b'+CMGS: 246', b'OK'])]
     text = 'TEST MESSAGE ' * 14
 
     message_references = await modem.send_message('TEST_NUMBER', text)
-    assert message_references == ['245', '246']
\ No newline at end of file
+    assert message_references == ['245', '246']
+
+
+def test_result_codes_shared():
+    assert Modem('/dev/ttyUSB2', 115200).result_codes is Modem('/dev/ttyUSB3', 115200).result_codes
+
+@pytest.mark.asyncio
+async def test_network_status(mocker, modem, device):
+    expected_response = [
+        b'+CSQ: 16,99',
+        b'+CREG: 0,1',
+        b'+QNWINFO: "FDD LTE","310000","LTE BAND 2",1125',
+        b'+QSPN: "T-Mobile","T-Mobile","",0,"310000"',
+        b'OK'
+    ]
+    device.responses = [frame(expected_response)]
+
+    status = await modem.network_status()
+    assert status.signal_quality == '16,99'
+    assert status.network_registration == '0,1'
+    assert status.network_info == '"FDD LTE","310000","LTE BAND 2",1125'
+    assert status.registered_network == '"T-Mobile","T-Mobile","",0,"310000"'
+
+@pytest.fixture
+async def pool(mocker, device):
+    mocker.patch.object(Modem, 'initialize', return_value=None)
+    second_device = ScriptedDevice('ttyXRUSB3')
+    pool = ModemPool(['memory://ttyXRUSB2', 'memory://ttyXRUSB3'], 115200)
+    await pool.connect()
+    yield pool, device, second_device
+    await pool.close()
+    await second_device.close()
+
+@pytest.mark.asyncio
+async def test_pool_routing(mocker, pool):
+    pool, device, second_device = pool
+    assert pool.route(Priority.BULK) is pool.channels[1]
+
+    # the listing is held up on the second port while a query runs on the first
+    listing = asyncio.create_task(pool.list_messages())
+    await asyncio.sleep(0)
+    assert pool.route(Priority.INTERACTIVE) is pool.channels[0]
+    device.responses = [frame([b'OK'])]
+    assert await pool.ping()
+
+    second_device.send(frame([b'OK']))
+    assert await listing == []
+
+@pytest.mark.asyncio
+async def test_pool_urc(mocker, pool):
+    pool, device, second_device = pool
+    urc_handler = mocker.patch.object(pool, 'urc_handler')
+    second_device.send(frame([b'+CMTI: "ME",1']))
+    await asyncio.sleep(0.01)
+    urc_handler.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_discover(mocker):
+    identity = [frame([b'OK']), frame([b'Quectel', b'EC25', b'Revision: EC25AFFAR07A08M4G', b'OK']), frame([b'866758042177355', b'OK'])]
+    ports = [ScriptedDevice(name) for name in ('ttyUSB2', 'ttyUSB3', 'ttyUSB4')]
+    ports[0].responses = list(identity)
+    ports[1].responses = list(identity)
+    # ttyUSB4 never answers, ttyUSB5 does not exist
+
+    discovered = await discover([f'memory://ttyUSB{n}' for n in range(2, 6)], timeout=0.1)
+    assert len(discovered) == 1
+    assert discovered[0].imei == '866758042177355'
+    assert discovered[0].product_info.model == 'EC25'
+    assert discovered[0].devices == ['memory://ttyUSB2', 'memory://ttyUSB3']
+
+    for modem in discovered[0].modems:
+        await modem.close()
+    for port in ports:
+        await port.close()
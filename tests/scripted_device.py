@@ -0,0 +1,38 @@
+import asyncio
+from async_gsm_modem.base.transport import MemoryLink
+
+def frame(lines):
+    return b''.join(line + b'\r\n' for line in lines)
+
+class ScriptedDevice:
+    """Device side of a memory link that answers each written command with the next scripted response"""
+
+    def __init__(self, name):
+        self.name = name
+        self.responses = []
+        self.reopen()
+
+    def reopen(self):
+        self.link = MemoryLink(self.name)
+        self.reader, self.writer = self.link.device()
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        while True:
+            data = await self.reader.read(4096)
+            if not data:
+                return
+            for _ in range(data.count(b'\r') + data.count(b'\x1a')):
+                if self.responses:
+                    self.writer.write(self.responses.pop(0))
+
+    def send(self, data):
+        self.writer.write(data)
+
+    async def close(self):
+        self.link.close()
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass